@@ -1,27 +1,120 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File
 import httpx
 import os
+import time
+import asyncio
+import logging
 from typing import Optional, List, Dict, Any
+from cache import AsyncTTLCache, NOT_MODIFIED
+from questionnaire_ranker import get_ranker
+from match_cache import match_cache
+from llm import get_openai_client
+from metrics import observe_mdi_request, mdi_endpoint_template
+from tracing import tracer, inject_trace_context
 from models import PatientRequest, CaseRequest, TokenRequest, TokenResponse, QuestionnaireMatchRequest, QuestionnaireMatchResponse, QuestionnaireMatchResult
 import uuid
-import openai
 
-MDI_BASE_URL = "https://api.mdintegrations.com/v1/partner/"
+logger = logging.getLogger(__name__)
 
-async def mdi_request(method: str, endpoint: str, access_token: str = None, headers: dict = None, params: dict = None, json: dict = None, data: dict = None, files: dict = None):
+# Overridable so load tests can point the client at a local stand-in
+MDI_BASE_URL = os.getenv("MDI_BASE_URL", "https://api.mdintegrations.com/v1/partner/")
+
+# Long-lived client shared by every MDI call so TLS connections are reused
+_http_client: Optional[httpx.AsyncClient] = None
+
+def create_http_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    """
+    Build an httpx client for MDI. Pool limits and timeouts are read from the environment:
+    MDI_MAX_CONNECTIONS, MDI_MAX_KEEPALIVE_CONNECTIONS, MDI_KEEPALIVE_EXPIRY,
+    MDI_CONNECT_TIMEOUT, MDI_READ_TIMEOUT, MDI_WRITE_TIMEOUT, MDI_POOL_TIMEOUT.
+    MDI_HTTP2=true opts into HTTP/2 (requires the `h2` package, i.e. httpx[http2]).
+    Pass `transport` (e.g. httpx.MockTransport) to stand in for the real network in tests.
+    """
+    http2 = os.getenv("MDI_HTTP2", "false").lower() in ("1", "true", "yes")
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("MDI_HTTP2 is enabled but the h2 package is not installed; falling back to HTTP/1.1")
+            http2 = False
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=int(os.getenv("MDI_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("MDI_MAX_KEEPALIVE_CONNECTIONS", "20")),
+            keepalive_expiry=float(os.getenv("MDI_KEEPALIVE_EXPIRY", "30")),
+        ),
+        timeout=httpx.Timeout(
+            connect=float(os.getenv("MDI_CONNECT_TIMEOUT", "5")),
+            read=float(os.getenv("MDI_READ_TIMEOUT", "30")),
+            write=float(os.getenv("MDI_WRITE_TIMEOUT", "30")),
+            pool=float(os.getenv("MDI_POOL_TIMEOUT", "5")),
+        ),
+        http2=http2,
+        transport=transport,
+        event_hooks={"request": [inject_trace_context]},
+    )
+
+async def init_http_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    """Create the shared MDI client (called from the app lifespan)"""
+    global _http_client
+    if _http_client is None:
+        _http_client = create_http_client(transport)
+    return _http_client
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared MDI client, creating it on first use outside the app lifespan"""
+    global _http_client
+    if _http_client is None:
+        _http_client = create_http_client()
+    return _http_client
+
+async def mdi_request(method: str, endpoint: str, access_token: str = None, headers: dict = None, params: dict = None, json: dict = None, data: dict = None, files: dict = None, client: httpx.AsyncClient = None):
+    response = await _mdi_send(method, endpoint, access_token=access_token, headers=headers, params=params, json=json, data=data, files=files, client=client)
+    response.raise_for_status()
+    return response.json()
+
+async def _mdi_send(method: str, endpoint: str, access_token: str = None, headers: dict = None, params: dict = None, json: dict = None, data: dict = None, files: dict = None, client: httpx.AsyncClient = None) -> httpx.Response:
+    """Send one MDI request and return the raw response, replaying it once with a fresh token on 401"""
     url = f"{MDI_BASE_URL}{endpoint}"
     req_headers = headers.copy() if headers else {}
     if access_token:
         req_headers["Authorization"] = f"Bearer {access_token}"
-    async with httpx.AsyncClient() as client:
+    client = client or get_http_client()
+    endpoint_template = mdi_endpoint_template(endpoint)
+    with tracer.start_as_current_span("mdi.request", attributes={"http.method": method, "mdi.endpoint": endpoint_template}) as span:
+        start = time.perf_counter()
+        try:
+            response = await _send_with_reauth(client, method, url, access_token, req_headers, params, json, data, files)
+        except Exception:
+            observe_mdi_request(method, endpoint, "error", time.perf_counter() - start)
+            raise
+        observe_mdi_request(method, endpoint, response.status_code, time.perf_counter() - start)
+        span.set_attribute("http.status_code", response.status_code)
+        return response
+
+async def _send_with_reauth(client: httpx.AsyncClient, method: str, url: str, access_token: Optional[str], req_headers: dict, params: dict, json: dict, data: dict, files: dict) -> httpx.Response:
+    response = await client.request(method, url, headers=req_headers, params=params, json=json, data=data, files=files)
+    if response.status_code == 401 and access_token:
+        # Token was revoked or expired early: refresh once and replay the request
+        access_token = await token_manager.refresh_after_unauthorized(access_token)
+        req_headers["Authorization"] = f"Bearer {access_token}"
+        if files:
+            for file_tuple in files.values():
+                if hasattr(file_tuple[1], "seek"):
+                    file_tuple[1].seek(0)
         response = await client.request(method, url, headers=req_headers, params=params, json=json, data=data, files=files)
-        response.raise_for_status()
-        return response.json()
+    return response
 
 router = APIRouter(prefix="/mdi", tags=["MD Integrations"])
 
-async def get_access_token():
-    url = "https://api.mdintegrations.com/v1/partner/auth/token"
+async def _fetch_access_token() -> TokenResponse:
+    url = f"{MDI_BASE_URL}auth/token"
     client_id = os.getenv("MD_CLIENT_ID")
     client_secret = os.getenv("MD_CLIENT_SECRET")
     payload = {
@@ -31,24 +124,155 @@ async def get_access_token():
         "scope": "*"
     }
     headers = {"Content-Type": "application/x-www-form-urlencoded"}
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, data=payload, headers=headers)
-        response.raise_for_status()
-        token_data = response.json()
-        return token_data["access_token"]
+    start = time.perf_counter()
+    response = await get_http_client().post(url, data=payload, headers=headers)
+    observe_mdi_request("POST", "auth/token", response.status_code, time.perf_counter() - start)
+    response.raise_for_status()
+    return TokenResponse(**response.json())
+
+class TokenManager:
+    """
+    Process-wide cache for the MDI client_credentials token.
+
+    The token is reused until shortly before `expires_in`. Inside the refresh window
+    (MDI_TOKEN_REFRESH_MARGIN seconds, default 60) callers still get the cached token
+    while a single background task fetches a new one. All refreshes are serialized
+    behind one lock, so a burst of misses results in one upstream call.
+    """
+
+    def __init__(self):
+        self._token: Optional[str] = None
+        self._expires_at: float = 0.0
+        self._refresh_at: float = 0.0
+        self._lock = asyncio.Lock()
+        self._background_refresh: Optional[asyncio.Task] = None
+
+    async def get_token(self) -> str:
+        now = time.monotonic()
+        if self._token and now < self._expires_at:
+            if now >= self._refresh_at:
+                self._schedule_background_refresh()
+            return self._token
+        return await self._refresh()
+
+    async def refresh_after_unauthorized(self, rejected_token: str) -> str:
+        """Drop a token MDI rejected with 401 and return a fresh one."""
+        return await self._refresh(rejected_token=rejected_token)
+
+    def invalidate(self) -> None:
+        self._token = None
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+
+    async def _refresh(self, rejected_token: Optional[str] = None) -> str:
+        async with self._lock:
+            # Another caller may have refreshed while we were waiting for the lock
+            if self._token and self._token != rejected_token and time.monotonic() < self._refresh_at:
+                return self._token
+            if rejected_token is not None and self._token == rejected_token:
+                self.invalidate()
+            token = await _fetch_access_token()
+            now = time.monotonic()
+            margin = min(float(os.getenv("MDI_TOKEN_REFRESH_MARGIN", "60")), token.expires_in / 2)
+            self._token = token.access_token
+            # Treat the token as expired a few seconds early to absorb clock skew and request latency
+            self._expires_at = now + max(token.expires_in - 5, 0)
+            self._refresh_at = now + token.expires_in - margin
+            return self._token
+
+    def _schedule_background_refresh(self) -> None:
+        if self._background_refresh is None or self._background_refresh.done():
+            self._background_refresh = asyncio.create_task(self._refresh_in_background())
+
+    async def _refresh_in_background(self) -> None:
+        try:
+            await self._refresh()
+        except Exception:
+            # The current token is still valid; the next caller after expiry will retry in the foreground
+            logger.exception("Background MDI token refresh failed")
+
+token_manager = TokenManager()
+
+async def get_access_token():
+    return await token_manager.get_token()
+
+# Questionnaire definitions change rarely, so the catalog and simplified schemas are cached in-process.
+# MDI_QUESTIONNAIRE_CACHE_TTL: seconds an entry is served without revalidation.
+# MDI_QUESTIONNAIRE_CACHE_STALE_TTL: extra seconds a stale entry is served while it revalidates in the background.
+# MDI_QUESTIONNAIRE_CACHE_MAX_ENTRIES: LRU bound across the catalog and all schemas.
+questionnaire_cache = AsyncTTLCache(
+    "questionnaires",
+    ttl=float(os.getenv("MDI_QUESTIONNAIRE_CACHE_TTL", "3600")),
+    stale_ttl=float(os.getenv("MDI_QUESTIONNAIRE_CACHE_STALE_TTL", "86400")),
+    max_entries=int(os.getenv("MDI_QUESTIONNAIRE_CACHE_MAX_ENTRIES", "256")),
+)
+
+async def _conditional_get(endpoint: str, etag: Optional[str]):
+    """GET an MDI resource with If-None-Match; returns NOT_MODIFIED or (body, etag)"""
+    headers = {"Accept": "application/json"}
+    if etag:
+        headers["If-None-Match"] = etag
+    response = await _mdi_send("GET", endpoint, access_token=await get_access_token(), headers=headers)
+    if response.status_code == 304:
+        return NOT_MODIFIED
+    response.raise_for_status()
+    return response.json(), response.headers.get("ETag")
+
+async def get_questionnaire_catalog() -> List[Dict[str, Any]]:
+    """The full questionnaire list from MDI, served from the questionnaire cache"""
+    return await questionnaire_cache.get(("catalog",), lambda etag: _conditional_get("questionnaires", etag))
+
+async def get_simplified_questionnaire_schema(questionnaire_id: str) -> Dict[str, Any]:
+    """The simplified schema for one questionnaire, served from the questionnaire cache"""
+    async def load(etag: Optional[str]):
+        result = await _conditional_get(f"questionnaires/{questionnaire_id}", etag)
+        if result is NOT_MODIFIED:
+            return result
+        questionnaire, new_etag = result
+        return simplify_questionnaire(questionnaire), new_etag
+
+    return await questionnaire_cache.get(("schema", questionnaire_id), load)
+
+# Local pre-ranking for match_questionnaire_to_query: matches at or above MATCH_CONFIDENCE_THRESHOLD
+# are answered without a model call; below it only the MATCH_LLM_CANDIDATES best candidates go to the model.
+MATCH_CONFIDENCE_THRESHOLD = float(os.getenv("MATCH_CONFIDENCE_THRESHOLD", "0.6"))
+MATCH_LLM_CANDIDATES = int(os.getenv("MATCH_LLM_CANDIDATES", "5"))
 
 async def match_questionnaire_to_query(query: str, context: str = "") -> QuestionnaireMatchResult:
-    """Use GPT-4o-mini to intelligently match a query to the most appropriate questionnaire."""
+    """
+    Match a query to the most appropriate questionnaire. A BM25 ranker over the cached catalog
+    answers confident matches directly; otherwise GPT-4o-mini picks among the top candidates.
+    """
     try:
         # Get the list of questionnaires
-        questionnaires = await get_questionnaires()
+        questionnaires = await get_questionnaire_catalog()
         
         # Combine query with context for better matching
         full_query = f"{context} {query}".strip()
+
+        # Same or nearly the same complaint matched before against this catalog
+        cached = match_cache.get(full_query, questionnaires)
+        if cached is not None:
+            return cached
+
+        ranking = get_ranker(questionnaires).rank(full_query, limit=MATCH_LLM_CANDIDATES)
+        if ranking.best is not None and ranking.confidence >= MATCH_CONFIDENCE_THRESHOLD:
+            logger.info("Questionnaire matched locally", extra={"confidence": ranking.confidence})
+            result = QuestionnaireMatchResult(
+                questionnaire_id=ranking.best.get("partner_questionnaire_id"),
+                confidence=ranking.confidence
+            )
+            match_cache.put(full_query, questionnaires, result)
+            return result
+
+        # Only lexical candidates go to the model; with none at all it sees the whole catalog
+        candidates = [q for q, _ in ranking.results] or questionnaires
+        scores = {q.get("partner_questionnaire_id"): score for q, score in ranking.results}
+        top_score = ranking.results[0][1] if ranking.results else 0.0
         
         # Prepare questionnaire data for GPT
         questionnaire_data = []
-        for q in questionnaires:
+        for q in candidates:
             questionnaire_data.append({
                 "id": q.get("partner_questionnaire_id"),
                 "name": q.get("name", ""),
@@ -81,12 +305,8 @@ Consider:
 - Gender-specific questionnaires if relevant
 
 Response (just the ID or NO_MATCH):"""        # Call GPT-4o-mini for matching
-        openai_api_key = os.getenv("OPENAI_API_KEY")
-        if not openai_api_key:
-            raise Exception("OPENAI_API_KEY not set in environment variables")
-        
-        client = openai.OpenAI(api_key=openai_api_key)
-        response = client.chat.completions.create(
+        client = get_openai_client()
+        response = await client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "You are a medical assistant that matches patients to appropriate health questionnaires. Only respond with the questionnaire ID or 'NO_MATCH'."},
@@ -97,11 +317,15 @@ Response (just the ID or NO_MATCH):"""        # Call GPT-4o-mini for matching
         )
         
         gpt_response = response.choices[0].message.content.strip()
-        print(f"GPT matching response: {gpt_response}")
+        logger.info("GPT matching response", extra={"response": gpt_response, "candidates": len(questionnaire_data)})
         
         # Check if GPT found a match
         if gpt_response != "NO_MATCH" and gpt_response in [q['id'] for q in questionnaire_data]:
-            return QuestionnaireMatchResult(questionnaire_id=gpt_response)
+            # Scale the local confidence by how the model's pick scored against the local favourite
+            confidence = round(ranking.confidence * scores[gpt_response] / top_score, 3) if top_score and gpt_response in scores else None
+            result = QuestionnaireMatchResult(questionnaire_id=gpt_response, confidence=confidence)
+            match_cache.put(full_query, questionnaires, result)
+            return result
         
         # If no match found, generate clarifying questions
         if not context:  # First attempt
@@ -109,15 +333,16 @@ Response (just the ID or NO_MATCH):"""        # Call GPT-4o-mini for matching
         else:  # Follow-up attempt
             clarifying_question = "I'm still not sure which questionnaire would be best for you. Could you describe your symptoms in more detail or tell me what specific health concern you're looking to address?"        
         # Get available questionnaire names for context
-        available_options = [q['name'] for q in questionnaire_data]
+        available_options = [q.get('name', '') for q in questionnaires]
         
         return QuestionnaireMatchResult(
             clarifying_question=clarifying_question,
-            available_options=available_options
+            available_options=available_options,
+            confidence=ranking.confidence
         )
             
-    except Exception as e:
-        print(f"Error in questionnaire matching: {str(e)}")
+    except Exception:
+        logger.exception("Error in questionnaire matching")
         return QuestionnaireMatchResult(
             clarifying_question="I'm having trouble accessing the questionnaire database. Could you try again in a moment?"
         )
@@ -206,6 +431,11 @@ async def get_auth_token(request: TokenRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Hit, miss and refresh counters for the questionnaire cache, with the match cache under `match_cache`."""
+    return {**questionnaire_cache.stats(), "match_cache": match_cache.stats()}
+
 @router.get("/questionnaires")
 async def get_questionnaires():
     access_token = await get_access_token()
@@ -221,9 +451,8 @@ async def get_questionnaires():
 @router.get("/questionnaires/simplified")
 async def get_simplified_questionnaires():
     """Get only active questionnaires with just their IDs and names."""
-    access_token = await get_access_token()
     try:
-        questionnaires = await mdi_request("GET", "questionnaires", access_token=access_token, headers={"Accept": "application/json"})
+        questionnaires = await get_questionnaire_catalog()
         
         # Filter for active questionnaires and extract only ID and name
         simplified = []
@@ -242,134 +471,144 @@ async def get_simplified_questionnaires():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.get("/questionnaires/{questionnaire_id}/simplified")
-async def get_simplified_questionnaire(questionnaire_id: str):
-    """Get a simplified version of a specific questionnaire with only essential fields."""
-    access_token = await get_access_token()
-    try:
-        questionnaire = await mdi_request("GET", f"questionnaires/{questionnaire_id}", access_token=access_token, headers={"Accept": "application/json"})
-        
-        # Extract only the essential fields
-        simplified = {
-            "id": questionnaire.get("partner_questionnaire_id"),
-            "name": questionnaire.get("name", ""),
-            "questions": []
-        }
-        
-        # Add sex question at the very beginning
-        sex_question = {
-            "id": "standard_sex",
-            "title": "What is your biological sex?",
-            "desc": "This helps us provide appropriate medical care and medication recommendations.",
-            "order": 1,
-            "type": "boolean",
-            "options": [],
-            "rules": []
-        }
-        simplified["questions"].append(sex_question)
-        
-        # Process questions with rules
-        if "questions" in questionnaire:
-            for q in questionnaire["questions"]:
-                question_simplified = {
-                    "id": q.get("partner_questionnaire_question_id"),
-                    "title": q.get("title", ""),
-                    "desc": q.get("description", ""),
-                    "order": q.get("order", 0),
-                    "type": q.get("type", ""),
-                    "options": [],
-                    "rules": []
-                }
-                
-                # Process options if they exist
-                if "options" in q:
-                    for opt in q["options"]:
-                        option_simplified = {
-                            "id": opt.get("partner_questionnaire_question_option_id"),
-                            "option": opt.get("option", ""),
-                            "order": opt.get("order", 0)
-                        }
-                        question_simplified["options"].append(option_simplified)
-                
-                # Process rules for this specific question
-                if "rules" in q and q["rules"]:
-                    for rule in q["rules"]:
-                        rule_simplified = {
-                            "rule_id": rule.get("id"),
-                            "rule_type": rule.get("type"),
-                            "requirements": []
-                        }
-                        
-                        # Process rule requirements
-                        if "requirements" in rule:
-                            for req in rule["requirements"]:
-                                requirement_simplified = {
-                                    "based_on": req.get("based_on"),
-                                    "required_question_id": req.get("required_question_id"),
-                                    "required_answer": req.get("required_answer")
-                                }
-                                rule_simplified["requirements"].append(requirement_simplified)
-                        
-                        question_simplified["rules"].append(rule_simplified)
-                
-                simplified["questions"].append(question_simplified)
-        
-        # Add standard medical safety questions to the end
-        standard_questions = [
-            {
-                "id": "standard_allergies",
-                "title": "Do you have any drug allergies or intolerances?",
-                "desc": None,
-                "order": 1000,
-                "type": "text",
-                "options": [],
-                "rules": []
-            },
+# Intake questions simplify_questionnaire adds to every questionnaire: biological sex first,
+# medical safety questions last. Answers to them are normalized by these definitions even
+# before a questionnaire is assigned to the session.
+STANDARD_SEX_QUESTION = {
+    "id": "standard_sex",
+    "title": "What is your biological sex?",
+    "desc": "This helps us provide appropriate medical care and medication recommendations.",
+    "order": 1,
+    "type": "boolean",
+    # Option IDs are the stored values the pregnancy rule checks (0 = female, 1 = male)
+    "options": [
+        {"id": "0", "option": "Female", "order": 1},
+        {"id": "1", "option": "Male", "order": 2}
+    ],
+    "rules": []
+}
+
+STANDARD_SAFETY_QUESTIONS = [
+    {
+        "id": "standard_allergies",
+        "title": "Do you have any drug allergies or intolerances?",
+        "desc": None,
+        "order": 1000,
+        "type": "text",
+        "options": [],
+        "rules": []
+    },
+    {
+        "id": "standard_pregnancy",
+        "title": "Are you pregnant or expecting to be?",
+        "desc": "Medications on your treatment plan might not be recommended for pregnant women.",
+        "order": 1001,
+        "type": "boolean",
+        "options": [],
+        "rules": [
             {
-                "id": "standard_pregnancy",
-                "title": "Are you pregnant or expecting to be?",
-                "desc": "Medications on your treatment plan might not be recommended for pregnant women.",
-                "order": 1001,
-                "type": "boolean",
-                "options": [],
-                "rules": [
+                "rule_id": "pregnancy_rule",
+                "rule_type": "and",
+                "requirements": [
                     {
-                        "rule_id": "pregnancy_rule",
-                        "rule_type": "and",
-                        "requirements": [
-                            {
-                                "based_on": "question",
-                                "required_question_id": "standard_sex",
-                                "required_answer": "0"  # Only show for females (0 = female, 1 = male)
-                            }
-                        ]
+                        "based_on": "question",
+                        "required_question_id": "standard_sex",
+                        "required_answer": "0"  # Only show for females (0 = female, 1 = male)
                     }
                 ]
-            },
-            {
-                "id": "standard_medications",
-                "title": "Are you taking any medications?",
-                "desc": "Many medications have interactions. Your doctor needs to know every medication that you take to help avoid any harmful interactions.",
-                "order": 1002,
-                "type": "text",
-                "options": [],
-                "rules": []
-            },
-            {
-                "id": "standard_conditions",
-                "title": "Any medical conditions your doctor should know about?",
-                "desc": None,
-                "order": 1003,
-                "type": "text",
+            }
+        ]
+    },
+    {
+        "id": "standard_medications",
+        "title": "Are you taking any medications?",
+        "desc": "Many medications have interactions. Your doctor needs to know every medication that you take to help avoid any harmful interactions.",
+        "order": 1002,
+        "type": "text",
+        "options": [],
+        "rules": []
+    },
+    {
+        "id": "standard_conditions",
+        "title": "Any medical conditions your doctor should know about?",
+        "desc": None,
+        "order": 1003,
+        "type": "text",
+        "options": [],
+        "rules": []
+    }
+]
+
+STANDARD_QUESTIONS = [STANDARD_SEX_QUESTION, *STANDARD_SAFETY_QUESTIONS]
+
+def simplify_questionnaire(questionnaire: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce an MDI questionnaire to the essential fields and add the standard intake questions."""
+    # Extract only the essential fields
+    simplified = {
+        "id": questionnaire.get("partner_questionnaire_id"),
+        "name": questionnaire.get("name", ""),
+        "questions": []
+    }
+    
+    # Add sex question at the very beginning
+    simplified["questions"].append(STANDARD_SEX_QUESTION)
+    
+    # Process questions with rules
+    if "questions" in questionnaire:
+        for q in questionnaire["questions"]:
+            question_simplified = {
+                "id": q.get("partner_questionnaire_question_id"),
+                "title": q.get("title", ""),
+                "desc": q.get("description", ""),
+                "order": q.get("order", 0),
+                "type": q.get("type", ""),
                 "options": [],
                 "rules": []
             }
-        ]
-        
-        # Add the standard questions to the end
-        simplified["questions"].extend(standard_questions)
-        
-        return simplified
+            
+            # Process options if they exist
+            if "options" in q:
+                for opt in q["options"]:
+                    option_simplified = {
+                        "id": opt.get("partner_questionnaire_question_option_id"),
+                        "option": opt.get("option", ""),
+                        "order": opt.get("order", 0)
+                    }
+                    question_simplified["options"].append(option_simplified)
+            
+            # Process rules for this specific question
+            if "rules" in q and q["rules"]:
+                for rule in q["rules"]:
+                    rule_simplified = {
+                        "rule_id": rule.get("id"),
+                        "rule_type": rule.get("type"),
+                        "requirements": []
+                    }
+                    
+                    # Process rule requirements
+                    if "requirements" in rule:
+                        for req in rule["requirements"]:
+                            requirement_simplified = {
+                                "based_on": req.get("based_on"),
+                                "required_question_id": req.get("required_question_id"),
+                                "required_answer": req.get("required_answer")
+                            }
+                            rule_simplified["requirements"].append(requirement_simplified)
+                    
+                    question_simplified["rules"].append(rule_simplified)
+            
+            simplified["questions"].append(question_simplified)
+    
+    # Add the standard questions to the end
+    simplified["questions"].extend(STANDARD_SAFETY_QUESTIONS)
+    
+    return simplified
+
+@router.get("/questionnaires/{questionnaire_id}/simplified")
+async def get_simplified_questionnaire(questionnaire_id: str):
+    """Get a simplified version of a specific questionnaire with only essential fields."""
+    try:
+        return await get_simplified_questionnaire_schema(questionnaire_id)
     except httpx.HTTPStatusError as e:
         raise HTTPException(status_code=e.response.status_code, detail=f"API Error: {e.response.text}")
     except httpx.RequestError as e:
@@ -401,6 +640,16 @@ async def get_questionnaire_questions(questionnaire_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
+@router.post("/questionnaire-match/local", response_model=QuestionnaireMatchResponse)
+async def match_questionnaire_locally(request: QuestionnaireMatchRequest):
+    """Match a query against the cached catalog, reporting the local ranker's confidence"""
+    result = await match_questionnaire_to_query(request.query)
+    return QuestionnaireMatchResponse(
+        partner_questionnaire_id=result.questionnaire_id,
+        confidence=result.confidence,
+        reasoning=result.clarifying_question
+    )
+
 @router.post("/questionnaire-match", response_model=QuestionnaireMatchResponse)
 async def match_questionnaire(request: QuestionnaireMatchRequest):
     access_token = await get_access_token()
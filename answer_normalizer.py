@@ -0,0 +1,259 @@
+import re
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+class NormalizedAnswer:
+    """
+    Outcome of normalizing one answer. `ok` answers are stored as `value`; the others are
+    returned to the model with `reason` and `expected` so it can ask the patient or resubmit.
+    """
+
+    __slots__ = ("value", "ok", "reason", "expected")
+
+    def __init__(self, value: Optional[str], ok: bool = True, reason: Optional[str] = None, expected: Optional[str] = None):
+        self.value = value
+        self.ok = ok
+        self.reason = reason
+        self.expected = expected
+
+def _unsure(reason: str, expected: str) -> NormalizedAnswer:
+    return NormalizedAnswer(None, ok=False, reason=reason, expected=expected)
+
+_WHITESPACE = re.compile(r"\s+")
+_TRUE_WORDS = {"yes", "y", "true", "t", "1", "yeah", "yep", "yup", "correct", "affirmative", "i do", "i am", "i have", "sure"}
+_FALSE_WORDS = {"no", "n", "false", "f", "0", "nope", "nah", "none", "never", "i don't", "i do not", "i am not", "i'm not", "not at all"}
+# Whole words that can open a yes or a no ("yes, I have"); a prefix like the "yes" in "yesterday" is not one
+_YES_TOKENS = {"yes", "yeah", "yep", "yup", "correct", "affirmative", "true"}
+_NO_TOKENS = {"no", "nope", "nah", "false", "never", "not", "none", "nothing"}
+_TOKEN = re.compile(r"[a-z0-9']+")
+# Uncertainty and self-corrections: normalized to a plain value they would read as a certain answer
+_HEDGE = re.compile(
+    r"\b(?:no idea|not sure|unsure|not certain|don'?t know|do not know|idk|maybe|perhaps|possibly|probably|"
+    r"i think|i guess|i believe|kind of|sort of|sometimes|wait|actually|i mean|rather|either)\b"
+)
+_NUMBER_WORDS = {
+    "zero": 0, "none": 0, "one": 1, "a single": 1, "two": 2, "a couple of": 2, "a couple": 2,
+    "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+    "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14, "fifteen": 15, "sixteen": 16,
+    "seventeen": 17, "eighteen": 18, "nineteen": 19, "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50,
+}
+# A minus sign only counts when it does not follow a digit, so "2-3" is not 2 and -3
+_NUMBER = re.compile(r"(?<![\d.])-?\d+(?:\.\d+)?")
+_NUMBER_RANGE = re.compile(r"\d\s*(?:-|–|to|or)\s*-?\d")
+_NUMBER_WORD = re.compile(r"\b(" + "|".join(sorted(map(re.escape, _NUMBER_WORDS), key=len, reverse=True)) + r")\b")
+_CHOICE_SEPARATORS = re.compile(r"\s*(?:,|;|/|\band\b|&|\n)\s*")
+
+# Unit -> (dimension, factor to the dimension's base unit)
+_UNITS = {
+    "minute": ("duration", 1 / 1440), "minutes": ("duration", 1 / 1440), "min": ("duration", 1 / 1440),
+    "hour": ("duration", 1 / 24), "hours": ("duration", 1 / 24), "hr": ("duration", 1 / 24), "hrs": ("duration", 1 / 24),
+    "day": ("duration", 1), "days": ("duration", 1),
+    "week": ("duration", 7), "weeks": ("duration", 7), "wk": ("duration", 7), "wks": ("duration", 7),
+    "month": ("duration", 30), "months": ("duration", 30),
+    "year": ("duration", 365), "years": ("duration", 365), "yr": ("duration", 365), "yrs": ("duration", 365),
+    "lb": ("weight", 1), "lbs": ("weight", 1), "pound": ("weight", 1), "pounds": ("weight", 1),
+    "kg": ("weight", 2.20462), "kgs": ("weight", 2.20462), "kilogram": ("weight", 2.20462), "kilograms": ("weight", 2.20462),
+    "inch": ("length", 1), "inches": ("length", 1),
+    "ft": ("length", 12), "foot": ("length", 12), "feet": ("length", 12),
+    "cm": ("length", 1 / 2.54), "centimeters": ("length", 1 / 2.54), "meters": ("length", 100 / 2.54),
+}
+_UNIT = re.compile(r"\b(" + "|".join(sorted(map(re.escape, _UNITS), key=len, reverse=True)) + r")\b")
+_QUANTITY = re.compile(r"((?<![\d.])-?\d+(?:\.\d+)?)\s*(" + "|".join(sorted(map(re.escape, _UNITS), key=len, reverse=True)) + r")\b")
+
+_DATE_FORMATS = (
+    "%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%m-%d-%Y", "%Y/%m/%d",
+    "%B %d %Y", "%b %d %Y", "%d %B %Y", "%d %b %Y", "%B %Y", "%b %Y",
+)
+_ARTICLE_BEFORE_UNIT = re.compile(r"\ban?\s+(?=(?:" + "|".join(sorted(map(re.escape, _UNITS), key=len, reverse=True)) + r")\b)")
+_RELATIVE_DATE = re.compile(r"^(\d+)\s+(day|week|month|year)s?\s+ago$")
+_ORDINAL_SUFFIX = re.compile(r"(\d)(st|nd|rd|th)\b")
+
+def _clean(answer: Any) -> str:
+    return _WHITESPACE.sub(" ", str(answer)).strip()
+
+def _is_negative_token(token: str) -> bool:
+    return token in _NO_TOKENS or token.endswith("n't")
+
+def _to_number(text: str) -> Optional[float]:
+    numbers = _NUMBER.findall(text)
+    if len(numbers) == 1:
+        return float(numbers[0])
+    if numbers:
+        return None
+    words = _NUMBER_WORD.findall(text)
+    if len(words) == 1:
+        return float(_NUMBER_WORDS[words[0]])
+    return None
+
+def _digits(text: str) -> str:
+    """'two weeks' -> '2 weeks', 'a month ago' -> '1 month ago'"""
+    text = _ARTICLE_BEFORE_UNIT.sub("1 ", text)
+    return _NUMBER_WORD.sub(lambda m: _format_number(_NUMBER_WORDS[m.group(1)]), text)
+
+def _format_number(value: float) -> str:
+    return str(int(value)) if value == int(value) else f"{value:g}"
+
+def _question_unit(question: Optional[Dict[str, Any]]) -> Optional[str]:
+    """The unit a numeric question asks for, e.g. 'days' in 'How many days have you had symptoms?'"""
+    if not question:
+        return None
+    match = _UNIT.search(f"{question.get('title') or ''} {question.get('desc') or ''}".lower())
+    return match.group(1) if match else None
+
+def _option_index(question: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """Option ID, option text and 1-based position, all lowercased, mapped to the option ID"""
+    index: Dict[str, str] = {}
+    options = (question or {}).get("options") or []
+    for position, option in enumerate(options, start=1):
+        option_id = option.get("id")
+        if option_id is None:
+            continue
+        option_id = str(option_id)
+        index.setdefault(str(position), option_id)
+        index[option_id.lower()] = option_id
+        if option.get("option"):
+            index[_clean(option["option"]).lower()] = option_id
+    return index
+
+def _resolve_option(text: str, index: Dict[str, str]) -> Optional[str]:
+    key = text.lower().strip(" .!\"'")
+    if key in index:
+        return index[key]
+    # "Option 2 I think" -> the one option whose text appears in the answer
+    found = {
+        option_id for label, option_id in index.items()
+        if not label.isdigit() and len(label) > 2 and re.search(rf"\b{re.escape(label)}\b", key)
+    }
+    return found.pop() if len(found) == 1 else None
+
+def normalize_boolean(answer: str, question: Optional[Dict[str, Any]]) -> NormalizedAnswer:
+    index = _option_index(question)
+    if index:
+        # Boolean questions with labelled options (e.g. standard_sex: 0 = female, 1 = male) store the option ID
+        option_id = _resolve_option(answer, index)
+        if option_id is None:
+            return _unsure("answer does not match one option", "one of: " + ", ".join(sorted(set(index.values()))))
+        return NormalizedAnswer(option_id)
+    key = answer.lower().strip(" .!")
+    if key in _TRUE_WORDS:
+        return NormalizedAnswer("true")
+    if key in _FALSE_WORDS:
+        return NormalizedAnswer("false")
+    # "yes, I have" / "no, never": a leading yes or no word, and nothing after it that hedges or
+    # points the other way ("no idea", "no, wait, yes", "yes I don't")
+    tokens = _TOKEN.findall(key)
+    if tokens and not _HEDGE.search(key):
+        first, rest = tokens[0], tokens[1:]
+        if first in _YES_TOKENS and not any(map(_is_negative_token, rest)):
+            return NormalizedAnswer("true")
+        if first in _NO_TOKENS and not any(token in _YES_TOKENS for token in rest):
+            return NormalizedAnswer("false")
+    return _unsure("could not tell whether this is a yes or a no", "yes or no")
+
+def normalize_integer(answer: str, question: Optional[Dict[str, Any]]) -> NormalizedAnswer:
+    text = _digits(answer.lower())
+    target_unit = _question_unit(question)
+    expected = f"a number{f' of {target_unit}' if target_unit else ''}"
+    if _NUMBER_RANGE.search(text):
+        return _unsure("answer is a range, not a single number", expected)
+    if _HEDGE.search(text):
+        return _unsure("answer is uncertain or corrects itself", expected)
+    quantities = _QUANTITY.findall(text)
+    if target_unit and len(quantities) == 1:
+        number, unit = quantities[0]
+        dimension, factor = _UNITS[unit]
+        target_dimension, target_factor = _UNITS[target_unit]
+        if dimension == target_dimension:
+            value = round(float(number) * factor / target_factor, 1)
+            if value < 0:
+                return _unsure(f"a {dimension} cannot be negative", expected)
+            return NormalizedAnswer(_format_number(value))
+    value = _to_number(text)
+    if value is None:
+        return _unsure("expected a single number", expected)
+    if value < 0:
+        # Intake numbers are counts, durations and measurements
+        return _unsure("expected a number that is not negative", expected)
+    return NormalizedAnswer(_format_number(value))
+
+def normalize_choice(answer: str, question: Optional[Dict[str, Any]]) -> NormalizedAnswer:
+    index = _option_index(question)
+    if not index:
+        return NormalizedAnswer(answer)
+    option_id = _resolve_option(answer, index)
+    if option_id is None:
+        return _unsure("answer does not match one option", "one option ID from the question's options")
+    return NormalizedAnswer(option_id)
+
+def normalize_multiple_choice(answer: str, question: Optional[Dict[str, Any]]) -> NormalizedAnswer:
+    index = _option_index(question)
+    if not index:
+        return NormalizedAnswer(answer)
+    whole = index.get(answer.lower().strip(" ."))
+    if whole is not None:
+        return NormalizedAnswer(whole)
+    selected: List[str] = []
+    for part in filter(None, _CHOICE_SEPARATORS.split(answer)):
+        option_id = _resolve_option(part, index)
+        if option_id is None:
+            return _unsure(f"'{part}' does not match an option", "comma-separated option IDs from the question's options")
+        if option_id not in selected:
+            selected.append(option_id)
+    if not selected:
+        return _unsure("no option selected", "comma-separated option IDs from the question's options")
+    return NormalizedAnswer(",".join(selected))
+
+def normalize_date(answer: str, question: Optional[Dict[str, Any]], today: Optional[date] = None) -> NormalizedAnswer:
+    today = today or date.today()
+    text = _ORDINAL_SUFFIX.sub(r"\1", answer.lower().replace(",", " "))
+    text = _WHITESPACE.sub(" ", text).strip()
+    if text == "today":
+        return NormalizedAnswer(today.isoformat())
+    if text == "yesterday":
+        return NormalizedAnswer((today - timedelta(days=1)).isoformat())
+    relative = _RELATIVE_DATE.match(_digits(text))
+    if relative:
+        days = int(relative.group(1)) * {"day": 1, "week": 7, "month": 30, "year": 365}[relative.group(2)]
+        return NormalizedAnswer((today - timedelta(days=days)).isoformat())
+    for fmt in _DATE_FORMATS:
+        try:
+            return NormalizedAnswer(datetime.strptime(text, fmt).date().isoformat())
+        except ValueError:
+            continue
+    return _unsure("could not read a date", "a date as YYYY-MM-DD")
+
+def normalize_text(answer: str, question: Optional[Dict[str, Any]]) -> NormalizedAnswer:
+    return NormalizedAnswer(answer)
+
+# Keyed by question `type`; MDI and the chat models use slightly different names for the same kinds
+NORMALIZERS: Dict[str, Callable[[str, Optional[Dict[str, Any]]], NormalizedAnswer]] = {
+    "boolean": normalize_boolean,
+    "integer": normalize_integer,
+    "number": normalize_integer,
+    "single_choice": normalize_choice,
+    "single_option": normalize_choice,
+    "dropdown": normalize_choice,
+    "multiple_choice": normalize_multiple_choice,
+    "multiple_option": normalize_multiple_choice,
+    "date": normalize_date,
+    "text": normalize_text,
+    "string": normalize_text,
+}
+
+def normalize_answer(answer: Any, answer_type: Optional[str], question: Optional[Dict[str, Any]] = None) -> NormalizedAnswer:
+    """
+    Validate and coerce one answer before it is stored. The question's own type (from the
+    schema) wins over the type the model reported. Unknown types are stored as cleaned text.
+    """
+    if answer is None:
+        return NormalizedAnswer(None)
+    text = _clean(answer)
+    if not text:
+        return NormalizedAnswer(None)
+    kind = str((question or {}).get("type") or answer_type or "text").lower()
+    normalizer = NORMALIZERS.get(kind, normalize_text)
+    return normalizer(text, question)
+
+def normalize_answers(answers: List[Tuple[Any, Optional[str], Optional[Dict[str, Any]]]]) -> List[NormalizedAnswer]:
+    """Normalize a batch of (answer, answer_type, question) in one pass"""
+    return [normalize_answer(answer, answer_type, question) for answer, answer_type, question in answers]
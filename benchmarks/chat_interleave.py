@@ -0,0 +1,115 @@
+"""
+Load test: N concurrent /chat streams against an in-process stand-in for OpenAI.
+
+Each fake completion emits TOKENS deltas with a fixed delay between them. If the endpoint
+keeps the event loop free, N streams finish in roughly the time of one; if it blocks,
+total wall time grows linearly with N and the per-stream delta timelines do not overlap.
+
+    python benchmarks/chat_interleave.py --sessions 20 --tokens 40 --delay 0.01
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+import main
+from llm import set_openai_client
+from models import ChatSession
+
+class FakeStream:
+    def __init__(self, tokens: int, delay: float, timeline: list):
+        self.tokens = tokens
+        self.delay = delay
+        self.timeline = timeline
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        for i in range(self.tokens):
+            await asyncio.sleep(self.delay)
+            self.timeline.append(time.perf_counter())
+            delta = SimpleNamespace(content=f"word{i} ", tool_calls=None)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+class FakeOpenAI:
+    def __init__(self, tokens: int, delay: float):
+        self.timelines = []
+        completions = SimpleNamespace(create=self._create)
+        self.chat = SimpleNamespace(completions=completions)
+        self.tokens = tokens
+        self.delay = delay
+
+    async def _create(self, **kwargs):
+        timeline = []
+        self.timelines.append(timeline)
+        return FakeStream(self.tokens, self.delay, timeline)
+
+def install_in_memory_db():
+    """Replace the database helpers bound in main with in-memory versions"""
+    history = {}
+
+    async def get_or_create_session(session_id=None):
+        now = datetime.utcnow().isoformat()
+        sid = uuid.uuid4()
+        history[sid] = []
+        return ChatSession(session_id=sid, messages=[], created_at=now, last_updated=now)
+
+    async def add_chat_message(session_id, role, content):
+        history[session_id].append({"role": role, "content": content, "timestamp": datetime.utcnow()})
+
+    async def get_chat_history(session_id):
+        return list(history[session_id])
+
+    main.get_or_create_session = get_or_create_session
+    main.add_chat_message = add_chat_message
+    main.get_chat_history = get_chat_history
+
+async def run_chat(client: httpx.AsyncClient) -> None:
+    async with client.stream("POST", "/chat", json={"message": "hello"}) as response:
+        async for _ in response.aiter_bytes():
+            pass
+
+def overlapping_pairs(timelines: list) -> int:
+    spans = [(t[0], t[-1]) for t in timelines if t]
+    return sum(
+        1
+        for i, a in enumerate(spans)
+        for b in spans[i + 1:]
+        if a[0] < b[1] and b[0] < a[1]
+    )
+
+async def main_async(args):
+    install_in_memory_db()
+    fake = FakeOpenAI(args.tokens, args.delay)
+    set_openai_client(fake)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await run_chat(client)
+        single = time.perf_counter() - start
+
+        fake.timelines.clear()
+        start = time.perf_counter()
+        await asyncio.gather(*(run_chat(client) for _ in range(args.sessions)))
+        concurrent = time.perf_counter() - start
+
+    n = args.sessions
+    print(f"single stream:           {single * 1000:8.1f} ms")
+    print(f"{n} concurrent streams:  {concurrent * 1000:8.1f} ms  (serial would be ~{single * n * 1000:.0f} ms)")
+    print(f"overlapping stream pairs: {overlapping_pairs(fake.timelines)} of {n * (n - 1) // 2}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--delay", type=float, default=0.01)
+    asyncio.run(main_async(parser.parse_args()))
@@ -0,0 +1,231 @@
+"""
+End-to-end load test for /chat with local stand-ins for OpenAI, MDI and Postgres.
+
+The real FastAPI `app` is served by uvicorn on a loopback port, OpenAI and MDI are replaced
+by the fake servers in this directory (reached over HTTP through the production clients),
+and the asyncpg pool is replaced by the round-trip counting stub in fake_db.py.
+N sessions run concurrently, each sending TURNS messages in sequence;
+each turn makes one round of tool calls (an MDI read and two answer saves) before the
+streamed text answer, unless --no-tool-calls is given.
+
+Reported per turn: TTFB (first response byte), time to first content event, total turn
+time (p50/p95/p99), streamed content events per second, DB round-trips, and the share of
+prompt tokens the fake OpenAI server could serve from its emulated prompt cache.
+
+    python benchmarks/chat_load.py --sessions 20 --turns 3
+    python benchmarks/chat_load.py --write-baseline benchmarks/baseline.json
+    python benchmarks/chat_load.py --compare benchmarks/baseline.json   # exit 1 on regression
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import uvicorn
+
+import fake_mdi
+import fake_openai
+from fake_db import FakePool
+
+# Metrics where larger is better; everything else in the report is a cost
+HIGHER_IS_BETTER = {"tokens_per_second_mean", "prompt_cache_reuse"}
+
+async def serve(app, host: str = "127.0.0.1") -> uvicorn.Server:
+    """Start an ASGI app on an ephemeral port in this event loop"""
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=0, log_config=None, access_log=False, lifespan="on"))
+    server.task = asyncio.create_task(server.serve())
+    while not server.started:
+        if server.task.done():
+            server.task.result()
+        await asyncio.sleep(0.01)
+    return server
+
+def server_url(server: uvicorn.Server) -> str:
+    host, port = server.servers[0].sockets[0].getsockname()[:2]
+    return f"http://{host}:{port}"
+
+async def stop(server: uvicorn.Server) -> None:
+    server.should_exit = True
+    await server.task
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+async def run_turn(client: httpx.AsyncClient, message: str, session_id: Optional[str]) -> Dict[str, Any]:
+    payload = {"message": message, "session_id": session_id}
+    start = time.perf_counter()
+    ttfb = first_content = None
+    content_events = 0
+    tokens = 0
+    error = None
+    async with client.stream("POST", "/chat", json=payload) as response:
+        async for line in response.aiter_lines():
+            if ttfb is None:
+                ttfb = time.perf_counter() - start
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[6:])
+            if event["type"] == "session_id":
+                session_id = event["session_id"]
+            elif event["type"] == "content":
+                content_events += 1
+                # The fake model streams one word per token; coalesced events carry several
+                tokens += len(event["content"].split())
+                if first_content is None:
+                    first_content = time.perf_counter() - start
+            elif event["type"] == "error":
+                error = event.get("error")
+    total = time.perf_counter() - start
+    streaming = total - first_content if first_content is not None else 0.0
+    return {
+        "session_id": session_id,
+        "ttfb": ttfb or total,
+        "first_content": first_content or total,
+        "total": total,
+        "content_events": content_events,
+        "tokens_per_second": tokens / streaming if streaming > 0 else 0.0,
+        "error": error,
+    }
+
+async def run_session(client: httpx.AsyncClient, turns: int) -> List[Dict[str, Any]]:
+    results = []
+    session_id = None
+    for turn in range(turns):
+        result = await run_turn(client, f"Benchmark message {turn}", session_id)
+        session_id = result["session_id"]
+        results.append(result)
+    return results
+
+def summarize(turns: List[Dict[str, Any]], round_trips: int, wall: float) -> Dict[str, float]:
+    summary: Dict[str, float] = {}
+    for key in ("ttfb", "first_content", "total"):
+        values = [t[key] * 1000 for t in turns]
+        for pct in (50, 95, 99):
+            summary[f"{key}_p{pct}_ms"] = round(percentile(values, pct), 2)
+    summary["tokens_per_second_mean"] = round(statistics.mean(t["tokens_per_second"] for t in turns), 1)
+    summary["content_events_per_turn"] = round(statistics.mean(t["content_events"] for t in turns), 2)
+    summary["db_round_trips_per_turn"] = round(round_trips / len(turns), 2)
+    summary["turns_per_second"] = round(len(turns) / wall, 2)
+    summary["errors"] = sum(1 for t in turns if t["error"])
+    return summary
+
+def compare(current: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    """Metrics that moved the wrong way by more than `tolerance` (a fraction of the baseline)"""
+    regressions = []
+    for key, old in baseline.items():
+        new = current.get(key)
+        if new is None or key == "turns_per_second":
+            continue
+        if key in HIGHER_IS_BETTER:
+            worse = new < old * (1 - tolerance)
+        elif key in ("db_round_trips_per_turn", "errors"):
+            # Round-trip counts are deterministic, so any increase is a regression
+            worse = new > old
+        else:
+            worse = new > old * (1 + tolerance)
+        if worse:
+            regressions.append(f"{key}: {old} -> {new}")
+    return regressions
+
+async def main(args: argparse.Namespace) -> int:
+    openai_app = fake_openai.create_app(fake_openai.FakeOpenAIConfig(
+        tokens=args.tokens,
+        tokens_per_second=args.token_rate,
+        time_to_first_token=args.openai_ttft,
+        tool_calls=not args.no_tool_calls,
+        prefill_tokens_per_second=args.prefill_rate,
+    ))
+    mdi_app = fake_mdi.create_app(latency=args.mdi_latency)
+    openai_server = await serve(openai_app)
+    mdi_server = await serve(mdi_app)
+
+    # Read at import time by llm.py / MDI.py / logging_config.py, so set before importing main
+    os.environ.update({
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": f"{server_url(openai_server)}/v1",
+        "MDI_BASE_URL": f"{server_url(mdi_server)}/v1/partner/",
+        "MD_CLIENT_ID": "bench",
+        "MD_CLIENT_SECRET": "bench",
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+        "SSE_COALESCE_INTERVAL_MS": str(args.coalesce_ms),
+        "CHAT_WRITE_BEHIND": "false" if args.inline_writes else "true",
+    })
+    import database
+    import main as app_module
+
+    # Connections prepare the registered statements when opened; open them all before measuring
+    pool = FakePool(latency=args.db_latency, init=database.statements.prepare_all)
+    await pool.warm()
+    database._pool = pool
+    app_server = await serve(app_module.app)
+
+    limits = httpx.Limits(max_connections=args.sessions, max_keepalive_connections=args.sessions)
+    async with httpx.AsyncClient(base_url=server_url(app_server), timeout=120, limits=limits) as client:
+        await run_session(client, 1)
+        pool.reset_counters()
+        openai_app.state.requests = mdi_app.state.requests = 0
+        openai_app.state.prompt_cache.prompt_tokens = openai_app.state.prompt_cache.cached_tokens = 0
+
+        start = time.perf_counter()
+        sessions = await asyncio.gather(*(run_session(client, args.turns) for _ in range(args.sessions)))
+        wall = time.perf_counter() - start
+
+    await stop(app_server)
+    await stop(mdi_server)
+    await stop(openai_server)
+
+    turns = [turn for session in sessions for turn in session]
+    summary = summarize(turns, pool.round_trips, wall)
+    prompt_cache = openai_app.state.prompt_cache
+    summary["prompt_cache_reuse"] = round(prompt_cache.cached_tokens / prompt_cache.prompt_tokens, 3) if prompt_cache.prompt_tokens else 0.0
+    config = {k: v for k, v in vars(args).items() if k not in ("compare", "write_baseline", "tolerance")}
+    report = {"config": config, "metrics": summary, "db_statements": dict(sorted(pool.statements.items())),
+              "upstream_requests": {"openai": openai_app.state.requests, "mdi": mdi_app.state.requests}}
+    print(json.dumps(report, indent=2))
+
+    if args.write_baseline:
+        with open(args.write_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline["config"] != config:
+            print(f"warning: baseline was recorded with {baseline['config']}", file=sys.stderr)
+        regressions = compare(summary, baseline["metrics"], args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent sessions")
+    parser.add_argument("--turns", type=int, default=3, help="messages per session")
+    parser.add_argument("--tokens", type=int, default=60, help="tokens per streamed completion")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="fake OpenAI tokens per second")
+    parser.add_argument("--openai-ttft", type=float, default=0.05, help="fake OpenAI time to first token, seconds")
+    parser.add_argument("--prefill-rate", type=float, default=20000.0, help="fake OpenAI uncached prompt tokens per second")
+    parser.add_argument("--mdi-latency", type=float, default=0.02, help="fake MDI latency per request, seconds")
+    parser.add_argument("--db-latency", type=float, default=0.0005, help="stub Postgres latency per round-trip, seconds")
+    parser.add_argument("--coalesce-ms", type=float, default=0.0, help="SSE_COALESCE_INTERVAL_MS for the app under test")
+    parser.add_argument("--inline-writes", action="store_true", help="write chat messages inline instead of write-behind")
+    parser.add_argument("--no-tool-calls", action="store_true", help="stream text only, never call tools")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown before failing")
+    parser.add_argument("--write-baseline", help="write this run's report to the given path")
+    sys.exit(asyncio.run(main(parser.parse_args())))
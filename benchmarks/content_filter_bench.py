@@ -0,0 +1,63 @@
+"""
+Microbenchmark: compiled streaming ContentFilter vs the legacy per-chunk keyword scan.
+
+The legacy scan lowercases every delta and tests each keyword with `in`, dropping the
+whole chunk on a hit. The new filter runs one compiled regex over the chunk plus a
+small carry-over buffer and redacts only the matched span.
+
+    python benchmarks/content_filter_bench.py --chunks 200000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from content_filter import DEFAULT_BLOCKED_KEYWORDS, content_filter
+
+WORDS = (
+    "I'm sorry you're dealing with that. How long have you had these symptoms? "
+    "Are you having any fever, back pain, nausea or vomiting right now? "
+    "Please let me know if anything changes with your status."
+).split()
+
+def make_chunks(count: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    # Model deltas are usually one short word or word fragment
+    return [rng.choice(WORDS) + " " for _ in range(count)]
+
+def legacy_scan(chunks: list) -> int:
+    kept = 0
+    for content in chunks:
+        if not any(keyword in content.lower() for keyword in DEFAULT_BLOCKED_KEYWORDS):
+            kept += len(content)
+    return kept
+
+def streaming_filter(chunks: list) -> int:
+    kept = 0
+    stream = content_filter.stream()
+    for content in chunks:
+        kept += len(stream.feed(content))
+    kept += len(stream.flush())
+    return kept
+
+def measure(fn, chunks: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(chunks)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.chunks)
+    for name, fn in (("legacy per-chunk scan", legacy_scan), ("compiled stream filter", streaming_filter)):
+        elapsed = measure(fn, chunks, args.repeat)
+        print(f"{name:24s} {args.chunks / elapsed / 1e6:6.2f} M chunks/s  {elapsed / args.chunks * 1e9:7.1f} ns/chunk  kept {fn(chunks)} chars")
@@ -0,0 +1,201 @@
+"""
+Check that every database.py read/update helper is served by the intended index.
+
+Runs against the scratch Postgres in EXPLAIN_DATABASE_URL; the application's DATABASE_URL
+(e.g. from .env) is never used. The schema is migrated, and with --seed the tables are
+truncated and refilled with generated data (by default 200k sessions, 2M chat messages and
+2M questionnaire answers) and analyzed. Seeding refuses to touch tables that hold rows this
+script did not generate; it records its own runs in the explain_indexes_seed table.
+Each helper is then called with its SQL routed through `EXPLAIN (FORMAT JSON)` instead of
+being executed, and the plan must use the expected index and no sequential scan.
+
+    EXPLAIN_DATABASE_URL=postgresql://localhost/scoby_explain python benchmarks/explain_indexes.py --seed
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import asyncpg
+
+import database
+from migrate import run_migrations
+
+TABLES = ("sessions", "chat_messages", "questionnaire_answers")
+# Created by --seed before it truncates; its presence means the tables hold only generated data
+SEED_MARKER_SQL = "CREATE TABLE IF NOT EXISTS explain_indexes_seed (seeded_at timestamptz NOT NULL DEFAULT now())"
+
+SEED_SQL = [
+    "TRUNCATE sessions, chat_messages, questionnaire_answers",
+    """
+    INSERT INTO sessions (session_id, questionnaire_id, created_at, last_updated, is_questionnaire_complete)
+    SELECT gen_random_uuid(), 'questionnaire_' || (i % 40), now() - i * interval '1 minute',
+           now() - i * interval '1 minute' + interval '20 minutes', i % 3 = 0
+    FROM generate_series(1, $1) AS i
+    """,
+    """
+    INSERT INTO chat_messages (session_id, role, content, timestamp)
+    SELECT s.session_id, CASE WHEN m % 2 = 1 THEN 'user' ELSE 'assistant' END,
+           'Seeded message ' || m || ' for the index check', s.created_at + m * interval '10 seconds'
+    FROM sessions s CROSS JOIN generate_series(1, $1) AS m
+    """,
+    """
+    INSERT INTO questionnaire_answers (session_id, question_id, question_text, answer, type, created_at)
+    SELECT s.session_id, 'question_' || q, 'Seeded question ' || q,
+           CASE WHEN q % 4 = 0 THEN NULL ELSE 'answer ' || q END, 'text', s.created_at + q * interval '30 seconds'
+    FROM sessions s CROSS JOIN generate_series(1, $1) AS q
+    """,
+    "ANALYZE sessions, chat_messages, questionnaire_answers",
+]
+
+class ExplainingConnection:
+    """Runs EXPLAIN for each statement a helper sends and records the plan; the helper sees no rows"""
+
+    def __init__(self, conn: asyncpg.Connection, plans: List[Tuple[str, Dict[str, Any]]]):
+        self.conn = conn
+        self.plans = plans
+
+    async def _explain(self, sql: str, args: tuple) -> None:
+        plan = await self.conn.fetchval(f"EXPLAIN (FORMAT JSON) {sql}", *args)
+        self.plans.append((" ".join(sql.split()), json.loads(plan)[0]["Plan"]))
+
+    async def execute(self, sql: str, *args, timeout: Optional[float] = None) -> str:
+        await self._explain(sql, args)
+        return "EXPLAIN"
+
+    async def fetch(self, sql: str, *args, timeout: Optional[float] = None) -> list:
+        await self._explain(sql, args)
+        return []
+
+    async def fetchrow(self, sql: str, *args, timeout: Optional[float] = None) -> None:
+        await self._explain(sql, args)
+        return None
+
+    async def fetchval(self, sql: str, *args, column: int = 0, timeout: Optional[float] = None) -> None:
+        await self._explain(sql, args)
+        return None
+
+class ExplainingPool:
+    def __init__(self, pool: asyncpg.Pool):
+        self.pool = pool
+        self.plans: List[Tuple[str, Dict[str, Any]]] = []
+
+    @asynccontextmanager
+    async def acquire(self, timeout: Optional[float] = None):
+        async with self.pool.acquire(timeout=timeout) as conn:
+            yield ExplainingConnection(conn, self.plans)
+
+async def seeded_by_this_script(conn: asyncpg.Connection) -> bool:
+    """True if the tables are empty or were filled by an earlier --seed run"""
+    if await conn.fetchval("SELECT to_regclass('explain_indexes_seed')") is not None:
+        return True
+    for table in TABLES:
+        if await conn.fetchval(f"SELECT EXISTS (SELECT 1 FROM {table})"):
+            return False
+    return True
+
+def _nodes(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from _nodes(child)
+
+def scans(plan: Dict[str, Any]) -> Tuple[Set[str], Set[str]]:
+    """(indexes used, relations read by sequential scan) anywhere in a plan"""
+    indexes, seq_scans = set(), set()
+    for node in _nodes(plan):
+        if node.get("Index Name"):
+            indexes.add(node["Index Name"])
+        if node.get("Node Type") == "Seq Scan":
+            seq_scans.add(node.get("Relation Name"))
+    return indexes, seq_scans
+
+async def main(args: argparse.Namespace) -> int:
+    url = os.getenv("EXPLAIN_DATABASE_URL")
+    if not url:
+        print("EXPLAIN_DATABASE_URL is not set; point it at a scratch database", file=sys.stderr)
+        return 2
+    # database.py reads DATABASE_URL when the pool opens; never fall through to the app's own
+    os.environ["DATABASE_URL"] = url
+    pool = await database.init_db_pool()
+    await run_migrations()
+    if args.seed:
+        async with pool.acquire() as conn:
+            safe = await seeded_by_this_script(conn)
+        if not safe:
+            print("Refusing to seed: the tables hold data this script did not generate", file=sys.stderr)
+            await database.close_db_pool()
+            return 2
+        async with pool.acquire() as conn:
+            # Marked before truncating, so a run that fails halfway can be repeated
+            await conn.execute(SEED_MARKER_SQL)
+            await conn.execute("INSERT INTO explain_indexes_seed DEFAULT VALUES")
+            await conn.execute(SEED_SQL[0])
+            await conn.execute(SEED_SQL[1], args.sessions)
+            await conn.execute(SEED_SQL[2], args.messages)
+            await conn.execute(SEED_SQL[3], args.answers)
+            await conn.execute(SEED_SQL[4])
+    async with pool.acquire() as conn:
+        session_id = await conn.fetchval("SELECT session_id FROM sessions ORDER BY created_at DESC LIMIT 1")
+        counts = {table: await conn.fetchval(f"SELECT count(*) FROM {table}")
+                  for table in TABLES}
+    if session_id is None:
+        print("No sessions found; run with --seed", file=sys.stderr)
+        return 2
+
+    since = datetime.now(timezone.utc)
+    # (helper, arguments, indexes its plan must use)
+    checks = [
+        (database.get_session_from_db, (session_id,), {"sessions_pkey"}),
+        (database.hydrate_session, (session_id,), {"sessions_pkey", "chat_messages_session_timestamp_idx"}),
+        (database.hydrate_session, (session_id, since), {"sessions_pkey", "chat_messages_session_timestamp_idx"}),
+        (database.get_chat_messages_from_db, (session_id,), {"chat_messages_session_timestamp_idx"}),
+        (database.get_chat_messages_since, (session_id, since), {"chat_messages_session_timestamp_idx"}),
+        (database.get_questionnaire_answers, (session_id,), {"questionnaire_answers_session_question_key"}),
+        (database.get_questionnaire_answers_for_session, (session_id,), {"questionnaire_answers_session_question_key"}),
+        (database.get_unanswered_questions, (session_id,), {"questionnaire_answers_unanswered_idx"}),
+        (database.update_questionnaire_answer, (session_id, "question_1", "answer"), {"questionnaire_answers_session_question_key"}),
+        (database.update_session_questionnaire, (session_id, "questionnaire_1"), {"sessions_pkey"}),
+        (database.mark_questionnaire_complete, (session_id,), {"sessions_pkey"}),
+    ]
+
+    explaining = ExplainingPool(pool)
+    database._pool = explaining
+    # Send the SQL text so ExplainingConnection sees it instead of prepared statements
+    database.statements.enabled = False
+    failures = 0
+    print(f"rows: {counts}")
+    try:
+        for helper, helper_args, expected in checks:
+            name = helper.__name__
+            before = len(explaining.plans)
+            await helper(*helper_args)
+            for sql, plan in explaining.plans[before:]:
+                indexes, seq_scans = scans(plan)
+                ok = expected <= indexes and not seq_scans
+                failures += not ok
+                status = "ok" if ok else "FAIL"
+                print(f"{status:4} {name}: indexes={sorted(indexes)} seq_scans={sorted(seq_scans)} cost={plan['Total Cost']}")
+                if not ok:
+                    print(f"     expected {sorted(expected)} for: {sql}")
+    finally:
+        database._pool = pool
+        await database.close_db_pool()
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", action="store_true", help="truncate the tables and generate data first")
+    parser.add_argument("--sessions", type=int, default=200_000, help="seeded sessions")
+    parser.add_argument("--messages", type=int, default=10, help="seeded chat messages per session")
+    parser.add_argument("--answers", type=int, default=10, help="seeded questionnaire answers per session")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,305 @@
+"""
+asyncpg-compatible in-memory stand-in for the Postgres pool used by database.py.
+
+Statements are matched by regex against whitespace-normalized SQL and served from Python
+dicts, so the real helpers run unmodified. Every call that would be a network round-trip
+on asyncpg (execute, fetch*, executemany, BEGIN/COMMIT) is counted, and an optional
+per-round-trip latency models a remote server.
+
+    pool = FakePool(latency=0.001, init=database.statements.prepare_all)
+    database._pool = pool          # init_db_pool() then leaves it in place
+"""
+import asyncio
+import re
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+def _normalize(sql: str) -> str:
+    return " ".join(sql.split())
+
+def _uuid(value: Any) -> uuid.UUID:
+    # asyncpg encodes str arguments for uuid columns, so the stub accepts both
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+class FakeDatabase:
+    """The tables the app uses, keyed the way their primary/unique keys are"""
+
+    def __init__(self):
+        self.sessions: Dict[uuid.UUID, Dict[str, Any]] = {}
+        self.chat_messages: Dict[uuid.UUID, List[Dict[str, Any]]] = {}
+        self.questionnaire_answers: Dict[uuid.UUID, Dict[str, Dict[str, Any]]] = {}
+
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now(timezone.utc)
+
+    def insert_session(self, session_id):
+        session_id = _uuid(session_id)
+        if session_id in self.sessions:
+            return []
+        now = self._now()
+        self.sessions[session_id] = {
+            "session_id": session_id,
+            "questionnaire_id": None,
+            "created_at": now,
+            "last_updated": now,
+            "is_questionnaire_complete": False,
+        }
+        return [dict(self.sessions[session_id])]
+
+    def session(self, session_id):
+        session = self.sessions.get(_uuid(session_id))
+        return [session] if session is not None else []
+
+    def hydrate(self, session_id, since=None):
+        """The session row with its messages as parallel arrays, like the lateral array_agg query"""
+        session = self.sessions.get(_uuid(session_id))
+        if session is None:
+            return []
+        messages = self.messages(session_id, since)
+        # array_agg over no rows is NULL
+        arrays = {f"{column}s": [m[column] for m in messages] or None for column in ("role", "content", "timestamp")}
+        return [{**session, **arrays}]
+
+    def set_questionnaire(self, questionnaire_id, session_id):
+        session_id = _uuid(session_id)
+        session = self.sessions.get(session_id)
+        if session is None:
+            return "UPDATE 0"
+        session.update(questionnaire_id=questionnaire_id, last_updated=self._now())
+        return "UPDATE 1"
+
+    def mark_complete(self, session_id):
+        session_id = _uuid(session_id)
+        session = self.sessions.get(session_id)
+        if session is None:
+            return "UPDATE 0"
+        session.update(is_questionnaire_complete=True, last_updated=self._now())
+        return "UPDATE 1"
+
+    def upsert_answer(self, session_id, question_id, question_text, answer, answer_type):
+        session_id = _uuid(session_id)
+        answers = self.questionnaire_answers.setdefault(session_id, {})
+        row = answers.get(question_id)
+        if row is None:
+            answers[question_id] = {
+                "question_id": question_id,
+                "question_text": question_text,
+                "answer": answer,
+                "type": answer_type,
+                "created_at": self._now(),
+            }
+        else:
+            row.update(question_text=question_text, answer=answer, type=answer_type)
+        return "INSERT 0 1"
+
+    def update_answer(self, answer, session_id, question_id):
+        session_id = _uuid(session_id)
+        row = self.questionnaire_answers.get(session_id, {}).get(question_id)
+        if row is None:
+            return "UPDATE 0"
+        row["answer"] = answer
+        return "UPDATE 1"
+
+    def answers(self, session_id):
+        session_id = _uuid(session_id)
+        return sorted(self.questionnaire_answers.get(session_id, {}).values(), key=lambda r: r["created_at"])
+
+    def unanswered(self, session_id):
+        return [{"question_id": r["question_id"]} for r in self.answers(session_id) if r["answer"] is None]
+
+    def insert_message(self, session_id, role, content):
+        session_id = _uuid(session_id)
+        timestamp = self._now()
+        messages = self.chat_messages.setdefault(session_id, [])
+        # Postgres now() is monotonic per transaction; keep the stub strictly increasing too
+        if messages and timestamp <= messages[-1]["timestamp"]:
+            timestamp = messages[-1]["timestamp"] + _EPSILON
+        messages.append({"role": role, "content": content, "timestamp": timestamp})
+        return timestamp
+
+    def insert_message_at(self, session_id, role, content, timestamp):
+        """Write-behind inserts carry the timestamp the app assigned"""
+        self.chat_messages.setdefault(_uuid(session_id), []).append({"role": role, "content": content, "timestamp": timestamp})
+        return "INSERT 0 1"
+
+    def messages(self, session_id, since=None):
+        session_id = _uuid(session_id)
+        rows = self.chat_messages.get(session_id, [])
+        if since is not None:
+            rows = [r for r in rows if r["timestamp"] > since]
+        return [dict(r) for r in rows]
+
+    def schema_migrations(self):
+        """The stand-in has every table and index, so report every migration as applied"""
+        from migrate import load_migrations
+        return [{"version": m.version} for m in load_migrations()]
+
+_EPSILON = timedelta(microseconds=1)
+
+# (pattern, handler(db, *args)) pairs; handlers return rows for fetch*, a status string for execute
+Handler = Callable[..., Any]
+
+STATEMENTS: List[Tuple[re.Pattern, Handler]] = [
+    (re.compile(r"^INSERT INTO sessions \(session_id\) VALUES"), FakeDatabase.insert_session),
+    (re.compile(r"^UPDATE sessions SET questionnaire_id = \$1"), FakeDatabase.set_questionnaire),
+    (re.compile(r"^UPDATE sessions SET is_questionnaire_complete = true"), FakeDatabase.mark_complete),
+    (re.compile(r"^INSERT INTO questionnaire_answers .* ON CONFLICT"), FakeDatabase.upsert_answer),
+    (re.compile(r"^UPDATE questionnaire_answers SET answer = \$1"), FakeDatabase.update_answer),
+    (re.compile(r"^SELECT question_id FROM questionnaire_answers WHERE session_id = \$1 AND answer IS NULL"),
+     FakeDatabase.unanswered),
+    (re.compile(r"^SELECT question_id, answer(, created_at)? FROM questionnaire_answers WHERE session_id = \$1"),
+     FakeDatabase.answers),
+    (re.compile(r"^INSERT INTO chat_messages \(session_id, role, content\) VALUES .* RETURNING timestamp"),
+     FakeDatabase.insert_message),
+    (re.compile(r"^INSERT INTO chat_messages \(session_id, role, content, timestamp\) VALUES"),
+     FakeDatabase.insert_message_at),
+    (re.compile(r"^SELECT role, content, timestamp FROM chat_messages WHERE session_id = \$1 AND timestamp > \$2"),
+     FakeDatabase.messages),
+    (re.compile(r"^SELECT role, content, timestamp FROM chat_messages WHERE session_id = \$1"),
+     FakeDatabase.messages),
+    (re.compile(r"^SELECT session_id, questionnaire_id, created_at, last_updated, is_questionnaire_complete FROM sessions"),
+     FakeDatabase.session),
+    (re.compile(r"^SELECT s\.session_id, .* FROM sessions s LEFT JOIN LATERAL"), FakeDatabase.hydrate),
+    (re.compile(r"^SELECT version FROM schema_migrations"), FakeDatabase.schema_migrations),
+]
+
+class FakeTransaction:
+    def __init__(self, connection: "FakeConnection"):
+        self.connection = connection
+
+    async def __aenter__(self):
+        await self.connection._round_trip("BEGIN")
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.connection._round_trip("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+class FakePreparedStatement:
+    """A statement parsed once; executing it costs one round-trip like the SQL-text methods"""
+
+    def __init__(self, connection: "FakeConnection", sql: str):
+        self.connection = connection
+        self.sql = sql
+
+    async def fetch(self, *args, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        return await self.connection.fetch(self.sql, *args)
+
+    async def fetchrow(self, *args, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        return await self.connection.fetchrow(self.sql, *args)
+
+    async def fetchval(self, *args, column: int = 0, timeout: Optional[float] = None) -> Any:
+        return await self.connection.fetchval(self.sql, *args, column=column)
+
+    async def executemany(self, args, *, timeout: Optional[float] = None) -> None:
+        await self.connection.executemany(self.sql, args)
+
+class FakeConnection:
+    def __init__(self, pool: "FakePool"):
+        self.pool = pool
+
+    async def _round_trip(self, label: str) -> None:
+        self.pool.round_trips += 1
+        self.pool.statements[label] = self.pool.statements.get(label, 0) + 1
+        if self.pool.latency:
+            await asyncio.sleep(self.pool.latency)
+
+    def _handler(self, sql: str) -> Handler:
+        normalized = _normalize(sql)
+        for pattern, handler in STATEMENTS:
+            if pattern.search(normalized):
+                return handler
+        raise NotImplementedError(f"FakeConnection has no handler for: {normalized}")
+
+    async def _run(self, sql: str, args: tuple) -> Any:
+        handler = self._handler(sql)
+        await self._round_trip(_normalize(sql).split(" ", 1)[0].upper())
+        return handler(self.pool.db, *args)
+
+    async def execute(self, sql: str, *args, timeout: Optional[float] = None) -> str:
+        result = await self._run(sql, args)
+        return result if isinstance(result, str) else "SELECT"
+
+    async def executemany(self, sql: str, args, timeout: Optional[float] = None) -> None:
+        handler = self._handler(sql)
+        # asyncpg pipelines executemany as a single round-trip
+        await self._round_trip("EXECUTEMANY")
+        for row in args:
+            handler(self.pool.db, *row)
+
+    async def fetch(self, sql: str, *args, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        return list(await self._run(sql, args))
+
+    async def fetchrow(self, sql: str, *args, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        rows = await self._run(sql, args)
+        return rows[0] if rows else None
+
+    async def fetchval(self, sql: str, *args, column: int = 0, timeout: Optional[float] = None) -> Any:
+        result = await self._run(sql, args)
+        if isinstance(result, list):
+            return list(result[0].values())[column] if result else None
+        return result
+
+    async def prepare(self, sql: str, *, name: Optional[str] = None, timeout: Optional[float] = None) -> FakePreparedStatement:
+        self._handler(sql)
+        await self._round_trip("PREPARE")
+        return FakePreparedStatement(self, sql)
+
+    def is_in_transaction(self) -> bool:
+        return False
+
+    def transaction(self) -> FakeTransaction:
+        return FakeTransaction(self)
+
+    async def close(self) -> None:
+        pass
+
+class FakePool:
+    """
+    The subset of asyncpg.Pool that database.py uses, plus round-trip accounting.
+    Up to `max_size` connections are opened on demand and reused; `init` runs on each new one,
+    like asyncpg's pool `init` callback.
+    """
+
+    def __init__(self, latency: float = 0.0, db: Optional[FakeDatabase] = None,
+                 init: Optional[Callable[[FakeConnection], Awaitable[None]]] = None, max_size: int = 10):
+        self.latency = latency
+        self.db = db or FakeDatabase()
+        self.init = init
+        self.max_size = max_size
+        self.connections = 0
+        self._idle: List[FakeConnection] = []
+        self._slots = asyncio.Semaphore(max_size)
+        self.round_trips = 0
+        self.statements: Dict[str, int] = {}
+
+    async def _connect(self) -> FakeConnection:
+        connection = FakeConnection(self)
+        self.connections += 1
+        if self.init is not None:
+            await self.init(connection)
+        return connection
+
+    @asynccontextmanager
+    async def acquire(self, timeout: Optional[float] = None):
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else await self._connect()
+            try:
+                yield connection
+            finally:
+                self._idle.append(connection)
+
+    async def warm(self) -> None:
+        """Open every connection up front, like min_size == max_size"""
+        while self.connections < self.max_size:
+            self._idle.append(await self._connect())
+
+    async def close(self) -> None:
+        pass
+
+    def reset_counters(self) -> None:
+        self.round_trips = 0
+        self.statements = {}
@@ -0,0 +1,97 @@
+"""
+Local stand-in for the MD Integrations partner API.
+
+Serves a generated questionnaire catalog and questionnaire fixtures (with rules, so the
+simplified schema has real dependencies) plus the client_credentials token endpoint.
+Every response is delayed by `latency` seconds, and questionnaire reads honour
+If-None-Match so the revalidation path in MDI.py is exercised.
+
+    app = create_app(latency=0.02)
+    # then MDI_BASE_URL=http://127.0.0.1:<port>/v1/partner/
+"""
+import asyncio
+import hashlib
+import json
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+def questionnaire_fixture(index: int, questions: int = 25) -> Dict[str, Any]:
+    questionnaire_id = f"bench-questionnaire-{index}"
+    items = []
+    for q in range(questions):
+        question_id = f"{questionnaire_id}-q{q}"
+        item = {
+            "partner_questionnaire_question_id": question_id,
+            "title": f"Question {q} of questionnaire {index}?",
+            "description": "Generated fixture question",
+            "order": q + 2,
+            "type": "single_option" if q % 3 == 0 else "text",
+            "options": [],
+            "rules": [],
+        }
+        if q % 3 == 0:
+            item["options"] = [
+                {"partner_questionnaire_question_option_id": f"{question_id}-o{o}", "option": f"Option {o}", "order": o}
+                for o in range(4)
+            ]
+        if q and q % 4 == 0:
+            # Shown only for one answer of the closest earlier option question
+            parent = f"{questionnaire_id}-q{(q - 1) // 3 * 3}"
+            item["rules"] = [{
+                "id": f"{question_id}-rule",
+                "type": "and",
+                "requirements": [{"based_on": "option", "required_question_id": parent, "required_answer": f"{parent}-o1"}],
+            }]
+        items.append(item)
+    return {
+        "partner_questionnaire_id": questionnaire_id,
+        "name": f"Benchmark questionnaire {index}",
+        "active": True,
+        "questions": items,
+    }
+
+def _etag(body: Any) -> str:
+    return '"' + hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest() + '"'
+
+def create_app(latency: float = 0.0, questionnaires: int = 20) -> FastAPI:
+    app = FastAPI()
+    app.state.requests = 0
+    fixtures: Dict[str, Dict[str, Any]] = {}
+    for i in range(questionnaires):
+        fixture = questionnaire_fixture(i)
+        fixtures[fixture["partner_questionnaire_id"]] = fixture
+    catalog: List[Dict[str, Any]] = [
+        {k: v for k, v in fixture.items() if k != "questions"} for fixture in fixtures.values()
+    ]
+
+    @app.middleware("http")
+    async def inject_latency(request: Request, call_next):
+        app.state.requests += 1
+        if latency:
+            await asyncio.sleep(latency)
+        return await call_next(request)
+
+    def conditional(request: Request, body: Any) -> Response:
+        etag = _etag(body)
+        if request.headers.get("If-None-Match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return JSONResponse(body, headers={"ETag": etag})
+
+    @app.post("/v1/partner/auth/token")
+    async def token():
+        return {"access_token": "bench-token", "token_type": "Bearer", "expires_in": 3600}
+
+    @app.get("/v1/partner/questionnaires")
+    async def list_questionnaires(request: Request):
+        return conditional(request, catalog)
+
+    @app.get("/v1/partner/questionnaires/{questionnaire_id}")
+    async def get_questionnaire(questionnaire_id: str, request: Request):
+        fixture = fixtures.get(questionnaire_id)
+        if fixture is None:
+            return JSONResponse({"message": "Not found"}, status_code=404)
+        return conditional(request, fixture)
+
+    return app
@@ -0,0 +1,172 @@
+"""
+Local stand-in for the OpenAI Chat Completions API.
+
+Streams `chat.completion.chunk` events at a fixed token rate after a configurable
+time-to-first-token, so the real AsyncOpenAI client in llm.py is exercised over HTTP.
+When tools are offered and the latest non-system message is from the user, the first round answers
+with tool calls instead of text; the following round (after the tool results) streams text.
+
+Prompt caching is modelled on the provider's: the serialized tools + messages are hashed
+in 128-token blocks per model and prompt_cache_key, prefixes of at least 1024 tokens seen
+before count as cached, and only uncached prompt tokens add prefill time to the
+time-to-first-token. Usage (with cached_tokens) is sent when stream_options asks for it.
+
+    app = create_app(FakeOpenAIConfig(tokens=60, tokens_per_second=200))
+    # then OPENAI_BASE_URL=http://127.0.0.1:<port>/v1
+"""
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+@dataclass
+class FakeOpenAIConfig:
+    tokens: int = 60
+    tokens_per_second: float = 200.0
+    time_to_first_token: float = 0.05
+    tool_calls: bool = True
+    prefill_tokens_per_second: float = 20000.0
+
+# Provider-style prompt cache granularity, in serialized bytes (~4 bytes per token)
+CACHE_BLOCK_BYTES = 128 * 4
+CACHE_MIN_BYTES = 1024 * 4
+
+class PromptCache:
+    """Prefix blocks seen per (model, prompt_cache_key), with running token totals"""
+
+    def __init__(self):
+        self.blocks = set()
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def lookup(self, model: str, cache_key: str, body: Dict[str, Any]) -> Tuple[int, int]:
+        """Return (prompt_tokens, cached_tokens) for a request and remember its prefix blocks"""
+        prompt = json.dumps({"tools": body.get("tools") or [], "messages": body.get("messages") or []},
+                            separators=(",", ":"), ensure_ascii=False).encode()
+        digest = hashlib.sha256(f"{model}|{cache_key}".encode())
+        cached_bytes = 0
+        still_cached = True
+        for start in range(0, len(prompt) - CACHE_BLOCK_BYTES + 1, CACHE_BLOCK_BYTES):
+            digest.update(prompt[start:start + CACHE_BLOCK_BYTES])
+            block = digest.digest()
+            if still_cached and block in self.blocks:
+                cached_bytes = start + CACHE_BLOCK_BYTES
+            else:
+                still_cached = False
+                self.blocks.add(block)
+        prompt_tokens = len(prompt) // 4
+        cached_tokens = cached_bytes // 4 if cached_bytes >= CACHE_MIN_BYTES else 0
+        self.prompt_tokens += prompt_tokens
+        self.cached_tokens += cached_tokens
+        return prompt_tokens, cached_tokens
+
+def _tool_calls(questionnaire_id: str) -> List[Dict[str, Any]]:
+    """One read against MDI and two answer saves, the mix a typical intake round produces"""
+    calls = [
+        ("get_simplified_questionnaire", {"questionnaire_id": questionnaire_id}),
+        ("save_questionnaire_answer", {
+            "question_text": "What is your biological sex?", "answer": "0",
+            "question_id": "standard_sex", "answer_type": "boolean",
+        }),
+        ("save_questionnaire_answer", {
+            "question_text": "Do you have any drug allergies or intolerances?", "answer": "None",
+            "question_id": "standard_allergies", "answer_type": "text",
+        }),
+    ]
+    return [
+        {
+            "index": i,
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {"name": name, "arguments": json.dumps(arguments)},
+        }
+        for i, (name, arguments) in enumerate(calls)
+    ]
+
+def _chunk(completion_id: str, model: str, delta: Dict[str, Any], finish_reason: Any = None) -> bytes:
+    body = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(body)}\n\n".encode()
+
+def create_app(config: FakeOpenAIConfig) -> FastAPI:
+    app = FastAPI()
+    app.state.requests = 0
+    app.state.prompt_cache = PromptCache()
+
+    def prefill_seconds(prompt_tokens: int, cached_tokens: int) -> float:
+        if config.prefill_tokens_per_second <= 0:
+            return 0.0
+        return (prompt_tokens - cached_tokens) / config.prefill_tokens_per_second
+
+    async def stream(model: str, wants_tools: bool, first_token_delay: float, usage: Optional[Dict[str, Any]]):
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        await asyncio.sleep(first_token_delay)
+        if wants_tools:
+            for tool_call in _tool_calls("bench-questionnaire-0"):
+                yield _chunk(completion_id, model, {"role": "assistant", "tool_calls": [tool_call]})
+            yield _chunk(completion_id, model, {}, "tool_calls")
+        else:
+            interval = 1.0 / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+            start = time.perf_counter()
+            for i in range(config.tokens):
+                # Pace against the start time so event-loop jitter does not accumulate
+                delay = start + i * interval - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                yield _chunk(completion_id, model, {"role": "assistant", "content": f"word{i} "})
+            yield _chunk(completion_id, model, {}, "stop")
+        if usage is not None:
+            body = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": model, "choices": [], "usage": usage,
+            }
+            yield f"data: {json.dumps(body)}\n\n".encode()
+        yield b"data: [DONE]\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        app.state.requests += 1
+        body = await request.json()
+        model = body.get("model", "gpt-4o-mini")
+        # Per-turn system context may follow the user's message; tool results mean the round is done
+        last_role = next((m.get("role") for m in reversed(body.get("messages") or []) if m.get("role") != "system"), None)
+        wants_tools = (
+            config.tool_calls and bool(body.get("tools")) and body.get("tool_choice") != "none" and last_role == "user"
+        )
+        prompt_tokens, cached_tokens = app.state.prompt_cache.lookup(model, body.get("prompt_cache_key") or "", body)
+        first_token_delay = config.time_to_first_token + prefill_seconds(prompt_tokens, cached_tokens)
+        if body.get("stream"):
+            usage = None
+            if (body.get("stream_options") or {}).get("include_usage"):
+                usage = {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": config.tokens,
+                    "total_tokens": prompt_tokens + config.tokens,
+                    "prompt_tokens_details": {"cached_tokens": cached_tokens},
+                }
+            return StreamingResponse(stream(model, wants_tools, first_token_delay, usage), media_type="text/event-stream")
+        await asyncio.sleep(first_token_delay)
+        return JSONResponse({
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps({"questionnaire_id": "bench-questionnaire-0"})},
+                "finish_reason": "stop",
+            }],
+        })
+
+    return app
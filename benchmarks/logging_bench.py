@@ -0,0 +1,66 @@
+"""
+Per-chunk logging overhead in the /chat streaming loop.
+
+Compares the old `print(f"Sending chunk: ...")` per token with the queued logger in its
+three production states: debug disabled, debug enabled with 1-in-N sampling, and debug
+enabled without sampling. stdout is redirected to /dev/null so terminal speed does not count.
+
+    python benchmarks/logging_bench.py --chunks 100000
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging_config
+
+def legacy_print(chunks: list) -> None:
+    for content in chunks:
+        chunk_data = f"data: {json.dumps({'type': 'content', 'content': content})}\n\n"
+        print(f"Sending chunk: {repr(content)} -> {repr(chunk_data)}")
+
+def queued_logger(chunks: list) -> None:
+    logger = logging.getLogger("main")
+    chunk_debug = logger.isEnabledFor(logging.DEBUG)
+    for content in chunks:
+        if chunk_debug and logging_config.chunk_sampler():
+            logger.debug("Sending chunk", extra={"chars": len(content)})
+
+def measure(fn, chunks: list) -> float:
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        fn(chunks)
+        elapsed = time.perf_counter() - start
+    return elapsed
+
+def run_logger(level: str, sample_every: str, chunks: list) -> float:
+    os.environ["LOG_LEVEL"] = level
+    os.environ["LOG_SAMPLE_EVERY"] = sample_every
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        logging_config.setup_logging()
+        start = time.perf_counter()
+        queued_logger(chunks)
+        elapsed = time.perf_counter() - start
+        # Draining the queue happens off the request path; stop before restoring stdout
+        logging_config.shutdown_logging()
+    return elapsed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=100000)
+    args = parser.parse_args()
+
+    chunks = [f" token{i % 50}" for i in range(args.chunks)]
+    results = [
+        ("print per chunk (before)", measure(legacy_print, chunks)),
+        ("logger, INFO level", run_logger("INFO", "100", chunks)),
+        ("logger, DEBUG 1/100 sampled", run_logger("DEBUG", "100", chunks)),
+        ("logger, DEBUG unsampled", run_logger("DEBUG", "1", chunks)),
+    ]
+    for name, elapsed in results:
+        print(f"{name:30s} {elapsed / args.chunks * 1e9:8.1f} ns/chunk")
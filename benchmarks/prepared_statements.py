@@ -0,0 +1,118 @@
+"""
+Per-query latency of the database.py read statements with and without the prepared-statement registry.
+
+Runs against the Postgres in DATABASE_URL (seed it first, e.g. with explain_indexes.py --seed).
+Each registered read statement is executed --iterations times on one pooled connection in
+three modes:
+
+    sql_text         SQL text with asyncpg's statement cache off: parse, plan and execute every call
+    statement_cache  SQL text with asyncpg's per-connection LRU cache (DB_PREPARED_STATEMENTS=false)
+    registry         statements prepared by the pool init callback and reused by name
+
+The server-side planning time of each query (EXPLAIN ANALYZE) is reported alongside: it is
+what sql_text pays on every call and what a reused prepared statement stops paying once
+Postgres settles on a generic plan.
+
+    DATABASE_URL=postgresql://localhost/scoby_explain python benchmarks/prepared_statements.py --iterations 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import asyncpg
+
+import database
+from statements import PreparedConnection
+
+MODES = {
+    # (statement_cache_size, registry enabled)
+    "sql_text": (0, False),
+    "statement_cache": (100, False),
+    "registry": (100, True),
+}
+
+def read_arguments(session_id: Any) -> Dict[str, Tuple[Any, ...]]:
+    since = datetime.now(timezone.utc)
+    return {
+        database.GET_SESSION: (session_id,),
+        database.HYDRATE_SESSION: (session_id,),
+        database.HYDRATE_SESSION_SINCE: (session_id, since),
+        database.GET_CHAT_MESSAGES: (session_id,),
+        database.GET_CHAT_MESSAGES_SINCE: (session_id, since),
+        database.GET_QUESTIONNAIRE_ANSWERS: (session_id,),
+        database.GET_QUESTIONNAIRE_ANSWERS_WITH_TIMES: (session_id,),
+        database.GET_UNANSWERED_QUESTIONS: (session_id,),
+    }
+
+async def planning_times(url: str, arguments: Dict[str, Tuple[Any, ...]]) -> Dict[str, float]:
+    conn = await asyncpg.connect(url)
+    try:
+        times = {}
+        for name, args in arguments.items():
+            plan = await conn.fetchval(f"EXPLAIN (ANALYZE, SUMMARY, FORMAT JSON) {database.statements.sql(name)}", *args)
+            times[name] = json.loads(plan)[0]["Planning Time"]
+        return times
+    finally:
+        await conn.close()
+
+async def run_mode(url: str, mode: str, arguments: Dict[str, Tuple[Any, ...]], iterations: int) -> Dict[str, Dict[str, float]]:
+    cache_size, enabled = MODES[mode]
+    database.statements.enabled = enabled
+    pool = await asyncpg.create_pool(
+        url, min_size=1, max_size=1, statement_cache_size=cache_size,
+        connection_class=PreparedConnection, init=database.statements.prepare_all,
+    )
+    results = {}
+    try:
+        async with pool.acquire() as conn:
+            for name, args in arguments.items():
+                latencies = []
+                for _ in range(iterations):
+                    start = time.perf_counter()
+                    await database.statements.fetch(conn, name, *args)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                results[name] = {
+                    "mean_ms": round(statistics.mean(latencies), 4),
+                    "p50_ms": round(statistics.median(latencies), 4),
+                }
+    finally:
+        await pool.close()
+    return results
+
+async def main(args: argparse.Namespace) -> int:
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        print("DATABASE_URL is not set", file=sys.stderr)
+        return 2
+    conn = await asyncpg.connect(url)
+    try:
+        session_id = await conn.fetchval("SELECT session_id FROM sessions ORDER BY created_at DESC LIMIT 1")
+    finally:
+        await conn.close()
+    if session_id is None:
+        print("No sessions found; seed the database first", file=sys.stderr)
+        return 2
+
+    arguments = read_arguments(session_id)
+    report: Dict[str, Any] = {"config": vars(args), "planning_ms": await planning_times(url, arguments), "modes": {}}
+    for mode in MODES:
+        report["modes"][mode] = await run_mode(url, mode, arguments, args.iterations)
+    print(json.dumps(report, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=1000, help="executions per statement and mode")
+    sys.exit(asyncio.run(main(parser.parse_args())))
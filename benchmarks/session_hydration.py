@@ -0,0 +1,100 @@
+"""
+Round-trips and latency of get_or_create_session against the earlier multi-query flow.
+
+The earlier flow looked the session row up, then loaded (or topped up) the chat history
+with a second query, and created a new session with a lookup miss followed by an INSERT.
+Both flows run against the stub Postgres pool with a fixed per-round-trip latency, over
+the scenarios /chat sees: a returning session with a cold or stale history cache, a new
+session, and an unknown session ID.
+
+    python benchmarks/session_hydration.py --sessions 200 --messages 20 --db-latency 0.002
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from session_cache import history_cache
+from fake_db import FakePool
+
+async def legacy_get_or_create_session(session_id: Optional[str] = None) -> None:
+    """The flow get_or_create_session replaced: session lookup, then history, or lookup miss then INSERT"""
+    if session_id:
+        if await database.get_session_from_db(session_id):
+            await database.get_chat_history(session_id)
+            return
+    new_session_id = database.generate_session_id()
+    await database.create_session_in_db(new_session_id)
+    history_cache.put(str(new_session_id), [])
+
+def seed(pool: FakePool, sessions: int, messages: int) -> List[str]:
+    session_ids = []
+    for _ in range(sessions):
+        session_id = database.generate_session_id()
+        pool.db.insert_session(session_id)
+        for i in range(messages):
+            pool.db.insert_message(session_id, "user" if i % 2 == 0 else "assistant", f"message {i} " * 20)
+        session_ids.append(str(session_id))
+    return session_ids
+
+async def measure(pool: FakePool, call: Callable[[Optional[str]], Awaitable[Any]], session_ids: List[Optional[str]],
+                  before_each: Callable[[Optional[str]], None]) -> Dict[str, float]:
+    pool.reset_counters()
+    latencies = []
+    for session_id in session_ids:
+        before_each(session_id)
+        start = time.perf_counter()
+        await call(session_id)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "round_trips_per_call": round(pool.round_trips / len(session_ids), 2),
+        "latency_mean_ms": round(statistics.mean(latencies), 3),
+        "latency_p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))], 3),
+    }
+
+async def main(args: argparse.Namespace) -> None:
+    pool = FakePool(latency=args.db_latency, init=database.statements.prepare_all)
+    await pool.warm()
+    pool.reset_counters()
+    database._pool = pool
+    session_ids = seed(pool, args.sessions, args.messages)
+    # Stale entries exist but must be revalidated against the database on every lookup
+    history_cache.ttl = 0
+
+    def cold(session_id: Optional[str]) -> None:
+        if session_id:
+            history_cache.invalidate(session_id)
+
+    def stale(session_id: Optional[str]) -> None:
+        if session_id:
+            # The two newest messages were written by another worker since this one cached the history
+            history_cache.put(session_id, pool.db.messages(session_id)[:-2])
+
+    scenarios = {
+        "returning_cold_cache": (session_ids, cold),
+        "returning_stale_cache": (session_ids, stale),
+        "new_session": ([None] * args.sessions, cold),
+        "unknown_session_id": ([str(database.generate_session_id()) for _ in range(args.sessions)], cold),
+    }
+    report: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for name, (ids, before_each) in scenarios.items():
+        report[name] = {
+            "before": await measure(pool, legacy_get_or_create_session, ids, before_each),
+            "after": await measure(pool, database.get_or_create_session, ids, before_each),
+        }
+    print(json.dumps({"config": vars(args), "scenarios": report}, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=200, help="sessions per scenario")
+    parser.add_argument("--messages", type=int, default=20, help="chat messages per seeded session")
+    parser.add_argument("--db-latency", type=float, default=0.002, help="stub Postgres latency per round-trip, seconds")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Returned by a loader when upstream answered 304 Not Modified for the cached ETag
+NOT_MODIFIED = object()
+
+LoaderResult = Union[Tuple[Any, Optional[str]], object]
+Loader = Callable[[Optional[str]], Awaitable[LoaderResult]]
+
+class _CacheEntry:
+    __slots__ = ("value", "etag", "fetched_at")
+
+    def __init__(self, value: Any, etag: Optional[str], fetched_at: float):
+        self.value = value
+        self.etag = etag
+        self.fetched_at = fetched_at
+
+class AsyncTTLCache:
+    """
+    In-process async cache with TTL, LRU eviction and stale-while-revalidate.
+
+    A loader is called with the ETag of the cached entry (or None) and returns either
+    `(value, etag)` or NOT_MODIFIED. Entries younger than `ttl` are served directly;
+    entries younger than `ttl + stale_ttl` are served stale while one background task
+    revalidates them. Concurrent misses for the same key share a single load.
+    Cached values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, name: str, ttl: float, max_entries: int, stale_ttl: float = 0.0):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, _CacheEntry]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._background: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.not_modified = 0
+        self.refresh_errors = 0
+        self.evictions = 0
+
+    async def get(self, key: Hashable, loader: Loader) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.fetched_at
+            if age < self.ttl:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry.value
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                self._revalidate_in_background(key, loader)
+                return entry.value
+        self.misses += 1
+        return await self._load(key, loader)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Drop one key, or every entry when no key is given"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "not_modified": self.not_modified,
+            "refresh_errors": self.refresh_errors,
+            "evictions": self.evictions,
+        }
+
+    async def _load(self, key: Hashable, loader: Loader) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key, loader))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield the shared load so one cancelled caller does not cancel it for everyone else
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: Hashable, loader: Loader) -> Any:
+        entry = self._entries.get(key)
+        result = await loader(entry.etag if entry else None)
+        self.refreshes += 1
+        if result is NOT_MODIFIED:
+            entry = self._entries.get(key)
+            if entry is None:
+                # Evicted while the conditional request was in flight; fetch the full body
+                result = await loader(None)
+            else:
+                self.not_modified += 1
+                entry.fetched_at = time.monotonic()
+                return entry.value
+        value, etag = result
+        self._store(key, value, etag)
+        return value
+
+    def _store(self, key: Hashable, value: Any, etag: Optional[str]) -> None:
+        self._entries[key] = _CacheEntry(value, etag, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _revalidate_in_background(self, key: Hashable, loader: Loader) -> None:
+        if key in self._inflight:
+            return
+
+        async def revalidate():
+            try:
+                await self._load(key, loader)
+            except Exception:
+                # Keep serving the stale value; the next request past stale_ttl will retry in the foreground
+                self.refresh_errors += 1
+                logger.exception("Background cache refresh failed", extra={"cache": self.name, "key": repr(key)})
+
+        task = asyncio.create_task(revalidate())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
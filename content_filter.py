@@ -0,0 +1,115 @@
+import re
+from typing import Iterable, List, Tuple
+
+# Fragments of tool plumbing the model sometimes echoes into its reply
+DEFAULT_BLOCKED_KEYWORDS = [
+    'questionnaire_id', 'status', 'tool_id', 'question_text',
+    'answer_type', 'executed', 'call_', 'uti_screen'
+]
+
+def _trie_regex(words: Iterable[str]) -> str:
+    """Regex alternation factored into a trie so matching never backtracks across siblings"""
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Greedy optional group: prefer the longest continuation, fall back to ending here
+        return "(?:" + body + ")?" if "" in node else body
+
+    return build(trie) or "(?!)"
+
+class ContentFilter:
+    """
+    Keyword redactor compiled once and shared by every stream.
+
+    All keywords are folded into a single trie-shaped regex that is matched against the
+    lowercased text, which is markedly cheaper than a case-insensitive regex. Use `stream()`
+    to get a per-response StreamFilter that also catches keywords split across chunks.
+    """
+
+    def __init__(self, keywords: Iterable[str] = DEFAULT_BLOCKED_KEYWORDS):
+        lowered = {k.lower() for k in keywords if k}
+        self.pattern = re.compile(_trie_regex(lowered))
+        # Used only for the rare text whose length changes when lowercased
+        self._pattern_ci = re.compile(_trie_regex(lowered), re.IGNORECASE)
+        self.max_carry = max((len(k) for k in lowered), default=1) - 1
+        # Every proper prefix of a keyword, reversed: a chunk whose reversed tail starts with one of
+        # these may continue into a match. Matching the reversed tail keeps the regex anchored at 0.
+        reversed_prefixes = {k[:i][::-1] for k in lowered for i in range(1, len(k))}
+        self._carry_pattern = re.compile(_trie_regex(reversed_prefixes))
+
+    def redact(self, text: str) -> str:
+        """Remove every keyword occurrence from a complete string"""
+        return self._redact(text)[0]
+
+    def stream(self) -> "StreamFilter":
+        return StreamFilter(self)
+
+    def _redact(self, text: str) -> Tuple[str, str]:
+        """Return the redacted text and its lowercased form"""
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            text = self._pattern_ci.sub("", text)
+            return text, text.lower()
+        match = self.pattern.search(lowered)
+        if match is None:
+            return text, lowered
+        # Lowercasing preserved offsets, so spans found in `lowered` apply to `text`
+        kept, position = [], 0
+        while match is not None:
+            kept.append(text[position:match.start()])
+            position = match.end()
+            match = self.pattern.search(lowered, position)
+        kept.append(text[position:])
+        text = "".join(kept)
+        return text, text.lower()
+
+    def _carry_length(self, lowered: str) -> int:
+        """Length of the longest suffix of `lowered` that could be the start of a keyword"""
+        if not self.max_carry:
+            return 0
+        match = self._carry_pattern.match(lowered[:-self.max_carry - 1:-1])
+        return match.end() if match else 0
+
+class StreamFilter:
+    """
+    Stateful filter for one streamed response.
+
+    Text that might be the beginning of a keyword is held back (at most the longest
+    keyword minus one character) until the next chunk settles it; call `flush()` when
+    the stream ends to release whatever is still held.
+    """
+
+    def __init__(self, content_filter: ContentFilter):
+        self._filter = content_filter
+        self._carry = ""
+
+    def feed(self, chunk: str) -> str:
+        text, lowered = self._filter._redact(self._carry + chunk if self._carry else chunk)
+        hold = self._filter._carry_length(lowered)
+        if hold:
+            self._carry = text[-hold:]
+            return text[:-hold]
+        self._carry = ""
+        return text
+
+    def flush(self) -> str:
+        text, self._carry = self._carry, ""
+        return text
+
+content_filter = ContentFilter()
+
+def filter_chunks(chunks: Iterable[str], content_filter: ContentFilter = content_filter) -> List[str]:
+    """Run a complete sequence of chunks through a fresh StreamFilter (handy for tests and benchmarks)"""
+    stream = content_filter.stream()
+    output = [stream.feed(chunk) for chunk in chunks]
+    output.append(stream.flush())
+    return output
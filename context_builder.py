@@ -0,0 +1,84 @@
+import os
+from typing import Any, Dict, List
+
+from pydantic import UUID4
+
+from database import get_questionnaire_answers_for_session
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:
+    # tiktoken is optional; fall back to the ~4 characters per token rule of thumb
+    _encoding = None
+
+# Chat format framing (role, separators) added per message by the API
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+def estimate_tokens(text: str) -> int:
+    """Fast local estimate of the prompt tokens a string costs"""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+def estimate_message_tokens(message: Dict[str, Any]) -> int:
+    return estimate_tokens(message.get("content") or "") + _MESSAGE_OVERHEAD_TOKENS
+
+def summarize_answers(answers: Dict[str, Any], token_budget: int) -> str:
+    """Compact listing of already-saved answers, truncated to fit `token_budget`"""
+    header = "Earlier parts of this conversation were omitted. Answers already recorded for this intake (do not ask these again):"
+    lines = [header]
+    used = estimate_tokens(header)
+    for question_id, saved in answers.items():
+        line = f"- {question_id}: {saved['answer'] if saved['answer'] is not None else '(no answer)'}"
+        cost = estimate_tokens(line) + 1
+        if used + cost > token_budget:
+            lines.append("- ...")
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(lines)
+
+async def build_context_messages(system_message: Dict[str, Any], chat_history: List[Dict[str, Any]], session_id: UUID4) -> List[Dict[str, Any]]:
+    """
+    Fit the chat history into CHAT_CONTEXT_TOKEN_BUDGET prompt tokens.
+
+    The system prompt and the latest turns are always kept (at least
+    CHAT_CONTEXT_MIN_RECENT_MESSAGES of them). When older turns do not fit, they are
+    replaced by a summary of the answers already saved for the session. The summary
+    changes as answers are saved, so it goes after the history to keep the prefix cacheable.
+    """
+    token_budget = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "12000"))
+    min_recent = int(os.getenv("CHAT_CONTEXT_MIN_RECENT_MESSAGES", "6"))
+    summary_budget = int(os.getenv("CHAT_CONTEXT_SUMMARY_TOKENS", "1500"))
+
+    history = [
+        {
+            "role": "user" if msg["role"] == "user" else "assistant",
+            "content": msg["content"]
+        }
+        for msg in chat_history
+    ]
+    costs = [estimate_message_tokens(msg) for msg in history]
+    available = token_budget - estimate_message_tokens(system_message)
+    if sum(costs) <= available:
+        return [system_message] + history
+
+    # Walk back from the newest message, reserving room for the answer summary
+    available -= summary_budget
+    keep_from = len(history)
+    used = 0
+    while keep_from > 0:
+        cost = costs[keep_from - 1]
+        if used + cost > available and len(history) - keep_from >= min_recent:
+            break
+        used += cost
+        keep_from -= 1
+
+    messages = [system_message] + history[keep_from:]
+    answers = await get_questionnaire_answers_for_session(session_id)
+    if answers:
+        messages.append({"role": "system", "content": summarize_answers(answers, summary_budget)})
+    return messages
@@ -1,159 +1,379 @@
 import os
 import uuid
+import asyncio
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, AsyncIterator, Tuple
 from pydantic import UUID4
 import asyncpg
 from models import ChatMessage, ChatSession
+from session_cache import history_cache
+from message_writer import ChatMessageWriter, PendingMessage
+from statements import PreparedConnection, StatementRegistry
+from metrics import observe_db
+from tracing import traced
 
-# Database connection
-async def get_db_connection():
-    """Get a database connection"""
+# App-lifetime connection pool, created by the FastAPI lifespan hook (or lazily on first use)
+_pool: Optional[asyncpg.Pool] = None
+_pool_lock = asyncio.Lock()
+
+def _get_database_url() -> str:
     database_url = os.getenv("DATABASE_URL")
     if not database_url:
         raise Exception("DATABASE_URL not found in environment variables")
-    return await asyncpg.connect(database_url)
+    return database_url
+
+# Every query below is registered by name and prepared once per pooled connection.
+# DB_PREPARED_STATEMENTS=false sends the SQL text instead (needed behind a transaction-mode pooler).
+statements = StatementRegistry(enabled=os.getenv("DB_PREPARED_STATEMENTS", "true").lower() in ("1", "true", "yes"))
+
+def db_helper(func):
+    """Record a latency histogram and a tracing span for every call of a database helper"""
+    return observe_db(traced(f"db.{func.__name__}", {"db.system": "postgresql"})(func))
+
+# Database connection
+async def get_db_connection():
+    """Get a standalone database connection (not pooled; the caller must close it)"""
+    return await asyncpg.connect(_get_database_url())
+
+async def init_db_pool() -> asyncpg.Pool:
+    """Create the shared connection pool. Sizing is read from the environment:
+    DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_STATEMENT_CACHE_SIZE and DB_POOL_MAX_INACTIVE_LIFETIME.
+    Each new connection prepares the registered statements before it is handed out."""
+    global _pool
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await asyncpg.create_pool(
+                _get_database_url(),
+                min_size=int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+                max_size=int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+                statement_cache_size=int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100")),
+                max_inactive_connection_lifetime=float(os.getenv("DB_POOL_MAX_INACTIVE_LIFETIME", "300")),
+                connection_class=PreparedConnection,
+                init=statements.prepare_all,
+            )
+    return _pool
+
+async def close_db_pool() -> None:
+    """Gracefully close the shared connection pool, after writing any buffered chat messages"""
+    global _pool
+    await chat_message_writer.close()
+    async with _pool_lock:
+        if _pool is not None:
+            await _pool.close()
+            _pool = None
+
+@asynccontextmanager
+async def db_connection() -> AsyncIterator[asyncpg.Connection]:
+    """Acquire a connection from the shared pool. DB_POOL_ACQUIRE_TIMEOUT bounds the wait for a free connection."""
+    pool = _pool or await init_db_pool()
+    async with pool.acquire(timeout=float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "10"))) as conn:
+        yield conn
 
 # Database helper functions
-async def create_session_in_db(session_id: UUID4) -> None:
-    conn = await get_db_connection()
-    try:
-        await conn.execute(
-            "INSERT INTO sessions (session_id) VALUES ($1)",
-            session_id
-        )
-    finally:
-        await conn.close()
+SESSION_COLUMNS = "session_id, questionnaire_id, created_at, last_updated, is_questionnaire_complete"
+
+# Returns no row when the ID is already taken, so a new session can never pick up someone else's
+CREATE_SESSION = statements.register("create_session", f"""
+    INSERT INTO sessions (session_id) VALUES ($1)
+    ON CONFLICT (session_id) DO NOTHING
+    RETURNING {SESSION_COLUMNS}
+""")
+
+@db_helper
+async def create_session_in_db(session_id: UUID4) -> Optional[Dict[str, Any]]:
+    """Insert a session and return its row, or None if the ID already exists"""
+    async with db_connection() as conn:
+        row = await statements.fetchrow(conn, CREATE_SESSION, session_id)
+        return dict(row) if row else None
+
+SET_SESSION_QUESTIONNAIRE = statements.register(
+    "set_session_questionnaire",
+    "UPDATE sessions SET questionnaire_id = $1, last_updated = now() WHERE session_id = $2",
+)
 
+@db_helper
 async def update_session_questionnaire(session_id: UUID4, questionnaire_id: str) -> None:
-    conn = await get_db_connection()
-    try:
-        await conn.execute(
-            "UPDATE sessions SET questionnaire_id = $1, last_updated = now() WHERE session_id = $2",
-            questionnaire_id, session_id
-        )
-    finally:
-        await conn.close()
+    async with db_connection() as conn:
+        await statements.execute(conn, SET_SESSION_QUESTIONNAIRE, questionnaire_id, session_id)
+
+MARK_QUESTIONNAIRE_COMPLETE = statements.register(
+    "mark_questionnaire_complete",
+    "UPDATE sessions SET is_questionnaire_complete = true, last_updated = now() WHERE session_id = $1",
+)
 
+@db_helper
 async def mark_questionnaire_complete(session_id: UUID4) -> None:
-    conn = await get_db_connection()
-    try:
-        await conn.execute(
-            "UPDATE sessions SET is_questionnaire_complete = true, last_updated = now() WHERE session_id = $1",
-            session_id
-        )
-    finally:
-        await conn.close()
+    async with db_connection() as conn:
+        await statements.execute(conn, MARK_QUESTIONNAIRE_COMPLETE, session_id)
+
+# Re-answering a question replaces the earlier answer; relies on the unique key on (session_id, question_id)
+# from migration 0002, which the app checks for at startup
+UPSERT_QUESTIONNAIRE_ANSWER = statements.register("upsert_questionnaire_answer", """
+    INSERT INTO questionnaire_answers (session_id, question_id, question_text, answer, type)
+    VALUES ($1, $2, $3, $4, $5)
+    ON CONFLICT (session_id, question_id)
+    DO UPDATE SET question_text = EXCLUDED.question_text, answer = EXCLUDED.answer, type = EXCLUDED.type
+""")
 
+@db_helper
 async def save_questionnaire_answer(session_id: UUID4, question_text: str, answer: Optional[str], question_id: str, answer_type: str) -> None:
-    conn = await get_db_connection()
-    try:
-        await conn.execute(
-            "INSERT INTO questionnaire_answers (session_id, question_id, question_text, answer, type) VALUES ($1, $2, $3, $4, $5)",
+    async with db_connection() as conn:
+        await statements.execute(
+            conn, UPSERT_QUESTIONNAIRE_ANSWER,
             session_id, question_id, question_text, answer, answer_type
         )
-    finally:
-        await conn.close()
 
+@db_helper
+async def save_questionnaire_answers_bulk(session_id: UUID4, answers: List[Dict[str, Any]]) -> None:
+    """
+    Upsert several answers for one session in a single transaction and round-trip.
+    Each answer is a dict with question_text, answer, question_id and answer_type;
+    if a question appears more than once, the last answer wins.
+    """
+    latest = {a["question_id"]: a for a in answers}
+    if not latest:
+        return
+    async with db_connection() as conn:
+        async with conn.transaction():
+            await statements.executemany(
+                conn, UPSERT_QUESTIONNAIRE_ANSWER,
+                [(session_id, a["question_id"], a["question_text"], a.get("answer"), a["answer_type"]) for a in latest.values()]
+            )
+
+GET_QUESTIONNAIRE_ANSWERS = statements.register(
+    "get_questionnaire_answers",
+    "SELECT question_id, answer FROM questionnaire_answers WHERE session_id = $1",
+)
+
+@db_helper
 async def get_questionnaire_answers(session_id: UUID4) -> List[Dict[str, Any]]:
-    conn = await get_db_connection()
-    try:
-        rows = await conn.fetch(
-            "SELECT question_id, answer FROM questionnaire_answers WHERE session_id = $1",
-            session_id
-        )
+    async with db_connection() as conn:
+        rows = await statements.fetch(conn, GET_QUESTIONNAIRE_ANSWERS, session_id)
         return [{"question_id": row["question_id"], "answer": row["answer"]} for row in rows]
-    finally:
-        await conn.close()
 
-async def add_chat_message(session_id: UUID4, role: str, content: str) -> None:
-    conn = await get_db_connection()
-    try:
-        await conn.execute(
-            "INSERT INTO chat_messages (session_id, role, content) VALUES ($1, $2, $3)",
-            session_id, role, content
+INSERT_CHAT_MESSAGES = statements.register(
+    "insert_chat_messages",
+    # The writer's timestamps are timezone-aware; binding them as timestamptz keeps the insert working
+    # against a legacy timestamp-without-time-zone column too (migration 0005 converts those)
+    "INSERT INTO chat_messages (session_id, role, content, timestamp) VALUES ($1, $2, $3, $4::timestamptz)",
+)
+
+@db_helper
+async def insert_chat_messages(messages: List[PendingMessage]) -> None:
+    """Insert buffered (session_id, message) pairs in one round-trip; asyncpg's executemany is all-or-nothing"""
+    async with db_connection() as conn:
+        await statements.executemany(
+            conn, INSERT_CHAT_MESSAGES,
+            [(session_id, m["role"], m["content"], m["timestamp"]) for session_id, m in messages]
         )
-    finally:
-        await conn.close()
 
+def _forget_dropped_message(message: PendingMessage) -> None:
+    """A message the writer gave up on must not stay in the history served from the cache"""
+    history_cache.invalidate(message[0])
+
+# CHAT_WRITE_BEHIND=false writes each message inline. Otherwise messages are batched every
+# CHAT_WRITE_FLUSH_INTERVAL_MS or CHAT_WRITE_BATCH_SIZE messages; CHAT_WRITE_MAX_PENDING bounds the buffer.
+# Buffered messages are only visible to this process: with several workers, route a session's
+# requests to one worker (sticky sessions) or set CHAT_WRITE_BEHIND=false, or a turn served
+# elsewhere can miss, and incrementally cache past, messages still queued here.
+_WRITE_BEHIND = os.getenv("CHAT_WRITE_BEHIND", "true").lower() in ("1", "true", "yes")
+chat_message_writer = ChatMessageWriter(
+    insert_chat_messages,
+    batch_size=int(os.getenv("CHAT_WRITE_BATCH_SIZE", "200")),
+    flush_interval=float(os.getenv("CHAT_WRITE_FLUSH_INTERVAL_MS", "50")) / 1000,
+    max_pending=int(os.getenv("CHAT_WRITE_MAX_PENDING", "10000")),
+    on_drop=_forget_dropped_message,
+)
+
+def _with_pending(session_id: UUID4, rows: List[Dict[str, Any]], since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Append this session's buffered messages that the database rows do not include yet"""
+    pending = chat_message_writer.pending(session_id)
+    if not pending:
+        return rows
+    # A batch being written may commit before these rows were read; its explicit timestamps identify it
+    stored = {row["timestamp"] for row in rows}
+    return rows + [m for m in pending if m["timestamp"] not in stored and (since is None or m["timestamp"] > since)]
+
+INSERT_CHAT_MESSAGE = statements.register(
+    "insert_chat_message",
+    "INSERT INTO chat_messages (session_id, role, content) VALUES ($1, $2, $3) RETURNING timestamp",
+)
+
+@db_helper
+async def add_chat_message(session_id: UUID4, role: str, content: str) -> None:
+    if _WRITE_BEHIND:
+        message = await chat_message_writer.add(session_id, role, content)
+    else:
+        async with db_connection() as conn:
+            timestamp = await statements.fetchval(conn, INSERT_CHAT_MESSAGE, session_id, role, content)
+        message = {"role": role, "content": content, "timestamp": timestamp}
+    history_cache.extend(str(session_id), [message])
+
+GET_SESSION = statements.register("get_session", f"SELECT {SESSION_COLUMNS} FROM sessions WHERE session_id = $1")
+
+@db_helper
 async def get_session_from_db(session_id: UUID4) -> Optional[Dict[str, Any]]:
-    conn = await get_db_connection()
-    try:
-        row = await conn.fetchrow(
-            "SELECT session_id, questionnaire_id, created_at, last_updated, is_questionnaire_complete FROM sessions WHERE session_id = $1",
-            session_id
-        )
+    async with db_connection() as conn:
+        row = await statements.fetchrow(conn, GET_SESSION, session_id)
         return dict(row) if row else None
-    finally:
-        await conn.close()
 
+# The session row and its messages, aggregated in a lateral subquery so a session without
+# messages still comes back (with NULL arrays). {since} optionally limits it to newer messages.
+_HYDRATE_SESSION_SQL = """
+    SELECT s.session_id, s.questionnaire_id, s.created_at, s.last_updated, s.is_questionnaire_complete,
+           m.roles, m.contents, m.timestamps
+    FROM sessions s
+    LEFT JOIN LATERAL (
+        SELECT array_agg(role ORDER BY timestamp) AS roles,
+               array_agg(content ORDER BY timestamp) AS contents,
+               array_agg(timestamp ORDER BY timestamp) AS timestamps
+        FROM chat_messages
+        WHERE session_id = s.session_id{since}
+    ) m ON true
+    WHERE s.session_id = $1
+"""
+HYDRATE_SESSION = statements.register("hydrate_session", _HYDRATE_SESSION_SQL.format(since=""))
+HYDRATE_SESSION_SINCE = statements.register("hydrate_session_since", _HYDRATE_SESSION_SQL.format(since=" AND timestamp > $2"))
+
+@db_helper
+async def hydrate_session(session_id: UUID4, since: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+    """
+    The session row with its chat messages under "messages", in one round-trip.
+    With `since`, only messages newer than it are returned. None if the session does not exist.
+    """
+    async with db_connection() as conn:
+        if since is None:
+            row = await statements.fetchrow(conn, HYDRATE_SESSION, session_id)
+        else:
+            row = await statements.fetchrow(conn, HYDRATE_SESSION_SINCE, session_id, since)
+    if row is None:
+        return None
+    session = {key: row[key] for key in ("session_id", "questionnaire_id", "created_at", "last_updated", "is_questionnaire_complete")}
+    session["messages"] = _with_pending(session_id, [
+        {"role": role, "content": content, "timestamp": timestamp}
+        for role, content, timestamp in zip(row["roles"] or [], row["contents"] or [], row["timestamps"] or [])
+    ], since)
+    return session
+
+GET_CHAT_MESSAGES = statements.register(
+    "get_chat_messages",
+    "SELECT role, content, timestamp FROM chat_messages WHERE session_id = $1 ORDER BY timestamp",
+)
+
+@db_helper
 async def get_chat_messages_from_db(session_id: UUID4) -> List[Dict[str, Any]]:
-    conn = await get_db_connection()
-    try:
-        rows = await conn.fetch(
-            "SELECT role, content, timestamp FROM chat_messages WHERE session_id = $1 ORDER BY timestamp",
-            session_id
-        )
-        return [dict(row) for row in rows]
-    finally:
-        await conn.close()
+    async with db_connection() as conn:
+        rows = await statements.fetch(conn, GET_CHAT_MESSAGES, session_id)
+    return _with_pending(session_id, [dict(row) for row in rows])
+
+GET_CHAT_MESSAGES_SINCE = statements.register(
+    "get_chat_messages_since",
+    "SELECT role, content, timestamp FROM chat_messages WHERE session_id = $1 AND timestamp > $2 ORDER BY timestamp",
+)
+
+@db_helper
+async def get_chat_messages_since(session_id: UUID4, since: datetime) -> List[Dict[str, Any]]:
+    async with db_connection() as conn:
+        rows = await statements.fetch(conn, GET_CHAT_MESSAGES_SINCE, session_id, since)
+    return _with_pending(session_id, [dict(row) for row in rows], since)
 
+@db_helper
+async def get_chat_history(session_id: UUID4) -> List[Dict[str, Any]]:
+    """
+    Chat history for a session, served from the in-memory history cache.
+    A stale cache entry is topped up with only the rows newer than its last timestamp;
+    a miss loads the full history once.
+    """
+    key = str(session_id)
+    messages, fresh = history_cache.lookup(key)
+    if messages is None:
+        messages = await get_chat_messages_from_db(session_id)
+        history_cache.put(key, messages)
+        return messages
+    if not fresh:
+        since = history_cache.last_timestamp(key)
+        if since is None:
+            newer = await get_chat_messages_from_db(session_id)
+        else:
+            newer = await get_chat_messages_since(session_id, since)
+        history_cache.extend(key, newer)
+        messages = messages + newer
+    return messages
+
+GET_UNANSWERED_QUESTIONS = statements.register("get_unanswered_questions", """
+    SELECT question_id
+    FROM questionnaire_answers
+    WHERE session_id = $1 AND answer IS NULL
+""")
+
+@db_helper
 async def get_unanswered_questions(session_id: UUID4) -> List[str]:
-    conn = await get_db_connection()
-    try:
-        rows = await conn.fetch(
-            """
-            SELECT question_id
-            FROM questionnaire_answers
-            WHERE session_id = $1 AND answer IS NULL
-            """,
-            session_id
-        )
+    async with db_connection() as conn:
+        rows = await statements.fetch(conn, GET_UNANSWERED_QUESTIONS, session_id)
         return [row['question_id'] for row in rows]
-    finally:
-        await conn.close()
 
+UPDATE_QUESTIONNAIRE_ANSWER = statements.register("update_questionnaire_answer", """
+    UPDATE questionnaire_answers
+    SET answer = $1
+    WHERE session_id = $2 AND question_id = $3
+""")
+
+@db_helper
 async def update_questionnaire_answer(session_id: UUID4, question_id: str, answer: Optional[str]) -> None:
-    conn = await get_db_connection()
-    try:
-        await conn.execute(
-            """
-            UPDATE questionnaire_answers
-            SET answer = $1
-            WHERE session_id = $2 AND question_id = $3
-            """,
-            answer, session_id, question_id
-        )
-    finally:
-        await conn.close()
+    async with db_connection() as conn:
+        await statements.execute(conn, UPDATE_QUESTIONNAIRE_ANSWER, answer, session_id, question_id)
 
+GET_QUESTIONNAIRE_ANSWERS_WITH_TIMES = statements.register(
+    "get_questionnaire_answers_with_times",
+    "SELECT question_id, answer, created_at FROM questionnaire_answers WHERE session_id = $1 ORDER BY created_at",
+)
+
+@db_helper
 async def get_questionnaire_answers_for_session(session_id: UUID4) -> Dict[str, Any]:
     """Get all questionnaire answers for a session as a dict mapping question_id to answer with timestamp"""
-    conn = await get_db_connection()
-    try:
-        rows = await conn.fetch(
-            "SELECT question_id, answer, created_at FROM questionnaire_answers WHERE session_id = $1 ORDER BY created_at",
-            session_id
-        )
+    async with db_connection() as conn:
+        rows = await statements.fetch(conn, GET_QUESTIONNAIRE_ANSWERS_WITH_TIMES, session_id)
         return {row["question_id"]: {"answer": row["answer"], "created_at": row["created_at"]} for row in rows}
-    finally:
-        await conn.close()
 
 def generate_session_id() -> UUID4:
     """Generate a unique session ID"""
     return uuid.uuid4()
 
+async def _hydrate_with_history_cache(session_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Hydrate a session, reading only the messages the history cache does not have yet.
+    The returned "messages" is the full history; the cache is refreshed with it.
+    """
+    key = str(session_id)
+    cached, _ = history_cache.lookup(key)
+    since = history_cache.last_timestamp(key) if cached is not None else None
+    db_session = await hydrate_session(session_id, since)
+    if db_session is None:
+        history_cache.invalidate(key)
+        return None
+    if cached is None:
+        history_cache.put(key, db_session["messages"])
+    else:
+        history_cache.extend(key, db_session["messages"])
+        db_session["messages"] = cached + db_session["messages"]
+    return db_session
+
+@db_helper
 async def get_or_create_session(session_id: Optional[str] = None) -> ChatSession:
+    """
+    Load a session with its chat history in one round-trip, or create a new one.
+    An unknown session_id starts a new session under a server-generated ID.
+    """
     if session_id:
-        db_session = await get_session_from_db(session_id)
+        db_session = await _hydrate_with_history_cache(session_id)
         if db_session:
-            messages_data = await get_chat_messages_from_db(session_id)
             messages = [
                 ChatMessage(
                     role=msg["role"],
                     content=msg["content"],
                     timestamp=msg["timestamp"].isoformat()
-                ) for msg in messages_data
+                ) for msg in db_session["messages"]
             ]
             return ChatSession(
                 session_id=db_session["session_id"],
@@ -162,12 +382,126 @@ async def get_or_create_session(session_id: Optional[str] = None) -> ChatSession
                 last_updated=db_session["last_updated"].isoformat(),
                 questionnaire_id=db_session["questionnaire_id"]
             )
-    new_session_id = generate_session_id()
-    await create_session_in_db(new_session_id)
+    row = None
+    while row is None:
+        # A collision on a fresh UUID4 is practically impossible, but never hand out an existing session
+        row = await create_session_in_db(generate_session_id())
+    history_cache.put(str(row["session_id"]), [])
     return ChatSession(
-        session_id=new_session_id,
+        session_id=row["session_id"],
         messages=[],
-        created_at=datetime.utcnow().isoformat(),
-        last_updated=datetime.utcnow().isoformat(),
+        created_at=row["created_at"].isoformat(),
+        last_updated=row["last_updated"].isoformat(),
         questionnaire_id=None
-    ) 
\ No newline at end of file
+    )
+
+# Bulk export of completed sessions, read through server-side cursors so memory stays flat
+# however many sessions match. Each query is ordered by the session's (created_at, session_id),
+# which lets answers and messages be merged onto their session as the cursors advance.
+# Messages are ordered by timestamp alone, like the chat history queries: tables adopted by
+# migration 0001 may have no id column, and the message writer keeps a session's timestamps
+# strictly increasing.
+EXPORT_COLUMNS = {
+    "sessions": ["session_id", "questionnaire_id", "created_at", "last_updated"],
+    "answers": ["session_id", "questionnaire_id", "question_id", "question_text", "answer", "type", "created_at"],
+    "messages": ["session_id", "questionnaire_id", "role", "content", "timestamp"],
+}
+_EXPORT_SQL = {
+    "sessions": """
+        SELECT s.session_id, s.questionnaire_id, s.created_at, s.last_updated
+        FROM sessions s
+        WHERE {where}
+        ORDER BY s.created_at, s.session_id
+    """,
+    "answers": """
+        SELECT a.session_id, s.questionnaire_id, a.question_id, a.question_text, a.answer, a.type, a.created_at
+        FROM sessions s
+        JOIN questionnaire_answers a ON a.session_id = s.session_id
+        WHERE {where}
+        ORDER BY s.created_at, s.session_id, a.created_at, a.question_id
+    """,
+    "messages": """
+        SELECT m.session_id, s.questionnaire_id, m.role, m.content, m.timestamp
+        FROM sessions s
+        JOIN chat_messages m ON m.session_id = s.session_id
+        WHERE {where}
+        ORDER BY s.created_at, s.session_id, m.timestamp
+    """,
+}
+
+def _export_filter(start: Optional[datetime], end: Optional[datetime], questionnaire_id: Optional[str]) -> Tuple[str, List[Any]]:
+    """WHERE clause over sessions `s` and its arguments; only the given filters are included so each can use the index"""
+    clauses, args = ["s.is_questionnaire_complete"], []
+    for condition, value in (("s.created_at >= ${}", start), ("s.created_at < ${}", end), ("s.questionnaire_id = ${}", questionnaire_id)):
+        if value is not None:
+            args.append(value)
+            clauses.append(condition.format(len(args)))
+    return " AND ".join(clauses), args
+
+@asynccontextmanager
+async def export_snapshot() -> AsyncIterator[asyncpg.Connection]:
+    """
+    A standalone connection inside a read-only REPEATABLE READ transaction, for export cursors.
+    Every cursor opened on it reads the same snapshot, and a long export does not hold one of
+    the pooled connections that /chat needs. Buffered chat messages are flushed first.
+    """
+    await chat_message_writer.flush()
+    conn = await get_db_connection()
+    try:
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            yield conn
+    finally:
+        await conn.close()
+
+def export_rows(conn: asyncpg.Connection, records: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                questionnaire_id: Optional[str] = None, prefetch: int = 500) -> AsyncIterator[asyncpg.Record]:
+    """
+    Cursor over completed sessions, their answers or their messages (`records`, a key of EXPORT_COLUMNS),
+    fetching `prefetch` rows per round-trip. Sessions are filtered on created_at in [start, end) and
+    on questionnaire_id. Must be iterated inside export_snapshot().
+    """
+    where, args = _export_filter(start, end, questionnaire_id)
+    return conn.cursor(_EXPORT_SQL[records].format(where=where), *args, prefetch=prefetch)
+
+class _SessionRows:
+    """Rows of an export cursor handed out one session at a time, in the cursor's session order"""
+
+    def __init__(self, rows: AsyncIterator[asyncpg.Record]):
+        self._rows = rows.__aiter__()
+        self._next: Optional[asyncpg.Record] = None
+        self._exhausted = False
+
+    async def take(self, session_id: UUID4) -> List[asyncpg.Record]:
+        taken = []
+        while not self._exhausted:
+            if self._next is None:
+                try:
+                    self._next = await self._rows.__anext__()
+                except StopAsyncIteration:
+                    self._exhausted = True
+                    break
+            if self._next["session_id"] != session_id:
+                break
+            taken.append(self._next)
+            self._next = None
+        return taken
+
+async def export_sessions_with_history(conn: asyncpg.Connection, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                                       questionnaire_id: Optional[str] = None, prefetch: int = 500) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Completed sessions, each with its "answers" and "messages", merged from three cursors on one
+    snapshot. Only one session's rows are held at a time.
+    """
+    answers = _SessionRows(export_rows(conn, "answers", start, end, questionnaire_id, prefetch))
+    messages = _SessionRows(export_rows(conn, "messages", start, end, questionnaire_id, prefetch))
+    async for row in export_rows(conn, "sessions", start, end, questionnaire_id, prefetch):
+        session = dict(row)
+        session["answers"] = [
+            {key: answer[key] for key in ("question_id", "question_text", "answer", "type", "created_at")}
+            for answer in await answers.take(row["session_id"])
+        ]
+        session["messages"] = [
+            {key: message[key] for key in ("role", "content", "timestamp")}
+            for message in await messages.take(row["session_id"])
+        ]
+        yield session
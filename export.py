@@ -0,0 +1,134 @@
+import asyncio
+import csv
+import io
+import logging
+import os
+import secrets
+import time
+import uuid
+from datetime import date, datetime, time as dt_time, timezone
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Union
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import StreamingResponse
+
+import sse
+from database import EXPORT_COLUMNS, export_rows, export_sessions_with_history, export_snapshot
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/export", tags=["Export"])
+
+# Rows fetched per cursor round-trip, bytes buffered per streamed chunk, and exports allowed to
+# run at once (each holds its own database connection; further requests wait for a slot)
+EXPORT_CURSOR_PREFETCH = int(os.getenv("EXPORT_CURSOR_PREFETCH", "500"))
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", "65536"))
+_export_slots = asyncio.Semaphore(int(os.getenv("EXPORT_MAX_CONCURRENT", "2")))
+
+async def require_export_key(x_api_key: Optional[str] = Header(None)) -> None:
+    """Exports contain patient answers and transcripts: EXPORT_API_KEY must be set and sent as X-API-Key"""
+    expected = os.getenv("EXPORT_API_KEY")
+    if not expected:
+        raise HTTPException(status_code=503, detail="Export is not configured")
+    if not x_api_key or not secrets.compare_digest(x_api_key.encode(), expected.encode()):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+
+def _value(value: Any) -> Any:
+    """Same text for timestamps and IDs whichever JSON encoder is installed, and in CSV"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, list):
+        return [{key: _value(v) for key, v in item.items()} for item in value]
+    return value
+
+def _as_utc(value: Union[datetime, date, None]) -> Optional[datetime]:
+    """A bare date is midnight UTC; a time without an offset is UTC"""
+    if value is not None and not isinstance(value, datetime):
+        value = datetime.combine(value, dt_time.min)
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+async def _ndjson(items: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    chunk = bytearray()
+    async for item in items:
+        chunk += sse.dumps({key: _value(value) for key, value in item.items()})
+        chunk += b"\n"
+        if len(chunk) >= EXPORT_CHUNK_BYTES:
+            yield bytes(chunk)
+            chunk.clear()
+    if chunk:
+        yield bytes(chunk)
+
+async def _csv(columns: List[str], rows: AsyncIterator[Any]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for row in rows:
+        writer.writerow([_value(row[column]) for column in columns])
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+@router.get("/sessions")
+async def export_sessions(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    records: Literal["sessions", "answers", "messages"] = "sessions",
+    start: Union[datetime, date, None] = None,
+    end: Union[datetime, date, None] = None,
+    questionnaire_id: Optional[str] = None,
+    _: None = Depends(require_export_key),
+):
+    """
+    Stream completed sessions, their questionnaire answers or their chat messages.
+
+    Sessions are selected by created_at in [start, end) and by questionnaire_id; dates, and
+    times without an offset, are UTC. `records=sessions` as NDJSON nests each session's
+    answers and messages; CSV has one row per record, so sessions, answers and messages are
+    exported separately and joined on session_id. Rows are read through server-side cursors on one
+    snapshot and streamed as they arrive, so memory does not grow with the export size.
+    """
+    start, end = _as_utc(start), _as_utc(end)
+    if start is not None and end is not None and start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    filters = {"start": start, "end": end, "questionnaire_id": questionnaire_id, "prefetch": EXPORT_CURSOR_PREFETCH}
+
+    async def generate() -> AsyncIterator[bytes]:
+        started = time.perf_counter()
+        sent = 0
+        async with _export_slots:
+            async with export_snapshot() as conn:
+                if format == "ndjson" and records == "sessions":
+                    body = _ndjson(export_sessions_with_history(conn, **filters))
+                elif format == "ndjson":
+                    body = _ndjson(dict(row) async for row in export_rows(conn, records, **filters))
+                else:
+                    body = _csv(EXPORT_COLUMNS[records], export_rows(conn, records, **filters))
+                try:
+                    async for chunk in body:
+                        sent += len(chunk)
+                        yield chunk
+                except Exception:
+                    # The response has started, so the client only sees the stream cut short
+                    logger.exception("Export failed", extra={"records": records, "bytes": sent})
+                    raise
+        logger.info("Export finished", extra={
+            "records": records, "format": format, "bytes": sent,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        })
+
+    extension = "ndjson" if format == "ndjson" else "csv"
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson" if format == "ndjson" else "text/csv; charset=utf-8",
+        headers={
+            "Content-Disposition": f'attachment; filename="{records}.{extension}"',
+            "Cache-Control": "no-store",
+            "X-Accel-Buffering": "no",
+        },
+    )
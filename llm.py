@@ -0,0 +1,68 @@
+import asyncio
+import os
+from typing import Any, AsyncIterator, Optional
+import httpx
+import openai
+
+from tracing import inject_trace_context
+
+# One AsyncOpenAI client per process so streaming calls never block the event loop
+# and HTTP connections to the API are reused across requests
+_openai_client: Optional[openai.AsyncOpenAI] = None
+
+def get_openai_client() -> openai.AsyncOpenAI:
+    """
+    Return the shared AsyncOpenAI client, creating it on first use.
+    Connection pooling is configured with OPENAI_MAX_CONNECTIONS, OPENAI_MAX_KEEPALIVE_CONNECTIONS
+    and OPENAI_KEEPALIVE_EXPIRY; OPENAI_BASE_URL is honoured by the SDK itself.
+    """
+    global _openai_client
+    if _openai_client is None:
+        openai_api_key = os.getenv("OPENAI_API_KEY")
+        if not openai_api_key:
+            raise Exception("OPENAI_API_KEY not set in environment variables")
+        _openai_client = openai.AsyncOpenAI(
+            api_key=openai_api_key,
+            http_client=openai.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")),
+                    max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20")),
+                    keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30")),
+                ),
+                event_hooks={"request": [inject_trace_context]},
+            ),
+        )
+    return _openai_client
+
+def set_openai_client(client: Optional[openai.AsyncOpenAI]) -> None:
+    """Replace the shared client, e.g. with one pointed at a local stand-in server"""
+    global _openai_client
+    _openai_client = client
+
+async def close_openai_client() -> None:
+    global _openai_client
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
+
+async def stream_until(stream: AsyncIterator[Any], deadline: float) -> AsyncIterator[Any]:
+    """
+    Iterate a streamed completion, raising TimeoutError once the event loop clock passes
+    `deadline`. Only the wait for the next chunk is timed, never the consumer's work between
+    chunks, so the timeout cannot fire while an enclosing generator is suspended at a yield.
+    """
+    iterator = stream.__aiter__()
+    try:
+        while True:
+            async with asyncio.timeout_at(deadline):
+                try:
+                    chunk = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+            yield chunk
+    except TimeoutError:
+        # Release the HTTP response instead of leaving it to the garbage collector
+        close = getattr(stream, "close", None)
+        if close is not None:
+            await close()
+        raise
@@ -0,0 +1,108 @@
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+
+# Set once per /chat turn so every record emitted while handling it carries the session ID
+session_id_var: ContextVar[Optional[str]] = ContextVar("session_id", default=None)
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "session_id"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message, session_id and any `extra` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "session_id", None):
+            entry["session_id"] = record.session_id
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class SessionContextFilter(logging.Filter):
+    """Stamp records with the current session ID; runs in the emitting task, before the queue hop"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.session_id = session_id_var.get()
+        return True
+
+class Sampler:
+    """
+    Call-site sampler for hot-path debug events: returns True for one call in every `every`.
+    Checked before the logger call so skipped events never allocate a LogRecord.
+    """
+
+    def __init__(self, every: int):
+        self.every = max(every, 1)
+        self._counter = itertools.count()
+
+    def __call__(self) -> bool:
+        return next(self._counter) % self.every == 0
+
+# Shared sampler for per-chunk streaming events; LOG_SAMPLE_EVERY is applied by setup_logging()
+chunk_sampler = Sampler(100)
+
+class _EnqueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Skip QueueHandler's eager message formatting; the listener thread formats the record
+        return record
+
+def setup_logging() -> None:
+    """
+    Route all logging through a QueueHandler so request handlers never block on stdout.
+
+    LOG_LEVEL sets the root level (default INFO). LOG_LEVELS sets per-module levels, e.g.
+    "main=DEBUG,MDI=WARNING". LOG_SAMPLE_EVERY makes chunk_sampler keep 1 in N per-chunk
+    debug events (default 100).
+    LOG_FORMAT=text switches from JSON lines to plain text for local development.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = _EnqueueHandler(log_queue)
+    queue_handler.addFilter(SessionContextFilter())
+    chunk_sampler.every = max(int(os.getenv("LOG_SAMPLE_EVERY", "100")), 1)
+
+    output_handler = logging.StreamHandler(sys.stdout)
+    if os.getenv("LOG_FORMAT", "json").lower() == "text":
+        output_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(session_id)s] %(message)s"))
+    else:
+        output_handler.setFormatter(JsonFormatter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    for item in filter(None, (part.strip() for part in os.getenv("LOG_LEVELS", "").split(","))):
+        name, _, level = item.partition("=")
+        logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, output_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+def shutdown_logging() -> None:
+    """Drain queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
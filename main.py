@@ -1,29 +1,72 @@
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, Response
+import asyncio
 import httpx
 import os
 import uuid
 import json
-from datetime import datetime
+import logging
+from contextlib import asynccontextmanager
 from typing import Dict, Any, Optional, List
 from pydantic import BaseModel, field_validator, UUID4
 from dotenv import load_dotenv
 
 from fastapi import UploadFile, File
 import asyncpg
-import openai
+from opentelemetry import trace
 
-from MDI import router as mdi_router
+# Load environment variables from .env file before importing modules that read configuration at import time
+load_dotenv()
+
+from logging_config import setup_logging, session_id_var, chunk_sampler
+from tracing import setup_tracing, shutdown_tracing, tracer, traced_stream
+setup_logging()
+setup_tracing()
+
+from MDI import router as mdi_router, init_http_client, close_http_client
+from export import router as export_router
 from models import TokenRequest, TokenResponse, Country, State, Address, FileInfo, DosespotInfo, PartnerInfo, Metafield, PatientAddress, PatientRequest, PatientResponse, CaseStatus, ClinicianPhoto, Clinician, CaseAssignment, PartnerCustomization, PartnerAddress, Tag, CasePrescription, CaseQuestion, CaseRequest, CaseResponse, QuestionnaireMatchRequest, QuestionnaireMatchResponse, ChatMessage, QuestionnaireMatchResult, ChatSession, ChatRequest, ChatResponse, MultipleChoiceQuestion, BooleanQuestion, SingleChoiceQuestion, IntegerQuestion, StringQuestion, TextQuestion, InformationalQuestion
 
-from database import get_db_connection, create_session_in_db, update_session_questionnaire, mark_questionnaire_complete, save_questionnaire_answer, get_questionnaire_answers, add_chat_message, get_session_from_db, get_chat_messages_from_db, generate_session_id, get_or_create_session, get_unanswered_questions, update_questionnaire_answer, get_questionnaire_answers_for_session
+from database import init_db_pool, close_db_pool, get_db_connection, create_session_in_db, update_session_questionnaire, mark_questionnaire_complete, save_questionnaire_answer, get_questionnaire_answers, add_chat_message, get_session_from_db, get_chat_messages_from_db, get_chat_history, generate_session_id, get_or_create_session, get_unanswered_questions, update_questionnaire_answer, get_questionnaire_answers_for_session
+from migrate import run_migrations, pending_migrations
+from llm import get_openai_client, close_openai_client, stream_until
+from tools import execute_tool_calls
+from prompts import SYSTEM_MESSAGE, TOOLS, PROMPT_CACHE_KEY
+from context_builder import build_context_messages
+from questionnaire_rules import get_questionnaire_progress
+from content_filter import content_filter
+import sse
+from metrics import CompletionTimer, instrument_sse, render_metrics
 from MDI import match_questionnaire_to_query, get_questionnaire_questions, get_simplified_questionnaires, get_simplified_questionnaire
 
-# Load environment variables from .env file
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open shared resources once per process instead of once per request
+    await init_db_pool()
+    # DB_RUN_MIGRATIONS=true applies pending schema migrations before serving; otherwise run `python migrate.py`.
+    # The queries rely on the schema (e.g. the answer upserts need 0002's unique key), so refuse to serve without it.
+    if os.getenv("DB_RUN_MIGRATIONS", "false").lower() in ("1", "true", "yes"):
+        await run_migrations()
+    else:
+        pending = await pending_migrations()
+        if pending:
+            raise RuntimeError(
+                f"Schema migrations {[m.version for m in pending]} are not applied; "
+                "run `python migrate.py` or set DB_RUN_MIGRATIONS=true"
+            )
+    await init_http_client()
+    try:
+        yield
+    finally:
+        await close_openai_client()
+        await close_http_client()
+        await close_db_pool()
+        shutdown_tracing()
 
-app = FastAPI(title="scoby_backend", version="1.0.0")
+app = FastAPI(title="scoby_backend", version="1.0.0", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -35,340 +78,231 @@ app.add_middleware(
 )
 
 app.include_router(mdi_router)
+app.include_router(export_router)
 
 @app.post("/chat")
 async def chat_endpoint(request: ChatRequest):
     """
     Streaming chat endpoint that provides real-time responses.
     """
-    print(f"Starting streaming chat for session: {request.session_id}")
+    logger.info("Starting streaming chat", extra={"requested_session_id": request.session_id})
     
     async def generate_stream():
+        loop = asyncio.get_running_loop()
+        turn_deadline = None
+        full_response = ""
+        stream_filter = None
+        # Tiny deltas are merged into fewer events when SSE_COALESCE_INTERVAL_MS is set
+        coalescer = sse.ContentCoalescer()
         try:
             # Get or create session
             session = await get_or_create_session(request.session_id)
             session_created = request.session_id is None
-            print(f"Session created/retrieved: {session.session_id}")
+            session_id_var.set(str(session.session_id))
+            trace.get_current_span().set_attribute("chat.session_id", str(session.session_id))
+            logger.info("Session created" if session_created else "Session retrieved")
 
             # Send session ID immediately
-            yield f"data: {json.dumps({'type': 'session_id', 'session_id': str(session.session_id)})}\n\n"
+            yield sse.session_id(session.session_id)
 
             # Add user message to chat history
             if request.message:
                 await add_chat_message(session.session_id, "user", request.message)
-                print(f"User message added: {request.message[:50]}...")
+                logger.info("User message added", extra={"chars": len(request.message)})
 
             # Build conversation context
-            chat_history = await get_chat_messages_from_db(session.session_id)
-            print(f"Chat history loaded: {len(chat_history)} messages")
-
-            messages = [
-                {
-                    "role": "system",
-                    "content": """You are a medical intake assistant that helps patients through natural conversation. Your job is to:
-
-1. Greet patients warmly and understand their complaint
-2. Ask medical questions one at a time in a friendly, professional tone
-3. Normalize answers (yes/no → true/false, "2 days" → 2, dates → ISO)
-4. Spot red flags and stop/escalate when needed
-5. Complete the intake when all necessary information is gathered
-
-You have access to these tools:
-- update_session_questionnaire(questionnaire_id): Set the chosen form
-- get_simplified_questionnaires: Get available forms
-- get_simplified_questionnaire(questionnaire_id): Get full form schema
-- save_questionnaire_answer(question_text, answer, question_id, answer_type): Save each answer
-- mark_questionnaire_complete(): Submit the completed form
+            chat_history = await get_chat_history(session.session_id)
+            logger.info("Chat history loaded", extra={"messages": len(chat_history)})
 
-CRITICAL: NEVER mention questionnaires, forms, tools, or any backend processes. Talk like a real medical professional having a conversation with a patient.
+            # Static system prompt first, then the chat history; per-turn context goes last so the prefix stays cacheable
+            messages = await build_context_messages(SYSTEM_MESSAGE, chat_history, session.session_id)
 
-Your responses should be:
-- Direct and focused on the patient's symptoms
-- Professional but warm and caring
-- One question at a time
-- Free of any technical jargon or process explanations
-- Natural questions without instructing patients on how to answer
-
-For example:
-❌ WRONG: "I'll check what questionnaires are available so I can choose the right one for UTI symptoms. Now I'll load that questionnaire and start with the first question. I'll save your answers as we go."
-
-❌ WRONG: "Are you having any of the following right now: fever over 100.4°F (38°C), severe back or side pain, nausea/vomiting, confusion, or feeling very ill? Please answer yes or no."
-
-✅ CORRECT: "I'm sorry you're dealing with that—I'll help get the right info to your clinician. Before we start, I need to make sure you're safe. Are you having any of the following right now: fever over 100.4°F (38°C), severe back or side pain, nausea/vomiting, confusion, or feeling very ill?"
-
-Always prioritize patient safety and be direct with your questions. Let patients answer naturally without telling them how to format their responses."""
+            # Skip logic runs server-side: the model gets only the next applicable question, not the schema
+            if session.questionnaire_id:
+                try:
+                    progress = await get_questionnaire_progress(session.session_id, session.questionnaire_id)
+                    messages.append({
+                        "role": "system",
+                        "content": f"Questionnaire progress: {json.dumps(progress.summary())}\n"
+                                   "Ask next_question next. When next_question is null, call mark_questionnaire_complete."
+                    })
+                except Exception:
+                    logger.warning("Questionnaire progress unavailable", exc_info=True)
+
+            client = get_openai_client()
+
+            # Bound the agent loop: CHAT_MAX_TOOL_ROUNDS tool rounds and CHAT_TURN_TIME_BUDGET seconds of tool use.
+            # Once either is spent the model gets one tool-free request for its final reply. The turn as a whole
+            # is cut off CHAT_FINAL_REPLY_BUDGET seconds after that, whatever is still running.
+            max_tool_rounds = int(os.getenv("CHAT_MAX_TOOL_ROUNDS", "5"))
+            tools_deadline = loop.time() + float(os.getenv("CHAT_TURN_TIME_BUDGET", "60"))
+            turn_deadline = tools_deadline + float(os.getenv("CHAT_FINAL_REPLY_BUDGET", "20"))
+
+            for round_index in range(max_tool_rounds + 1):
+                # Once the round or time budget is spent, ask for a plain reply. Tools stay in the
+                # request (disabled via tool_choice) so the prefix does not change when they are turned
+                # off. Prompt caching is per model: round 0 (gpt-5) and the later gpt-4o-mini rounds
+                # each reuse the prefix cached by earlier requests on their own model, not each other's.
+                allow_tools = round_index < max_tool_rounds and loop.time() < tools_deadline
+                completion_args = {
+                    "model": "gpt-5" if round_index == 0 else "gpt-4o-mini",
+                    "messages": messages,
+                    "tools": TOOLS,
+                    "tool_choice": "auto" if allow_tools else "none",
+                    "prompt_cache_key": PROMPT_CACHE_KEY,
+                    "stream": True,
+                    "stream_options": {"include_usage": True}
                 }
-            ]
 
-            # Add prior chat (user/assistant) to messages
-            for msg in chat_history:
-                messages.append({
-                    "role": "user" if msg["role"] == "user" else "assistant",
-                    "content": msg["content"]
-                })
-
-            openai_api_key = os.getenv("OPENAI_API_KEY")
-            if not openai_api_key:
-                raise Exception("OPENAI_API_KEY not set")
-
-            client = openai.OpenAI(api_key=openai_api_key)
-
-            tools = [
-                {
-                    "type": "function",
-                    "function": {
-                        "name": "update_session_questionnaire",
-                        "description": "Set the chosen questionnaire/form for the conversation",
-                        "parameters": {
-                            "type": "object",
-                            "properties": {
-                                "questionnaire_id": {"type": "string"}
-                            },
-                            "required": ["questionnaire_id"]
-                        }
-                    }
-                },
-                {
-                    "type": "function",
-                    "function": {
-                        "name": "get_simplified_questionnaires",
-                        "description": "Get a quick catalog of available questionnaires/forms",
-                        "parameters": {"type": "object", "properties": {}}
-                    }
-                },
-                {
-                    "type": "function",
-                    "function": {
-                        "name": "get_simplified_questionnaire",
-                        "description": "Get the full schema for a specific questionnaire",
-                        "parameters": {
-                            "type": "object",
-                            "properties": {
-                                "questionnaire_id": {"type": "string"}
-                            },
-                            "required": ["questionnaire_id"]
-                        }
-                    }
-                },
-                {
-                    "type": "function",
-                    "function": {
-                        "name": "save_questionnaire_answer",
-                        "description": "Save a patient's answer to a specific question",
-                        "parameters": {
-                            "type": "object",
-                            "properties": {
-                                "question_text": {"type": "string"},
-                                "answer": {"type": "string"},
-                                "question_id": {"type": "string"},
-                                "answer_type": {"type": "string"}
-                            },
-                            "required": ["question_text", "question_id", "answer_type"]
-                        }
-                    }
-                },
-                {
-                    "type": "function",
-                    "function": {
-                        "name": "mark_questionnaire_complete",
-                        "description": "Mark the questionnaire as complete and submit for doctor review",
-                        "parameters": {"type": "object", "properties": {}}
-                    }
-                }
-            ]
-
-            # Use streaming for the initial response
-            print("Starting OpenAI streaming request...")
-            stream = client.chat.completions.create(
-                model="gpt-5",
-                messages=messages,
-                tools=tools,
-                tool_choice="auto",
-                stream=True
-            )
+                logger.info("Starting OpenAI streaming request", extra={"round": round_index + 1, "model": completion_args["model"]})
+                completion_timer = CompletionTimer(completion_args["model"])
+                # Current for the request and the whole stream, so the traceparent header and child spans attach to it
+                with tracer.start_as_current_span("openai.stream", attributes={"llm.model": completion_args["model"], "chat.round": round_index + 1}) as stream_span:
+                    round_response = ""
+                    tool_calls_by_index = {}
+                    chunk_count = 0
+                    stream_filter = content_filter.stream()
+
+                    async with asyncio.timeout_at(turn_deadline):
+                        stream = await client.chat.completions.create(**completion_args)
+                    # Checked once per round so the per-chunk path costs nothing when debug logging is off
+                    chunk_debug = logger.isEnabledFor(logging.DEBUG)
+
+                    # Handle the streaming response properly
+                    try:
+                        async for chunk in stream_until(stream, turn_deadline):
+                            # The usage summary arrives as a final chunk without choices
+                            usage = getattr(chunk, "usage", None)
+                            if usage is not None:
+                                completion_timer.usage(usage)
+                            if not chunk.choices:
+                                continue
+                            chunk_count += 1
+                            completion_timer.delta()
+                            if hasattr(chunk.choices[0], 'delta') and chunk.choices[0].delta:
+                                if chunk.choices[0].delta.content:
+                                    # Redact tool-related content or internal processing, including keywords split across chunks
+                                    content = stream_filter.feed(chunk.choices[0].delta.content)
+                                    if content:
+                                        round_response += content
+                                        full_response += content
+                                        event = coalescer.feed(content)
+                                        if event is not None:
+                                            if chunk_debug and chunk_sampler():
+                                                logger.debug("Sending chunk", extra={"bytes": len(event)})
+                                            yield event
+
+                                if hasattr(chunk.choices[0].delta, 'tool_calls') and chunk.choices[0].delta.tool_calls:
+                                    for tool_call in chunk.choices[0].delta.tool_calls:
+                                        # Parallel tool calls are interleaved in the stream and told apart by index
+                                        current_tool = tool_calls_by_index.get(tool_call.index)
+                                        if current_tool is None:
+                                            current_tool = {
+                                                'id': tool_call.id,
+                                                'function': {'name': '', 'arguments': ''},
+                                                'type': 'function'
+                                            }
+                                            tool_calls_by_index[tool_call.index] = current_tool
+                                        if tool_call.id:
+                                            current_tool['id'] = tool_call.id
+                                        if tool_call.function:
+                                            if tool_call.function.name:
+                                                current_tool['function']['name'] = tool_call.function.name
+                                                logger.info("Tool call started", extra={"tool": tool_call.function.name})
+                                            if tool_call.function.arguments:
+                                                current_tool['function']['arguments'] += tool_call.function.arguments
+                    except TimeoutError:
+                        raise
+                    except Exception:
+                        logger.exception("Error during streaming")
+                        # Send what was received, then an error event, and continue
+                        event = coalescer.flush()
+                        if event is not None:
+                            yield event
+                        yield sse.STREAMING_ERROR
+
+                    completion_timer.finish()
+                    stream_span.set_attribute("llm.deltas", completion_timer.deltas)
+                    stream_span.set_attribute("llm.prompt_tokens", completion_timer.prompt_tokens)
+                    stream_span.set_attribute("llm.cached_prompt_tokens", completion_timer.cached_tokens)
+
+                # Release any text held back while checking for a split keyword
+                content = stream_filter.flush()
+                if content:
+                    round_response += content
+                    full_response += content
+                    event = coalescer.feed(content)
+                    if event is not None:
+                        yield event
+                event = coalescer.flush()
+                if event is not None:
+                    yield event
+
+                tool_calls = [tool_calls_by_index[i] for i in sorted(tool_calls_by_index)]
+                logger.info("Streaming round complete", extra={"round": round_index + 1, "chunks": chunk_count, "tool_calls": len(tool_calls)})
+
+                if not tool_calls:
+                    break
 
-            full_response = ""
-            tool_calls = []
-            chunk_count = 0
-            
-            # Handle the streaming response properly
-            try:
-                for chunk in stream:
-                    chunk_count += 1
-                    if hasattr(chunk.choices[0], 'delta') and chunk.choices[0].delta:
-                        if chunk.choices[0].delta.content:
-                            content = chunk.choices[0].delta.content
-                            # Filter out any tool-related content or internal processing
-                            if not any(keyword in content.lower() for keyword in [
-                                'questionnaire_id', 'status', 'tool_id', 'question_text', 
-                                'answer_type', 'executed', 'call_', 'uti_screen'
-                            ]):
-                                full_response += content
-                                # Send the chunk as a data event with proper SSE formatting
-                                chunk_data = f"data: {json.dumps({'type': 'content', 'content': content})}\n\n"
-                                print(f"Sending chunk: {repr(content)} -> {repr(chunk_data)}")
-                                yield chunk_data
-                        
-                        if hasattr(chunk.choices[0].delta, 'tool_calls') and chunk.choices[0].delta.tool_calls:
-                            for tool_call in chunk.choices[0].delta.tool_calls:
-                                if tool_call.function:
-                                    if tool_call.function.name:
-                                        # Start of a new tool call
-                                        tool_calls.append({
-                                            'id': tool_call.id,
-                                            'function': {'name': tool_call.function.name, 'arguments': ''},
-                                            'type': 'function'
-                                        })
-                                        print(f"Tool call started: {tool_call.function.name}")
-                                    if tool_call.function.arguments:
-                                        # Append arguments to the current tool call
-                                        current_tool = tool_calls[-1]
-                                        current_tool['function']['arguments'] += tool_call.function.arguments
-            except Exception as e:
-                print(f"Error during streaming: {str(e)}")
-                # Send error event and continue
-                yield f"data: {json.dumps({'type': 'error', 'error': 'Streaming error occurred'})}\n\n"
-
-            print(f"Initial streaming complete. Chunks: {chunk_count}, Tool calls: {len(tool_calls)}")
-
-            # If we have tool calls, execute them and continue the conversation
-            if tool_calls:
                 # Send tool execution start
-                yield f"data: {json.dumps({'type': 'tool_execution_start'})}\n\n"
-                
-                # Execute tools and continue conversation
-                for tool_call in tool_calls:
-                    function_name = tool_call['function']['name']
-                    function_args = json.loads(tool_call['function']['arguments'] or "{}")
+                yield sse.TOOL_EXECUTION_START
 
-                    try:
-                        if function_name == "update_session_questionnaire":
-                            await update_session_questionnaire(session.session_id, function_args["questionnaire_id"])
-                            if hasattr(session, "questionnaire_id"):
-                                session.questionnaire_id = function_args["questionnaire_id"]
-                            tool_result = {
-                                "status": "success",
-                                "message": "Questionnaire assigned successfully",
-                                "questionnaire_id": function_args["questionnaire_id"],
-                                "session_id": str(session.session_id)
-                            }
-
-                        elif function_name == "get_simplified_questionnaires":
-                            tool_result = await get_simplified_questionnaires()
-
-                        elif function_name == "get_simplified_questionnaire":
-                            tool_result = await get_simplified_questionnaire(function_args["questionnaire_id"])
-
-                        elif function_name == "save_questionnaire_answer":
-                            await save_questionnaire_answer(
-                                session.session_id,
-                                function_args["question_text"],
-                                function_args.get("answer"),
-                                function_args["question_id"],
-                                function_args["answer_type"]
-                            )
-                            tool_result = {
-                                "status": "success",
-                                "message": "Answer saved successfully",
-                                "question_id": function_args["question_id"]
-                            }
-
-                        elif function_name == "mark_questionnaire_complete":
-                            await mark_questionnaire_complete(session.session_id)
-                            tool_result = {
-                                "status": "success",
-                                "message": "Questionnaire completed and submitted for doctor review",
-                                "session_id": str(session.session_id),
-                                "completed_at": datetime.utcnow().isoformat()
-                            }
-
-                        else:
-                            tool_result = {"error": f"Unknown tool: {function_name}"}
-
-                    except Exception as e:
-                        tool_result = {"error": f"{function_name} failed: {str(e)}"}
+                # Independent tool calls run concurrently; results come back in call order
+                async with asyncio.timeout_at(turn_deadline):
+                    tool_results = await execute_tool_calls(session, tool_calls)
 
+                for tool_call, tool_result in zip(tool_calls, tool_results):
                     # Send tool result
-                    yield f"data: {json.dumps({'type': 'tool_result', 'tool_name': function_name, 'result': tool_result})}\n\n"
-
-                # Continue conversation with tool results
-                # Convert our tool_calls format to OpenAI's expected format
-                openai_tool_calls = []
-                for tool_call in tool_calls:
-                    openai_tool_calls.append({
-                        "id": tool_call['id'],
-                        "type": "function",
-                        "function": {
-                            "name": tool_call['function']['name'],
-                            "arguments": tool_call['function']['arguments']
-                        }
-                    })
-                
-                print(f"Converting tool calls to OpenAI format: {len(openai_tool_calls)} tools")
-                for tool_call in openai_tool_calls:
-                    print(f"  - {tool_call['function']['name']}: {tool_call['function']['arguments'][:100]}...")
-                
+                    yield sse.tool_result(tool_call['function']['name'], tool_result)
+
+                # Continue the conversation with the real tool outputs
                 messages.append({
                     "role": "assistant",
-                    "content": full_response,
-                    "tool_calls": openai_tool_calls
+                    "content": round_response,
+                    "tool_calls": tool_calls
                 })
-
-                for tool_call in tool_calls:
-                    # Find the corresponding tool result for this tool call
-                    tool_result_for_call = None
-                    for executed_tool in tool_calls:
-                        if executed_tool['id'] == tool_call['id']:
-                            # We need to reconstruct the tool result since it's not stored per tool call
-                            tool_result_for_call = {"status": "executed", "tool_id": tool_call['id']}
-                            break
-                    
+                for tool_call, tool_result in zip(tool_calls, tool_results):
                     messages.append({
                         "role": "tool",
                         "tool_call_id": tool_call['id'],
-                        "content": json.dumps(tool_result_for_call or {"status": "unknown"})
+                        "content": json.dumps(tool_result, default=str)
                     })
 
-                # Get final response after tool execution
-                final_response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=messages,
-                    stream=True
-                )
-
-                try:
-                    for chunk in final_response:
-                        if hasattr(chunk.choices[0], 'delta') and chunk.choices[0].delta and chunk.choices[0].delta.content:
-                            content = chunk.choices[0].delta.content
-                            # Filter out any tool-related content or internal processing
-                            if not any(keyword in content.lower() for keyword in [
-                                'questionnaire_id', 'status', 'tool_id', 'question_text', 
-                                'answer_type', 'executed', 'call_', 'uti_screen'
-                            ]):
-                                full_response += content
-                                chunk_data = f"data: {json.dumps({'type': 'content', 'content': content})}\n\n"
-                                print(f"Sending final chunk: {repr(content)} -> {repr(chunk_data)}")
-                                yield chunk_data
-                except Exception as e:
-                    print(f"Error during final response streaming: {str(e)}")
-                    yield f"data: {json.dumps({'type': 'error', 'error': 'Final response streaming error'})}\n\n"
-
             # Save the final response to database
             if full_response:
                 await add_chat_message(session.session_id, "assistant", full_response)
-                print(f"Final response saved to database: {len(full_response)} characters")
+                logger.info("Final response saved to database", extra={"chars": len(full_response)})
 
             # Send completion signal
-            print("Sending completion signal")
-            yield f"data: {json.dumps({'type': 'complete', 'session_created': session_created})}\n\n"
+            logger.info("Sending completion signal")
+            yield sse.complete(session_created)
 
         except Exception as e:
-            print(f"Error in streaming chat: {str(e)}")
-            error_msg = "I'm having trouble processing your request right now. Please try again or contact support."
-            yield f"data: {json.dumps({'type': 'error', 'error': error_msg})}\n\n"
+            if isinstance(e, TimeoutError) and turn_deadline is not None and loop.time() >= turn_deadline:
+                logger.warning("Chat turn exceeded its time budget", extra={"chars": len(full_response)})
+                # Send and keep what the patient has already been shown, so the stored history matches it
+                try:
+                    content = stream_filter.flush() if stream_filter is not None else ""
+                    if content:
+                        full_response += content
+                        event = coalescer.feed(content)
+                        if event is not None:
+                            yield event
+                    event = coalescer.flush()
+                    if event is not None:
+                        yield event
+                    if full_response:
+                        await add_chat_message(session.session_id, "assistant", full_response)
+                except Exception:
+                    logger.exception("Could not save the partial response")
+                yield sse.TURN_TIME_BUDGET_EXCEEDED
+            else:
+                logger.exception("Error in streaming chat")
+                error_msg = "I'm having trouble processing your request right now. Please try again or contact support."
+                yield sse.error(error_msg)
 
     return StreamingResponse(
-        generate_stream(),
+        instrument_sse(traced_stream("chat.turn", generate_stream())),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache, no-transform",
@@ -380,6 +314,12 @@ Always prioritize patient safety and be direct with your questions. Let patients
         }
     )
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus text exposition of DB, MDI, OpenAI, tool and SSE metrics."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,156 @@
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Optional, Set
+
+from models import QuestionnaireMatchResult
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+def normalize_query(text: str) -> str:
+    """Lowercase words separated by single spaces, punctuation dropped"""
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+# Words that flip the meaning of what follows. normalize_query splits "don't" into "don t",
+# so a lone "t" marks a contracted negation.
+_NEGATIONS = frozenset({"no", "not", "never", "without", "none", "nothing", "nor", "neither", "non", "t", "denies", "denied", "negative"})
+
+def _reusable(key: str) -> bool:
+    """Only queries without negation are matched to near-duplicates; moving a "no" changes the meaning"""
+    return _NEGATIONS.isdisjoint(key.split())
+
+def _same_order(key: str, other: str) -> bool:
+    """The words the two queries share appear in the same order in both"""
+    words, other_words = key.split(), other.split()
+    common = set(words) & set(other_words)
+    return [w for w in words if w in common] == [w for w in other_words if w in common]
+
+def _ngrams(text: str, n: int = 3) -> FrozenSet[str]:
+    padded = f" {text} "
+    return frozenset(padded[i:i + n] for i in range(max(len(padded) - n + 1, 1)))
+
+class _MatchEntry:
+    __slots__ = ("result", "grams", "stored_at")
+
+    def __init__(self, result: QuestionnaireMatchResult, grams: FrozenSet[str], stored_at: float):
+        self.result = result
+        self.grams = grams
+        self.stored_at = stored_at
+
+class QuestionnaireMatchCache:
+    """
+    Previous questionnaire matches keyed by normalized query text.
+
+    A lookup that misses the exact key falls back to near-duplicates: queries sharing
+    character trigrams are found through an inverted index and the best one is reused when
+    its Jaccard similarity reaches `similarity` and the words both queries share come in the
+    same order. Trigrams ignore word order and a short "no", so queries containing a negation
+    only ever reuse an exact match and are never offered to others. Entries expire after `ttl` seconds, the
+    cache is LRU-bounded by `max_entries`, and everything is dropped when a lookup sees a
+    different catalog than the one the entries were matched against.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, similarity: float):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self._entries: "OrderedDict[str, _MatchEntry]" = OrderedDict()
+        self._index: Dict[str, Set[str]] = {}
+        self._catalog: Optional[Any] = None
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_catalog(self, catalog: Any) -> None:
+        # The questionnaire cache hands out the same catalog object until its content changes
+        if catalog is not self._catalog:
+            if self._entries:
+                self.invalidations += 1
+            self.clear()
+            self._catalog = catalog
+
+    def get(self, query: str, catalog: Any) -> Optional[QuestionnaireMatchResult]:
+        self._check_catalog(catalog)
+        key = normalize_query(query)
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if now - entry.stored_at < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.result
+            self._remove(key)
+        near = self._nearest(key, now)
+        if near is not None:
+            self._entries.move_to_end(near)
+            self.near_hits += 1
+            return self._entries[near].result
+        self.misses += 1
+        return None
+
+    def _nearest(self, key: str, now: float) -> Optional[str]:
+        if not _reusable(key):
+            return None
+        grams = _ngrams(key)
+        shared: Dict[str, int] = {}
+        for gram in grams:
+            for candidate in self._index.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        best_key, best_similarity = None, 0.0
+        for candidate, overlap in shared.items():
+            entry = self._entries[candidate]
+            similarity = overlap / (len(grams) + len(entry.grams) - overlap)
+            if similarity > best_similarity and now - entry.stored_at < self.ttl and _same_order(key, candidate):
+                best_key, best_similarity = candidate, similarity
+        return best_key if best_similarity >= self.similarity else None
+
+    def put(self, query: str, catalog: Any, result: QuestionnaireMatchResult) -> None:
+        self._check_catalog(catalog)
+        key = normalize_query(query)
+        if key in self._entries:
+            self._remove(key)
+        # Negated queries stay out of the trigram index, so they are only reused on an exact match
+        grams = _ngrams(key) if _reusable(key) else frozenset()
+        self._entries[key] = _MatchEntry(result, grams, time.monotonic())
+        for gram in grams:
+            self._index.setdefault(gram, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        for gram in entry.grams:
+            keys = self._index.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[gram]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._index.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "similarity": self.similarity,
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+# MATCH_CACHE_TTL: seconds a match is reused. MATCH_CACHE_MAX_ENTRIES: LRU bound.
+# MATCH_CACHE_SIMILARITY: minimum trigram Jaccard similarity for a near-duplicate query to reuse a match.
+match_cache = QuestionnaireMatchCache(
+    ttl=float(os.getenv("MATCH_CACHE_TTL", "3600")),
+    max_entries=int(os.getenv("MATCH_CACHE_MAX_ENTRIES", "5000")),
+    similarity=float(os.getenv("MATCH_CACHE_SIMILARITY", "0.85")),
+)
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (session_id, message) where message is {"role", "content", "timestamp"}
+PendingMessage = Tuple[str, Dict[str, Any]]
+BatchWriter = Callable[[List[PendingMessage]], Awaitable[None]]
+
+_TICK = timedelta(microseconds=1)
+
+class ChatMessageWriter:
+    """
+    Write-behind buffer for chat message inserts.
+
+    `add` stamps a message, queues it and returns without waiting for the database. A
+    background task writes the queue in one batch every `flush_interval` seconds, or sooner
+    once `batch_size` messages are waiting. Messages are written in the order they were
+    added and timestamps are strictly increasing, so per-session order is kept. Messages not
+    yet committed are available from `pending` so reads can include them. A failed batch is
+    retried on the next flush; after `max_attempts` failures its messages are written one at
+    a time and any that still fail are logged, passed to `on_drop` and dropped. When
+    `max_pending` messages are queued, `add` waits for a flush, and raises if that flush fails.
+    `close` retries the final flush up to `max_attempts` times, `close_retry_delay` seconds
+    apart and longer each time, and logs the sessions of any messages it had to drop.
+
+    Read-your-writes only holds within this process. Another worker serving the same session
+    does not see messages queued here until they are committed, and its incremental reads
+    (newer than the last timestamp it has) skip any that commit with an older timestamp.
+    """
+
+    def __init__(self, write: BatchWriter, batch_size: int, flush_interval: float, max_pending: int, max_attempts: int = 3,
+                 on_drop: Optional[Callable[[PendingMessage], None]] = None, close_retry_delay: float = 0.5):
+        self.write = write
+        self.on_drop = on_drop
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.close_retry_delay = close_retry_delay
+        self._queue: List[PendingMessage] = []
+        self._in_flight: List[PendingMessage] = []
+        self._attempts = 0
+        self._last_timestamp: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._closing = False
+        self.batches = 0
+        self.written = 0
+        self.failures = 0
+        self.dropped = 0
+
+    def _start(self) -> None:
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    def _timestamp(self) -> datetime:
+        now = datetime.now(timezone.utc)
+        if self._last_timestamp is not None and now <= self._last_timestamp:
+            now = self._last_timestamp + _TICK
+        self._last_timestamp = now
+        return now
+
+    async def add(self, session_id: Any, role: str, content: str) -> Dict[str, Any]:
+        """Queue a message and return it with the timestamp it will be stored under"""
+        self._start()
+        while len(self._queue) >= self.max_pending:
+            if not await self.flush():
+                raise RuntimeError("Chat message buffer is full and the database write failed")
+        message = {"role": role, "content": content, "timestamp": self._timestamp()}
+        self._queue.append((str(session_id), message))
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+        return message
+
+    def pending(self, session_id: Any) -> List[Dict[str, Any]]:
+        """Messages for a session that are queued or being written, oldest first"""
+        key = str(session_id)
+        return [message for sid, message in self._in_flight + self._queue if sid == key]
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> bool:
+        """Write everything queued so far; False if the batch failed and was put back"""
+        ok, _ = await self._flush()
+        return ok
+
+    async def _flush(self) -> Tuple[bool, List[PendingMessage]]:
+        """flush(), also returning the messages dropped after the batch failed `max_attempts` times"""
+        if self._flush_lock is None:
+            return True, []
+        async with self._flush_lock:
+            if not self._queue:
+                return True, []
+            batch, self._queue = self._queue, []
+            self._in_flight = batch
+            try:
+                await self.write(batch)
+            except Exception:
+                self.failures += 1
+                self._attempts += 1
+                if self._attempts < self.max_attempts:
+                    logger.warning("Chat message batch failed; will retry", exc_info=True, extra={"messages": len(batch)})
+                    self._queue = batch + self._queue
+                    return False, []
+                logger.exception("Chat message batch failed repeatedly; writing messages one at a time", extra={"messages": len(batch)})
+                dropped = await self._write_individually(batch)
+            else:
+                dropped = []
+            finally:
+                self._in_flight = []
+            self._attempts = 0
+            self.batches += 1
+            self.written += len(batch) - len(dropped)
+            return True, dropped
+
+    async def _write_individually(self, batch: List[PendingMessage]) -> List[PendingMessage]:
+        dropped = []
+        for item in batch:
+            try:
+                await self.write([item])
+            except Exception:
+                logger.error("Dropping chat message that could not be written", exc_info=True, extra={"session_id": item[0]})
+                self._drop(item)
+                dropped.append(item)
+        return dropped
+
+    def _drop(self, item: PendingMessage) -> None:
+        self.dropped += 1
+        if self.on_drop is not None:
+            self.on_drop(item)
+
+    async def close(self) -> None:
+        """Stop the background task and write whatever is still queued"""
+        if self._task is not None:
+            # Let an in-progress batch finish rather than cancelling it halfway through a write
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        # A transient failure (e.g. the pool restarting) should not lose every buffered message
+        dropped: List[PendingMessage] = []
+        for attempt in range(self.max_attempts):
+            if not self._queue:
+                break
+            if attempt:
+                await asyncio.sleep(self.close_retry_delay * attempt)
+            _, lost = await self._flush()
+            dropped += lost
+        if self._queue:
+            lost, self._queue = self._queue, []
+            for item in lost:
+                self._drop(item)
+            dropped += lost
+        if dropped:
+            logger.error("Chat messages dropped at shutdown", extra={
+                "messages": len(dropped), "session_ids": sorted({session_id for session_id, _ in dropped}),
+            })
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": len(self._queue),
+            "in_flight": len(self._in_flight),
+            "batches": self.batches,
+            "written": self.written,
+            "failures": self.failures,
+            "dropped": self.dropped,
+        }
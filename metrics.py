@@ -0,0 +1,148 @@
+import functools
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Tuple, Union
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Everything is registered on the default prometheus_client registry and served by GET /metrics,
+# so no external collector or push gateway is needed to inspect it.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+DB_HELPER_SECONDS = Histogram(
+    "scoby_db_helper_seconds", "Latency of database.py helpers", ["helper"], buckets=LATENCY_BUCKETS
+)
+MDI_REQUEST_SECONDS = Histogram(
+    "scoby_mdi_request_seconds", "Latency of MD Integrations requests", ["method", "endpoint", "status"], buckets=LATENCY_BUCKETS
+)
+OPENAI_TIME_TO_FIRST_TOKEN_SECONDS = Histogram(
+    "scoby_openai_time_to_first_token_seconds", "Time from request to first streamed delta", ["model"], buckets=LATENCY_BUCKETS
+)
+OPENAI_STREAM_SECONDS = Histogram(
+    "scoby_openai_stream_seconds", "Total duration of a streamed completion", ["model"], buckets=LATENCY_BUCKETS
+)
+OPENAI_TOKENS_PER_SECOND = Histogram(
+    "scoby_openai_tokens_per_second", "Streamed deltas per second of a completion", ["model"],
+    buckets=(1, 5, 10, 20, 35, 50, 75, 100, 150, 200, 300, 500)
+)
+OPENAI_PROMPT_TOKENS = Counter(
+    "scoby_openai_prompt_tokens", "Prompt tokens billed for streamed completions", ["model"]
+)
+OPENAI_CACHED_PROMPT_TOKENS = Counter(
+    "scoby_openai_cached_prompt_tokens", "Prompt tokens served from the provider's prompt cache", ["model"]
+)
+TOOL_EXECUTION_SECONDS = Histogram(
+    "scoby_tool_execution_seconds", "Latency of chat tool execution", ["function_name"], buckets=LATENCY_BUCKETS
+)
+SSE_BYTES_PER_TURN = Histogram(
+    "scoby_sse_bytes_per_turn", "Bytes sent on one /chat event stream",
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576)
+)
+SSE_EVENTS_PER_TURN = Histogram(
+    "scoby_sse_events_per_turn", "Events sent on one /chat event stream",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+)
+ACTIVE_STREAMS = Gauge("scoby_active_streams", "Open /chat event streams")
+CHAT_TURNS = Counter("scoby_chat_turns", "Completed /chat turns")
+
+# MDI path segments that are part of the route rather than an identifier
+_MDI_LITERAL_SEGMENTS = {
+    "patients", "cases", "files", "metadata", "states", "auth", "token",
+    "questionnaires", "questions", "questionnaire-match",
+}
+
+def _bound(metric: Union[Histogram, Counter]) -> Callable[..., Any]:
+    """Memoize label children so the hot path is a dict lookup, not a labels() call"""
+    children: Dict[Tuple[str, ...], Any] = {}
+
+    def child(*labels: str) -> Any:
+        bound = children.get(labels)
+        if bound is None:
+            bound = children[labels] = metric.labels(*labels)
+        return bound
+
+    return child
+
+db_helper_child = _bound(DB_HELPER_SECONDS)
+mdi_request_child = _bound(MDI_REQUEST_SECONDS)
+time_to_first_token_child = _bound(OPENAI_TIME_TO_FIRST_TOKEN_SECONDS)
+stream_seconds_child = _bound(OPENAI_STREAM_SECONDS)
+tokens_per_second_child = _bound(OPENAI_TOKENS_PER_SECOND)
+tool_execution_child = _bound(TOOL_EXECUTION_SECONDS)
+prompt_tokens_child = _bound(OPENAI_PROMPT_TOKENS)
+cached_prompt_tokens_child = _bound(OPENAI_CACHED_PROMPT_TOKENS)
+
+def observe_db(func: Callable) -> Callable:
+    """Record the latency of an async database helper under its function name"""
+    child = db_helper_child(func.__name__)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            child.observe(time.perf_counter() - start)
+
+    return wrapper
+
+def mdi_endpoint_template(endpoint: str) -> str:
+    """Collapse identifiers in an MDI path so the endpoint label has bounded cardinality"""
+    return "/".join(s if s in _MDI_LITERAL_SEGMENTS else "{id}" for s in endpoint.strip("/").split("/"))
+
+def observe_mdi_request(method: str, endpoint: str, status: Union[int, str], seconds: float) -> None:
+    mdi_request_child(method, mdi_endpoint_template(endpoint), str(status)).observe(seconds)
+
+class CompletionTimer:
+    """Time-to-first-token, duration, delta rate and prompt cache reuse for one streamed completion"""
+
+    __slots__ = ("model", "start", "first_token_at", "deltas", "prompt_tokens", "cached_tokens")
+
+    def __init__(self, model: str):
+        self.model = model
+        self.start = time.perf_counter()
+        self.first_token_at = 0.0
+        self.deltas = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def usage(self, usage: Any) -> None:
+        """Record the usage chunk sent with stream_options={"include_usage": True}"""
+        self.prompt_tokens = usage.prompt_tokens or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        self.cached_tokens = (details.cached_tokens or 0) if details is not None else 0
+        prompt_tokens_child(self.model).inc(self.prompt_tokens)
+        cached_prompt_tokens_child(self.model).inc(self.cached_tokens)
+
+    def delta(self) -> None:
+        if not self.deltas:
+            self.first_token_at = time.perf_counter()
+            time_to_first_token_child(self.model).observe(self.first_token_at - self.start)
+        self.deltas += 1
+
+    def finish(self) -> None:
+        end = time.perf_counter()
+        stream_seconds_child(self.model).observe(end - self.start)
+        if self.deltas and end > self.first_token_at:
+            tokens_per_second_child(self.model).observe(self.deltas / (end - self.first_token_at))
+
+async def instrument_sse(stream: AsyncIterator[Union[str, bytes]]) -> AsyncIterator[Union[str, bytes]]:
+    """Pass an SSE stream through while counting its events and bytes and tracking open streams"""
+    ACTIVE_STREAMS.inc()
+    events = 0
+    sent = 0
+    try:
+        async for chunk in stream:
+            events += 1
+            # ASCII text is one byte per character, so only non-ASCII chunks pay for an encode
+            sent += len(chunk) if isinstance(chunk, bytes) or chunk.isascii() else len(chunk.encode("utf-8"))
+            yield chunk
+    finally:
+        ACTIVE_STREAMS.dec()
+        SSE_EVENTS_PER_TURN.observe(events)
+        SSE_BYTES_PER_TURN.observe(sent)
+        CHAT_TURNS.inc()
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Current metrics in the Prometheus text exposition format, with its content type"""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,168 @@
+"""
+Versioned schema migrations.
+
+Migrations are the SQL files in migrations/, named <version>_<name>.sql and applied in
+version order. Applied versions are recorded in schema_migrations, so each file runs once
+per database. A file runs in a single transaction unless its first line is
+`-- migrate: no-transaction` (needed for CREATE INDEX CONCURRENTLY); such a file is split
+on semicolons and its statements run one at a time, so it must not contain function
+bodies or DO blocks. A failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind that
+IF NOT EXISTS would then skip; the next run drops and rebuilds it, and no index is recorded
+as applied until it is valid.
+
+    python migrate.py            # apply pending migrations to DATABASE_URL
+    python migrate.py --status   # list applied and pending versions
+"""
+import argparse
+import asyncio
+import logging
+import os
+import re
+from typing import List, NamedTuple, Optional
+
+import asyncpg
+from dotenv import load_dotenv
+
+from database import close_db_pool, db_connection
+from logging_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+_FILENAME = re.compile(r"^(\d+)_(\w+)\.sql$")
+_NO_TRANSACTION = "-- migrate: no-transaction"
+_CONCURRENT_INDEX = re.compile(r"^CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)", re.IGNORECASE)
+# pg_advisory_lock key; any constant works as long as every process migrating this database uses it
+_LOCK_KEY = 742_600_001
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    sql: str
+
+    @property
+    def transactional(self) -> bool:
+        return not self.sql.lstrip().startswith(_NO_TRANSACTION)
+
+    def statements(self) -> List[str]:
+        lines = [line for line in self.sql.splitlines() if not line.lstrip().startswith("--")]
+        return [statement.strip() for statement in "\n".join(lines).split(";") if statement.strip()]
+
+def load_migrations(directory: str = MIGRATIONS_DIR) -> List[Migration]:
+    migrations = []
+    for filename in os.listdir(directory):
+        match = _FILENAME.match(filename)
+        if not match:
+            continue
+        with open(os.path.join(directory, filename)) as f:
+            migrations.append(Migration(int(match.group(1)), match.group(2), f.read()))
+    migrations.sort(key=lambda m: m.version)
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+async def _applied_versions(conn: asyncpg.Connection) -> List[int]:
+    await conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version integer PRIMARY KEY,
+            name text NOT NULL,
+            applied_at timestamptz NOT NULL DEFAULT now()
+        )
+        """
+    )
+    return [row["version"] for row in await conn.fetch("SELECT version FROM schema_migrations ORDER BY version")]
+
+async def _index_is_valid(conn: asyncpg.Connection, name: str) -> Optional[bool]:
+    """None if there is no such index on the search path"""
+    return await conn.fetchval(
+        """
+        SELECT i.indisvalid
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = $1 AND pg_catalog.pg_table_is_visible(c.oid)
+        """,
+        name,
+    )
+
+async def _create_index_concurrently(conn: asyncpg.Connection, name: str, statement: str) -> None:
+    if await _index_is_valid(conn, name) is False:
+        logger.warning("Rebuilding invalid index left by an interrupted build", extra={"index": name})
+        await conn.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+    await conn.execute(statement)
+    if not await _index_is_valid(conn, name):
+        raise RuntimeError(f"Index {name} is missing or invalid after CREATE INDEX CONCURRENTLY")
+
+async def _apply(conn: asyncpg.Connection, migration: Migration) -> None:
+    record = "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)"
+    if migration.transactional:
+        async with conn.transaction():
+            await conn.execute(migration.sql)
+            await conn.execute(record, migration.version, migration.name)
+        return
+    for statement in migration.statements():
+        index = _CONCURRENT_INDEX.match(statement)
+        if index:
+            await _create_index_concurrently(conn, index.group(1), statement)
+        else:
+            await conn.execute(statement)
+    await conn.execute(record, migration.version, migration.name)
+
+async def run_migrations(target: Optional[int] = None) -> List[int]:
+    """
+    Apply pending migrations up to `target` (all by default) and return the versions applied.
+    A session-level advisory lock lets several workers call this at startup; the others wait
+    and then find nothing left to do.
+    """
+    applied_now = []
+    async with db_connection() as conn:
+        await conn.execute("SELECT pg_advisory_lock($1)", _LOCK_KEY)
+        try:
+            applied = set(await _applied_versions(conn))
+            for migration in load_migrations():
+                if migration.version in applied or (target is not None and migration.version > target):
+                    continue
+                logger.info("Applying migration", extra={"version": migration.version, "migration": migration.name})
+                await _apply(conn, migration)
+                applied_now.append(migration.version)
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", _LOCK_KEY)
+    return applied_now
+
+async def pending_migrations() -> List[Migration]:
+    """Migrations not applied yet; read-only, so it does not create schema_migrations"""
+    async with db_connection() as conn:
+        try:
+            rows = await conn.fetch("SELECT version FROM schema_migrations ORDER BY version")
+        except asyncpg.UndefinedTableError:
+            rows = []
+    applied = {row["version"] for row in rows}
+    return [m for m in load_migrations() if m.version not in applied]
+
+async def migration_status() -> List[dict]:
+    async with db_connection() as conn:
+        applied = set(await _applied_versions(conn))
+    return [
+        {"version": m.version, "name": m.name, "applied": m.version in applied}
+        for m in load_migrations()
+    ]
+
+async def _main(args: argparse.Namespace) -> None:
+    try:
+        if args.status:
+            for row in await migration_status():
+                print(f"{row['version']:04d} {row['name']}: {'applied' if row['applied'] else 'pending'}")
+        else:
+            applied = await run_migrations(args.target)
+            print(f"Applied {len(applied)} migration(s): {applied}" if applied else "Database is up to date")
+    finally:
+        await close_db_pool()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="list migrations instead of applying them")
+    parser.add_argument("--target", type=int, help="apply migrations up to this version only")
+    load_dotenv()
+    setup_logging()
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,28 @@
+-- Tables as database.py uses them. IF NOT EXISTS so databases created before migrations
+-- existed are adopted as-is.
+
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id uuid PRIMARY KEY,
+    questionnaire_id text,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    last_updated timestamptz NOT NULL DEFAULT now(),
+    is_questionnaire_complete boolean NOT NULL DEFAULT false
+);
+
+CREATE TABLE IF NOT EXISTS chat_messages (
+    id bigint GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    session_id uuid NOT NULL REFERENCES sessions (session_id) ON DELETE CASCADE,
+    role text NOT NULL,
+    content text NOT NULL,
+    timestamp timestamptz NOT NULL DEFAULT clock_timestamp()
+);
+
+CREATE TABLE IF NOT EXISTS questionnaire_answers (
+    id bigint GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    session_id uuid NOT NULL REFERENCES sessions (session_id) ON DELETE CASCADE,
+    question_id text NOT NULL,
+    question_text text,
+    answer text,
+    type text,
+    created_at timestamptz NOT NULL DEFAULT clock_timestamp()
+);
@@ -0,0 +1,21 @@
+-- migrate: no-transaction
+-- The unique key the answer upserts resolve ON CONFLICT against; without it every answer save
+-- fails. Built CONCURRENTLY so the table stays writable; if the build fails, re-running the
+-- migration drops the INVALID index it left behind and builds it again (see migrate.py).
+
+-- Answers used to be saved with a plain INSERT, so a question can have several rows for one
+-- session. Keep the latest and drop the rest, or the unique index below cannot be built.
+-- Ties on created_at (rows inserted in one transaction under a now() default) go to the
+-- later physical row, since tables older than 0001 may have no id column. This runs again on
+-- a re-run, so duplicates an older app version inserts meanwhile are cleaned up too.
+DELETE FROM questionnaire_answers a
+USING questionnaire_answers b
+WHERE a.session_id = b.session_id
+  AND a.question_id = b.question_id
+  AND (a.created_at < b.created_at OR (a.created_at = b.created_at AND a.ctid < b.ctid));
+
+-- ON CONFLICT (session_id, question_id) in the answer upserts (database.save_questionnaire_answer
+-- and save_questionnaire_answers_bulk), update_questionnaire_answer, and the per-session answer
+-- reads via its leading column
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS questionnaire_answers_session_question_key
+    ON questionnaire_answers (session_id, question_id);
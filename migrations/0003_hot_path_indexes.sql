@@ -0,0 +1,13 @@
+-- migrate: no-transaction
+-- Indexes for the access paths in database.py. Built CONCURRENTLY so existing tables stay
+-- writable; if a build fails, re-running the migration drops the INVALID index it left
+-- behind and builds it again (see migrate.py).
+
+-- get_chat_messages_from_db / get_chat_messages_since / hydrate_session:
+-- WHERE session_id = $1 [AND timestamp > $2] ORDER BY timestamp
+CREATE INDEX CONCURRENTLY IF NOT EXISTS chat_messages_session_timestamp_idx
+    ON chat_messages (session_id, timestamp);
+
+-- get_unanswered_questions: WHERE session_id = $1 AND answer IS NULL
+CREATE INDEX CONCURRENTLY IF NOT EXISTS questionnaire_answers_unanswered_idx
+    ON questionnaire_answers (session_id) INCLUDE (question_id) WHERE answer IS NULL;
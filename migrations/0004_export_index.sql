@@ -0,0 +1,6 @@
+-- migrate: no-transaction
+-- Export cursors (database.export_rows) walk completed sessions in (created_at, session_id)
+-- order. With this index they stream from the first row, filtering on created_at by range,
+-- instead of sorting every completed session (and all its answers and messages) up front.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS sessions_completed_created_idx
+    ON sessions (created_at, session_id) WHERE is_questionnaire_complete;
@@ -0,0 +1,20 @@
+-- Tables created before 0001 may have timestamp-without-time-zone columns, while the app
+-- writes and compares timezone-aware timestamps (e.g. the chat message writer's own stamps).
+-- Convert any such column to timestamptz. Existing values were written by now() defaults, so
+-- they are read in the server's TimeZone, which is what the cast assumes. The ALTER rewrites
+-- the table (and locks it) unless TimeZone is UTC, so run this in a quiet period on big tables.
+DO $$
+DECLARE
+    col record;
+BEGIN
+    FOR col IN
+        SELECT table_name, column_name
+        FROM information_schema.columns
+        WHERE table_schema = current_schema()
+          AND table_name IN ('sessions', 'chat_messages', 'questionnaire_answers')
+          AND data_type = 'timestamp without time zone'
+    LOOP
+        EXECUTE format('ALTER TABLE %I ALTER COLUMN %I TYPE timestamptz', col.table_name, col.column_name);
+    END LOOP;
+END
+$$;
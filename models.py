@@ -227,6 +227,7 @@ class ChatMessage(BaseModel):
 
 class QuestionnaireMatchResult(BaseModel):
     questionnaire_id: Optional[str] = None
+    confidence: Optional[float] = None
     clarifying_question: Optional[str] = None
     available_options: Optional[List[str]] = None
 
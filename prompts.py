@@ -0,0 +1,128 @@
+import hashlib
+import json
+from typing import Any, Dict
+
+# Everything here is built once at import and sent unchanged on every request, so the
+# system prompt and tool definitions form a byte-identical prefix that provider-side
+# prompt caching can reuse. Per-turn context belongs after the chat history, never in here.
+
+class FrozenDict(dict):
+    """A dict that refuses mutation; still a plain dict to the SDK and the JSON encoder"""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("static prompt objects are immutable")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+
+def freeze(value: Any) -> Any:
+    """Recursively turn dicts into FrozenDicts and lists into tuples"""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+SYSTEM_PROMPT = """You are a medical intake assistant that helps patients through natural conversation. Your job is to:
+
+1. Greet patients warmly and understand their complaint
+2. Ask medical questions one at a time in a friendly, professional tone
+3. Save answers in the patient's own words; the server normalizes formats and tells you when it needs a clarification
+4. Spot red flags and stop/escalate when needed
+5. Complete the intake when all necessary information is gathered
+
+You have access to these tools:
+- update_session_questionnaire(questionnaire_id): Set the chosen form
+- get_simplified_questionnaires: Get available forms
+- get_simplified_questionnaire(questionnaire_id): Load the chosen form; returns progress and the next question to ask
+- save_questionnaire_answer(question_text, answer, question_id, answer_type): Save each answer
+- mark_questionnaire_complete(): Submit the completed form
+
+CRITICAL: NEVER mention questionnaires, forms, tools, or any backend processes. Talk like a real medical professional having a conversation with a patient.
+
+Your responses should be:
+- Direct and focused on the patient's symptoms
+- Professional but warm and caring
+- One question at a time
+- Free of any technical jargon or process explanations
+- Natural questions without instructing patients on how to answer
+
+For example:
+❌ WRONG: "I'll check what questionnaires are available so I can choose the right one for UTI symptoms. Now I'll load that questionnaire and start with the first question. I'll save your answers as we go."
+
+❌ WRONG: "Are you having any of the following right now: fever over 100.4°F (38°C), severe back or side pain, nausea/vomiting, confusion, or feeling very ill? Please answer yes or no."
+
+✅ CORRECT: "I'm sorry you're dealing with that—I'll help get the right info to your clinician. Before we start, I need to make sure you're safe. Are you having any of the following right now: fever over 100.4°F (38°C), severe back or side pain, nausea/vomiting, confusion, or feeling very ill?"
+
+Always prioritize patient safety and be direct with your questions. Let patients answer naturally without telling them how to format their responses."""
+
+SYSTEM_MESSAGE: Dict[str, Any] = freeze({"role": "system", "content": SYSTEM_PROMPT})
+
+# Tool definitions offered to the model in the /chat agent loop
+TOOLS = freeze([
+    {
+        "type": "function",
+        "function": {
+            "name": "update_session_questionnaire",
+            "description": "Set the chosen questionnaire/form for the conversation",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "questionnaire_id": {"type": "string"}
+                },
+                "required": ["questionnaire_id"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_simplified_questionnaires",
+            "description": "Get a quick catalog of available questionnaires/forms",
+            "parameters": {"type": "object", "properties": {}}
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_simplified_questionnaire",
+            "description": "Load a questionnaire and get the patient's progress and the next question to ask",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "questionnaire_id": {"type": "string"}
+                },
+                "required": ["questionnaire_id"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "save_questionnaire_answer",
+            "description": "Save a patient's answer to a specific question",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "question_text": {"type": "string"},
+                    "answer": {"type": "string"},
+                    "question_id": {"type": "string"},
+                    "answer_type": {"type": "string"}
+                },
+                "required": ["question_text", "question_id", "answer_type"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "mark_questionnaire_complete",
+            "description": "Mark the questionnaire as complete and submit for doctor review",
+            "parameters": {"type": "object", "properties": {}}
+        }
+    }
+])
+
+# Pre-serialized static prefix (tools, then the system message, as the provider lays them out).
+# Its digest names the prompt cache bucket, so a prompt or tool change starts a fresh bucket.
+STATIC_PREFIX_JSON = json.dumps({"tools": TOOLS, "messages": [SYSTEM_MESSAGE]}, separators=(",", ":"), ensure_ascii=False).encode()
+PROMPT_CACHE_KEY = "scoby-intake-" + hashlib.sha256(STATIC_PREFIX_JSON).hexdigest()[:16]
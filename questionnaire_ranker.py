@@ -0,0 +1,106 @@
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be been but by can do for from get got has have having he her his how i im in is it its "
+    "me my of on or our she so that the their them there they this to too was we were what when where which who why "
+    "will with you your feel feeling like need want really very some any just also about help please".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords, with plural and -ing endings stripped"""
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        if len(token) > 5 and token.endswith("ing"):
+            token = token[:-3]
+        elif len(token) > 4 and token.endswith("es"):
+            token = token[:-2]
+        elif len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+class Ranking:
+    """Scored catalog entries for one query, best first, and the confidence in the top one"""
+
+    __slots__ = ("results", "confidence")
+
+    def __init__(self, results: List[Tuple[Dict[str, Any], float]], confidence: float):
+        self.results = results
+        self.confidence = confidence
+
+    @property
+    def best(self) -> Optional[Dict[str, Any]]:
+        return self.results[0][0] if self.results else None
+
+class QuestionnaireRanker:
+    """
+    BM25 over the questionnaire catalog, built once per catalog.
+
+    Each questionnaire is indexed by its name (counted twice, as the strongest signal),
+    intro title and intro description. Confidence in the top result is the share of the
+    query's IDF mass it matched, scaled by its lead over the runner-up: a query whose every
+    informative word hits a single questionnaire scores close to 1, a query that also hits
+    another questionnaire as well, or has words the catalog never uses, scores lower.
+    """
+
+    def __init__(self, catalog: List[Dict[str, Any]], k1: float = 1.2, b: float = 0.75):
+        self.catalog = catalog
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.lengths: List[int] = []
+        for doc_index, questionnaire in enumerate(catalog):
+            name = questionnaire.get("name") or ""
+            text = f"{name} {name} {questionnaire.get('intro_title') or ''} {questionnaire.get('intro_description') or ''}"
+            terms = tokenize(text)
+            self.lengths.append(len(terms))
+            for term, count in Counter(terms).items():
+                self.postings.setdefault(term, []).append((doc_index, count))
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        documents = len(catalog)
+        self.idf = {
+            term: math.log(1 + (documents - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+        # Words the catalog never uses weigh like the rarest possible term when measuring coverage
+        self.unknown_idf = math.log(1 + (documents + 0.5) / 0.5)
+
+    def rank(self, query: str, limit: Optional[int] = None) -> Ranking:
+        terms = set(tokenize(query))
+        if not terms or not self.catalog:
+            return Ranking([], 0.0)
+        scores: Dict[int, float] = {}
+        matched_idf: Dict[int, float] = {}
+        for term in terms:
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_index, count in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_index] / (self.average_length or 1))
+                scores[doc_index] = scores.get(doc_index, 0.0) + idf * count * (self.k1 + 1) / (count + norm)
+                matched_idf[doc_index] = matched_idf.get(doc_index, 0.0) + idf
+        ordered = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        if not ordered:
+            return Ranking([], 0.0)
+        top_index, top_score = ordered[0]
+        runner_up = ordered[1][1] if len(ordered) > 1 else 0.0
+        query_idf = sum(self.idf.get(term, self.unknown_idf) for term in terms)
+        coverage = matched_idf[top_index] / query_idf
+        confidence = coverage * top_score / (top_score + runner_up)
+        results = [(self.catalog[doc_index], score) for doc_index, score in ordered[:limit]]
+        return Ranking(results, round(confidence, 3))
+
+_ranker: Optional[QuestionnaireRanker] = None
+
+def get_ranker(catalog: List[Dict[str, Any]]) -> QuestionnaireRanker:
+    """The ranker for this catalog; rebuilt only when the questionnaire cache hands out a new catalog"""
+    global _ranker
+    if _ranker is None or _ranker.catalog is not catalog:
+        _ranker = QuestionnaireRanker(catalog)
+    return _ranker
@@ -0,0 +1,288 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from pydantic import UUID4
+
+from database import get_questionnaire_answers
+from MDI import get_simplified_questionnaire_schema
+
+# Canonical boolean answers and the spellings that mean the same thing
+_BOOLEAN_EQUIVALENTS = {
+    "0": {"0", "false", "no"},
+    "1": {"1", "true", "yes"},
+}
+
+class _Requirement:
+    __slots__ = ("question_id", "accepted")
+
+    def __init__(self, question_id: str, accepted: FrozenSet[str]):
+        self.question_id = question_id
+        self.accepted = accepted
+
+class _Rule:
+    __slots__ = ("match_all", "requirements")
+
+    def __init__(self, match_all: bool, requirements: Tuple[_Requirement, ...]):
+        self.match_all = match_all
+        self.requirements = requirements
+
+def _normalize_answer(answer: Any) -> Optional[str]:
+    if answer is None:
+        return None
+    text = str(answer).strip().lower()
+    return text or None
+
+def _answer_matches(answer: Optional[str], accepted: FrozenSet[str]) -> bool:
+    if answer is None:
+        return False
+    if answer in accepted:
+        return True
+    # Multi-select answers are saved as comma-separated values
+    return "," in answer and any(part.strip() in accepted for part in answer.split(","))
+
+class CompiledQuestionnaire:
+    """
+    A simplified questionnaire schema with its skip logic compiled once.
+
+    Each question's rules become tuples of requirements with the set of answers they accept
+    (the required option id, its option text and boolean spellings), and `dependents`
+    indexes, for every question, the questions whose rules read its answer. A question is
+    applicable when it has no rules or all of its rules pass; an "and" rule needs every
+    requirement to match and an "or" rule needs one. A requirement on a question that is
+    not itself applicable never matches, so skips cascade down dependency chains.
+    """
+
+    def __init__(self, schema: Dict[str, Any]):
+        self.id = schema.get("id")
+        self.name = schema.get("name", "")
+        self.questions: List[Dict[str, Any]] = sorted(
+            (q for q in schema.get("questions", []) if q.get("id")), key=lambda q: q.get("order", 0)
+        )
+        self.by_id: Dict[str, Dict[str, Any]] = {q["id"]: q for q in self.questions}
+        self._positions = {q["id"]: i for i, q in enumerate(self.questions)}
+        self.rules: Dict[str, Tuple[_Rule, ...]] = {}
+        dependents: Dict[str, Set[str]] = {}
+        for question in self.questions:
+            compiled_rules = []
+            for rule in question.get("rules") or []:
+                requirements = []
+                for req in rule.get("requirements") or []:
+                    required_id = req.get("required_question_id")
+                    if not required_id:
+                        continue
+                    requirements.append(_Requirement(required_id, self._accepted_answers(required_id, req.get("required_answer"))))
+                    dependents.setdefault(required_id, set()).add(question["id"])
+                if requirements:
+                    compiled_rules.append(_Rule(str(rule.get("rule_type") or "and").lower() != "or", tuple(requirements)))
+            if compiled_rules:
+                self.rules[question["id"]] = tuple(compiled_rules)
+        self.dependents: Dict[str, Tuple[str, ...]] = {
+            question_id: tuple(sorted(ids, key=self._position)) for question_id, ids in dependents.items()
+        }
+        self.evaluation_order = self._topological_order()
+
+    def _position(self, question_id: str) -> int:
+        return self._positions.get(question_id, len(self.questions))
+
+    def _accepted_answers(self, question_id: str, required_answer: Any) -> FrozenSet[str]:
+        required = _normalize_answer(required_answer)
+        if required is None:
+            return frozenset()
+        accepted = {required}
+        question = self.by_id.get(question_id) or {}
+        for option in question.get("options") or []:
+            if _normalize_answer(option.get("id")) == required and option.get("option"):
+                accepted.add(_normalize_answer(option["option"]))
+        accepted |= _BOOLEAN_EQUIVALENTS.get(required, set())
+        return frozenset(accepted)
+
+    def _topological_order(self) -> List[str]:
+        """Questions ordered so every rule is evaluated after the questions it reads; cycles fall back to form order"""
+        pending = {qid: {r.question_id for rule in rules for r in rule.requirements if r.question_id in self.by_id}
+                   for qid, rules in self.rules.items()}
+        order: List[str] = []
+        ready = [q["id"] for q in self.questions if not pending.get(q["id"])]
+        placed: Set[str] = set()
+        while ready:
+            question_id = ready.pop(0)
+            if question_id in placed:
+                continue
+            placed.add(question_id)
+            order.append(question_id)
+            for dependent in self.dependents.get(question_id, ()):
+                waiting = pending.get(dependent)
+                if waiting is not None:
+                    waiting.discard(question_id)
+                    if not waiting:
+                        ready.append(dependent)
+        order.extend(q["id"] for q in self.questions if q["id"] not in placed)
+        return order
+
+    def is_applicable(self, question_id: str, answers: Dict[str, Optional[str]], applicable: Set[str]) -> bool:
+        for rule in self.rules.get(question_id, ()):
+            matches = (
+                r.question_id in applicable and _answer_matches(answers.get(r.question_id), r.accepted)
+                for r in rule.requirements
+            )
+            if not (all(matches) if rule.match_all else any(matches)):
+                return False
+        return True
+
+    def progress(self, answers: Optional[Dict[str, Any]] = None) -> "QuestionnaireProgress":
+        return QuestionnaireProgress(self, answers or {})
+
+class QuestionnaireProgress:
+    """
+    Which questions of one session are still applicable and unanswered.
+
+    Built once from a full evaluation; `update` then applies only the answers that changed
+    and re-evaluates their dependents, following a dependent further only when its
+    applicability actually flipped.
+    """
+
+    def __init__(self, questionnaire: CompiledQuestionnaire, answers: Dict[str, Any]):
+        self.questionnaire = questionnaire
+        # When the answers were last read in full from the database
+        self.validated_at = time.monotonic()
+        self.answers: Dict[str, Optional[str]] = {}
+        for question_id, answer in answers.items():
+            normalized = _normalize_answer(answer)
+            if normalized is not None:
+                self.answers[question_id] = normalized
+        self.applicable: Set[str] = set()
+        for question_id in questionnaire.evaluation_order:
+            if questionnaire.is_applicable(question_id, self.answers, self.applicable):
+                self.applicable.add(question_id)
+
+    def update(self, answers: Dict[str, Any]) -> Set[str]:
+        """Merge a full answer map, re-evaluating only what changed; returns the changed question IDs"""
+        changed = {
+            question_id for question_id in set(answers) | set(self.answers)
+            if _normalize_answer(answers.get(question_id)) != self.answers.get(question_id)
+        }
+        return self.apply({question_id: answers.get(question_id) for question_id in changed})
+
+    def apply(self, changes: Dict[str, Any]) -> Set[str]:
+        """Apply individual answer changes (None clears an answer); returns the question IDs that changed"""
+        changed = set()
+        for question_id, answer in changes.items():
+            normalized = _normalize_answer(answer)
+            if self.answers.get(question_id) == normalized:
+                continue
+            changed.add(question_id)
+            if normalized is None:
+                self.answers.pop(question_id, None)
+            else:
+                self.answers[question_id] = normalized
+        self._propagate(changed)
+        return changed
+
+    def _propagate(self, changed: Iterable[str]) -> None:
+        questionnaire = self.questionnaire
+        worklist = [d for question_id in changed for d in questionnaire.dependents.get(question_id, ())]
+        flips: Dict[str, int] = {}
+        while worklist:
+            question_id = worklist.pop()
+            applicable = questionnaire.is_applicable(question_id, self.answers, self.applicable)
+            if applicable == (question_id in self.applicable):
+                continue
+            # A malformed schema with a rule cycle could otherwise flip forever
+            flips[question_id] = flips.get(question_id, 0) + 1
+            if flips[question_id] > 2:
+                continue
+            if applicable:
+                self.applicable.add(question_id)
+            else:
+                self.applicable.discard(question_id)
+            worklist.extend(questionnaire.dependents.get(question_id, ()))
+
+    def next_question(self) -> Optional[Dict[str, Any]]:
+        for question in self.questionnaire.questions:
+            if question["id"] in self.applicable and question["id"] not in self.answers:
+                return question
+        return None
+
+    def summary(self) -> Dict[str, Any]:
+        """What the model needs for the next step: counts and only the next question to ask, without rules"""
+        next_question = self.next_question()
+        applicable_total = len(self.applicable)
+        answered = sum(1 for question_id in self.answers if question_id in self.applicable)
+        result = {
+            "questionnaire_id": self.questionnaire.id,
+            "name": self.questionnaire.name,
+            "applicable_questions": applicable_total,
+            "answered": answered,
+            "remaining": applicable_total - answered,
+            "next_question": None,
+        }
+        if next_question is not None:
+            result["next_question"] = {
+                key: next_question.get(key) for key in ("id", "title", "desc", "type")
+            }
+            if next_question.get("options"):
+                result["next_question"]["options"] = [
+                    {"id": option.get("id"), "option": option.get("option")} for option in next_question["options"]
+                ]
+        return result
+
+# Compiled schemas keyed by questionnaire ID, LRU-bounded by QUESTIONNAIRE_COMPILED_MAX_ENTRIES;
+# recompiled when the questionnaire cache hands out a new schema
+_compiled: "OrderedDict[Any, Tuple[Dict[str, Any], CompiledQuestionnaire]]" = OrderedDict()
+_COMPILED_MAX_ENTRIES = int(os.getenv("QUESTIONNAIRE_COMPILED_MAX_ENTRIES", "256"))
+
+def compile_questionnaire(schema: Dict[str, Any]) -> CompiledQuestionnaire:
+    key = schema.get("id")
+    cached = _compiled.get(key)
+    if cached is not None and cached[0] is schema:
+        _compiled.move_to_end(key)
+        return cached[1]
+    compiled = CompiledQuestionnaire(schema)
+    _remember(_compiled, key, (schema, compiled), _COMPILED_MAX_ENTRIES)
+    return compiled
+
+# Per-session progress between turns, LRU-bounded by QUESTIONNAIRE_PROGRESS_MAX_SESSIONS. Answers saved
+# in this process are applied through record_answers; QUESTIONNAIRE_PROGRESS_TTL bounds how long
+# answers written elsewhere (another worker, a direct update) can go unseen.
+_progress: "OrderedDict[Tuple[str, str], QuestionnaireProgress]" = OrderedDict()
+_PROGRESS_MAX_SESSIONS = int(os.getenv("QUESTIONNAIRE_PROGRESS_MAX_SESSIONS", "10000"))
+_PROGRESS_TTL = float(os.getenv("QUESTIONNAIRE_PROGRESS_TTL", "30"))
+
+async def get_questionnaire_progress(session_id: UUID4, questionnaire_id: str) -> QuestionnaireProgress:
+    """
+    Progress of a session through a questionnaire, from the answers saved so far.
+    Progress kept from an earlier call is served without reading the answers for
+    QUESTIONNAIRE_PROGRESS_TTL seconds. After that the answers are read once more and only
+    those that changed are re-evaluated.
+    """
+    questionnaire = compile_questionnaire(await get_simplified_questionnaire_schema(questionnaire_id))
+    key = (str(session_id), questionnaire_id)
+    progress = _progress.get(key)
+    if progress is not None and progress.questionnaire is questionnaire and time.monotonic() - progress.validated_at < _PROGRESS_TTL:
+        _remember(_progress, key, progress, _PROGRESS_MAX_SESSIONS)
+        return progress
+    answers = {row["question_id"]: row["answer"] for row in await get_questionnaire_answers(session_id)}
+    if progress is None or progress.questionnaire is not questionnaire:
+        progress = questionnaire.progress(answers)
+    else:
+        progress.update(answers)
+        progress.validated_at = time.monotonic()
+    _remember(_progress, key, progress, _PROGRESS_MAX_SESSIONS)
+    return progress
+
+async def record_answers(session_id: UUID4, questionnaire_id: str, answers: Dict[str, Any]) -> QuestionnaireProgress:
+    """Apply just-saved answers to the session's progress without re-reading every answer"""
+    key = (str(session_id), questionnaire_id)
+    progress = _progress.get(key)
+    if progress is None:
+        return await get_questionnaire_progress(session_id, questionnaire_id)
+    progress.apply(answers)
+    _remember(_progress, key, progress, _PROGRESS_MAX_SESSIONS)
+    return progress
+
+def _remember(cache: "OrderedDict[Any, Any]", key: Any, value: Any, max_entries: int) -> None:
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > max_entries:
+        cache.popitem(last=False)
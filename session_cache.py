@@ -0,0 +1,113 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Rough per-message bookkeeping cost (dict, datetime, list slot) on top of the content itself
+_MESSAGE_OVERHEAD_BYTES = 200
+
+class _HistoryEntry:
+    __slots__ = ("messages", "size", "validated_at")
+
+    def __init__(self, messages: List[Dict[str, Any]], size: int, validated_at: float):
+        self.messages = messages
+        self.size = size
+        self.validated_at = validated_at
+
+def _message_size(message: Dict[str, Any]) -> int:
+    return len(message.get("content") or "") + _MESSAGE_OVERHEAD_BYTES
+
+class SessionHistoryCache:
+    """
+    Per-session chat history kept in memory between /chat turns.
+
+    Entries are trusted for `ttl` seconds after they were last read from or written to the
+    database; after that the caller revalidates by fetching only rows newer than the last
+    cached timestamp. The cache is bounded by session count and by an approximate memory
+    budget, evicting least recently used sessions first.
+    """
+
+    def __init__(self, ttl: float, max_sessions: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Any, _HistoryEntry]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, session_id: Any) -> Tuple[Optional[List[Dict[str, Any]]], bool]:
+        """Return (messages, fresh). messages is None on a miss; stale entries must be revalidated."""
+        entry = self._entries.get(session_id)
+        if entry is None:
+            self.misses += 1
+            return None, False
+        self._entries.move_to_end(session_id)
+        if time.monotonic() - entry.validated_at < self.ttl:
+            self.hits += 1
+            return list(entry.messages), True
+        self.revalidations += 1
+        return list(entry.messages), False
+
+    def last_timestamp(self, session_id: Any) -> Optional[Any]:
+        entry = self._entries.get(session_id)
+        if entry is None or not entry.messages:
+            return None
+        return entry.messages[-1]["timestamp"]
+
+    def put(self, session_id: Any, messages: List[Dict[str, Any]]) -> None:
+        self.invalidate(session_id)
+        entry = _HistoryEntry(list(messages), sum(_message_size(m) for m in messages), time.monotonic())
+        self._entries[session_id] = entry
+        self._bytes += entry.size
+        self._evict()
+
+    def extend(self, session_id: Any, messages: List[Dict[str, Any]]) -> None:
+        """Append messages newer than the cached tail and mark the entry fresh; no-op for uncached sessions"""
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return
+        last = entry.messages[-1]["timestamp"] if entry.messages else None
+        for message in messages:
+            if last is None or message["timestamp"] > last:
+                entry.messages.append(message)
+                size = _message_size(message)
+                entry.size += size
+                self._bytes += size
+                last = message["timestamp"]
+        entry.validated_at = time.monotonic()
+        self._entries.move_to_end(session_id)
+        self._evict()
+
+    def invalidate(self, session_id: Any) -> None:
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._entries),
+            "bytes": self._bytes,
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "revalidations": self.revalidations,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _evict(self) -> None:
+        while self._entries and (len(self._entries) > self.max_sessions or self._bytes > self.max_bytes):
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self.evictions += 1
+
+# CHAT_HISTORY_CACHE_TTL: seconds a cached history is used without checking the database for newer rows.
+# CHAT_HISTORY_CACHE_MAX_SESSIONS / CHAT_HISTORY_CACHE_MAX_BYTES: LRU bounds on session count and memory.
+history_cache = SessionHistoryCache(
+    ttl=float(os.getenv("CHAT_HISTORY_CACHE_TTL", "30")),
+    max_sessions=int(os.getenv("CHAT_HISTORY_CACHE_MAX_SESSIONS", "10000")),
+    max_bytes=int(os.getenv("CHAT_HISTORY_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+)
@@ -0,0 +1,85 @@
+import json
+import os
+import time
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps(value: Any) -> bytes:
+    """Compact JSON as UTF-8 bytes; orjson when installed, the stdlib encoder otherwise. Unknown types become strings."""
+    if orjson is not None:
+        return orjson.dumps(value, default=str)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+# Fixed event shapes, pre-encoded. Only the variable fields are serialized per event.
+_CONTENT_PREFIX = b'data: {"type":"content","content":'
+_TOOL_RESULT_PREFIX = b'data: {"type":"tool_result","tool_name":'
+_SESSION_ID_PREFIX = b'data: {"type":"session_id","session_id":'
+_ERROR_PREFIX = b'data: {"type":"error","error":'
+_END = b"}\n\n"
+
+TOOL_EXECUTION_START = b'data: {"type":"tool_execution_start"}\n\n'
+COMPLETE_SESSION_CREATED = b'data: {"type":"complete","session_created":true}\n\n'
+COMPLETE_SESSION_RETRIEVED = b'data: {"type":"complete","session_created":false}\n\n'
+STREAMING_ERROR = _ERROR_PREFIX + dumps("Streaming error occurred") + _END
+TURN_TIME_BUDGET_EXCEEDED = _ERROR_PREFIX + dumps("This is taking longer than expected. Please try again.") + _END
+
+def content(text: str) -> bytes:
+    return _CONTENT_PREFIX + dumps(text) + _END
+
+def tool_result(tool_name: str, result: Any) -> bytes:
+    return _TOOL_RESULT_PREFIX + dumps(tool_name) + b',"result":' + dumps(result) + _END
+
+def session_id(value: Any) -> bytes:
+    return _SESSION_ID_PREFIX + dumps(str(value)) + _END
+
+def complete(session_created: bool) -> bytes:
+    return COMPLETE_SESSION_CREATED if session_created else COMPLETE_SESSION_RETRIEVED
+
+def error(message: str) -> bytes:
+    return _ERROR_PREFIX + dumps(message) + _END
+
+class ContentCoalescer:
+    """
+    Merges small content deltas into fewer events.
+
+    The first delta of a response is sent straight away so time to first content is
+    unchanged; later deltas are buffered and sent as one event once `interval` seconds have
+    passed since the last event or `max_chars` characters are waiting. The check runs when a
+    delta arrives, so a caller must `flush()` before sending any other event and at the end
+    of the stream. An interval of 0 sends every delta as it comes.
+    """
+
+    __slots__ = ("interval", "max_chars", "_parts", "_chars", "_last_sent")
+
+    def __init__(self, interval: Optional[float] = None, max_chars: Optional[int] = None):
+        self.interval = float(os.getenv("SSE_COALESCE_INTERVAL_MS", "0")) / 1000 if interval is None else interval
+        self.max_chars = int(os.getenv("SSE_COALESCE_MAX_CHARS", "512")) if max_chars is None else max_chars
+        self._parts = []
+        self._chars = 0
+        self._last_sent: Optional[float] = None
+
+    def feed(self, text: str) -> Optional[bytes]:
+        """Buffer a delta; returns an encoded content event when one is due"""
+        if self.interval <= 0:
+            return content(text)
+        self._parts.append(text)
+        self._chars += len(text)
+        now = time.monotonic()
+        if self._last_sent is None or now - self._last_sent >= self.interval or self._chars >= self.max_chars:
+            return self._drain(now)
+        return None
+
+    def flush(self) -> Optional[bytes]:
+        """Encode whatever is buffered, e.g. before a tool event or at the end of a round"""
+        return self._drain(time.monotonic()) if self._parts else None
+
+    def _drain(self, now: float) -> bytes:
+        event = content("".join(self._parts))
+        self._parts.clear()
+        self._chars = 0
+        self._last_sent = now
+        return event
@@ -0,0 +1,106 @@
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+import asyncpg
+from asyncpg.prepared_stmt import PreparedStatement
+
+logger = logging.getLogger(__name__)
+
+class PreparedConnection(asyncpg.Connection):
+    """asyncpg connection that keeps the registry's prepared statements for its lifetime"""
+
+    prepared: Dict[str, PreparedStatement]
+
+class StatementRegistry:
+    """
+    Named SQL statements, prepared once per pooled connection.
+
+    `prepare_all` is the pool's `init` callback: every registered statement is parsed and
+    described when a connection opens, so no request pays for it. The helpers then run a
+    statement by name on whatever connection they hold; a connection that somehow lacks it
+    (e.g. one not created by the pool) prepares it on first use. If a schema change
+    invalidates a prepared statement, it is re-prepared and the call retried once when not
+    inside a transaction. With `enabled` off, the SQL text is sent as-is and asyncpg's own
+    statement cache applies, e.g. behind a pooler in transaction mode.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._sql: Dict[str, str] = {}
+        self.prepares = 0
+
+    def register(self, name: str, sql: str) -> str:
+        if self._sql.get(name, sql) != sql:
+            raise ValueError(f"Statement {name!r} is already registered with different SQL")
+        self._sql[name] = sql
+        return name
+
+    def sql(self, name: str) -> str:
+        return self._sql[name]
+
+    def names(self) -> List[str]:
+        return list(self._sql)
+
+    async def prepare_all(self, conn: asyncpg.Connection) -> None:
+        """Pool `init` callback"""
+        if not self.enabled:
+            return
+        conn.prepared = {}
+        for name in self._sql:
+            try:
+                await self._prepare(conn, name)
+            except asyncpg.PostgresError:
+                # e.g. the pool opens before migrations have created the tables; prepared on first use instead
+                logger.warning("Could not prepare statement at connect", exc_info=True, extra={"statement": name})
+
+    async def _prepare(self, conn: asyncpg.Connection, name: str) -> PreparedStatement:
+        statement = await conn.prepare(self._sql[name])
+        self.prepares += 1
+        prepared = getattr(conn, "prepared", None)
+        if prepared is None:
+            try:
+                prepared = conn.prepared = {}
+            except AttributeError:
+                # A plain asyncpg.Connection has no room to keep it; the statement is used once
+                return statement
+        prepared[name] = statement
+        return statement
+
+    async def _run(self, conn: asyncpg.Connection, name: str, method: str, *args: Any, **kwargs: Any) -> Any:
+        statement = (getattr(conn, "prepared", None) or {}).get(name) or await self._prepare(conn, name)
+        try:
+            return await getattr(statement, method)(*args, **kwargs)
+        except asyncpg.exceptions.InvalidCachedStatementError:
+            if conn.is_in_transaction():
+                raise
+            logger.info("Re-preparing statement after a schema change", extra={"statement": name})
+            statement = await self._prepare(conn, name)
+            return await getattr(statement, method)(*args, **kwargs)
+
+    async def fetch(self, conn: asyncpg.Connection, name: str, *args: Any) -> List[asyncpg.Record]:
+        if not self.enabled:
+            return await conn.fetch(self._sql[name], *args)
+        return await self._run(conn, name, "fetch", *args)
+
+    async def fetchrow(self, conn: asyncpg.Connection, name: str, *args: Any) -> Optional[asyncpg.Record]:
+        if not self.enabled:
+            return await conn.fetchrow(self._sql[name], *args)
+        return await self._run(conn, name, "fetchrow", *args)
+
+    async def fetchval(self, conn: asyncpg.Connection, name: str, *args: Any) -> Any:
+        if not self.enabled:
+            return await conn.fetchval(self._sql[name], *args)
+        return await self._run(conn, name, "fetchval", *args)
+
+    async def execute(self, conn: asyncpg.Connection, name: str, *args: Any) -> None:
+        """For statements that return no rows; prepared statements have no execute(), so fetch() runs them"""
+        if not self.enabled:
+            await conn.execute(self._sql[name], *args)
+            return
+        await self._run(conn, name, "fetch", *args)
+
+    async def executemany(self, conn: asyncpg.Connection, name: str, args: Iterable[Any]) -> None:
+        if not self.enabled:
+            await conn.executemany(self._sql[name], args)
+            return
+        await self._run(conn, name, "executemany", args)
@@ -0,0 +1,63 @@
+import pytest
+
+from answer_normalizer import normalize_answer
+
+DAYS_QUESTION = {"title": "How many days have you had symptoms?", "type": "integer"}
+
+@pytest.mark.parametrize("answer", [
+    "no idea",
+    "no, wait, yes",
+    "yesterday",
+    "not sure",
+    "yes I don't",
+    "no, actually yes",
+    "maybe",
+    "yes, sometimes",
+])
+def test_boolean_hedges_corrections_and_prefixes_are_unsure(answer):
+    result = normalize_answer(answer, "boolean")
+    assert not result.ok
+    assert result.value is None
+
+@pytest.mark.parametrize("answer, expected", [
+    ("yes", "true"),
+    ("Yes.", "true"),
+    ("yes, I have", "true"),
+    ("yep", "true"),
+    ("no", "false"),
+    ("No, never", "false"),
+    ("no I haven't", "false"),
+    ("not at all", "false"),
+])
+def test_boolean_clear_answers(answer, expected):
+    result = normalize_answer(answer, "boolean")
+    assert result.ok
+    assert result.value == expected
+
+@pytest.mark.parametrize("answer", ["2-3 days", "2 - 3 days", "2 to 3 days", "3 or 4", "2–3 weeks"])
+def test_integer_ranges_are_unsure(answer):
+    result = normalize_answer(answer, "integer", DAYS_QUESTION)
+    assert not result.ok
+    assert result.value is None
+
+@pytest.mark.parametrize("answer", ["-3 days", "-3", "-2 weeks"])
+def test_integer_negative_durations_are_rejected(answer):
+    result = normalize_answer(answer, "integer", DAYS_QUESTION)
+    assert not result.ok
+
+@pytest.mark.parametrize("answer", ["maybe 3 days", "3, no wait, 4 days", "I think 5", "not sure, 3?"])
+def test_integer_hedges_and_corrections_are_unsure(answer):
+    result = normalize_answer(answer, "integer", DAYS_QUESTION)
+    assert not result.ok
+
+@pytest.mark.parametrize("answer, expected", [
+    ("3 days", "3"),
+    ("two weeks", "14"),
+    ("a week", "7"),
+    ("about 10", "10"),
+    ("36 hours", "1.5"),
+])
+def test_integer_converts_to_the_question_unit(answer, expected):
+    result = normalize_answer(answer, "integer", DAYS_QUESTION)
+    assert result.ok
+    assert result.value == expected
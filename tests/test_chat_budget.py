@@ -0,0 +1,92 @@
+import asyncio
+import json
+import uuid
+from types import SimpleNamespace
+
+import httpx
+
+import main
+from llm import set_openai_client
+from models import ChatSession
+
+def _chunk(content=None, tool_calls=None):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content, tool_calls=tool_calls))])
+
+class FakeOpenAI:
+    """Plays one scripted stream per completion request: a list of chunks, or a number to sleep for"""
+
+    def __init__(self, *streams):
+        self.streams = list(streams)
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        self.requests.append(kwargs)
+        return self._stream(self.streams.pop(0))
+
+    async def _stream(self, items):
+        for item in items:
+            if isinstance(item, (int, float)):
+                await asyncio.sleep(item)
+            else:
+                yield item
+
+def _chat(monkeypatch, fake, budget, final_budget):
+    saved = []
+
+    async def get_or_create_session(session_id=None):
+        return ChatSession(session_id=uuid.uuid4(), messages=[], created_at="", last_updated="")
+
+    async def add_chat_message(session_id, role, content):
+        saved.append((role, content))
+
+    async def get_chat_history(session_id):
+        return []
+
+    monkeypatch.setenv("CHAT_TURN_TIME_BUDGET", str(budget))
+    monkeypatch.setenv("CHAT_FINAL_REPLY_BUDGET", str(final_budget))
+    monkeypatch.setenv("SSE_COALESCE_INTERVAL_MS", "0")
+    monkeypatch.setattr(main, "get_or_create_session", get_or_create_session)
+    monkeypatch.setattr(main, "add_chat_message", add_chat_message)
+    monkeypatch.setattr(main, "get_chat_history", get_chat_history)
+    set_openai_client(fake)
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async with client.stream("POST", "/chat", json={"message": "hello"}) as response:
+                return b"".join([part async for part in response.aiter_bytes()]).decode()
+
+    try:
+        return asyncio.run(run()), saved
+    finally:
+        set_openai_client(None)
+
+def _streamed_text(body):
+    events = [json.loads(line[len("data: "):]) for line in body.splitlines() if line.startswith("data: ")]
+    return "".join(event["content"] for event in events if event["type"] == "content")
+
+def test_spent_budget_falls_back_to_a_tool_free_reply(monkeypatch):
+    tool_call = SimpleNamespace(index=0, id="call-1", function=SimpleNamespace(name="get_simplified_questionnaires", arguments="{}"))
+    fake = FakeOpenAI([_chunk(tool_calls=[tool_call])], [_chunk("Here is what I found.")])
+
+    async def execute_tool_calls(session, tool_calls):
+        await asyncio.sleep(0.2)
+        return [{"questionnaires": []}]
+
+    monkeypatch.setattr(main, "execute_tool_calls", execute_tool_calls)
+    body, saved = _chat(monkeypatch, fake, budget=0.1, final_budget=5)
+
+    assert [request["tool_choice"] for request in fake.requests] == ["auto", "none"]
+    assert _streamed_text(body) == "Here is what I found."
+    assert main.sse.TURN_TIME_BUDGET_EXCEEDED.decode() not in body
+    assert saved[-1] == ("assistant", "Here is what I found.")
+
+def test_hard_cap_keeps_the_partial_reply(monkeypatch):
+    fake = FakeOpenAI([_chunk("Thanks, "), _chunk("let me"), 5])
+    body, saved = _chat(monkeypatch, fake, budget=0, final_budget=0.2)
+
+    assert body.endswith(main.sse.TURN_TIME_BUDGET_EXCEEDED.decode())
+    # Text held back by the keyword filter is released before the error event
+    assert _streamed_text(body) == "Thanks, let me"
+    assert saved[-1] == ("assistant", "Thanks, let me")
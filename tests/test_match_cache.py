@@ -0,0 +1,34 @@
+import pytest
+
+from match_cache import QuestionnaireMatchCache
+from models import QuestionnaireMatchResult
+
+CATALOG = object()
+
+@pytest.fixture
+def cache():
+    return QuestionnaireMatchCache(ttl=60, max_entries=100, similarity=0.85)
+
+def _result(questionnaire_id):
+    return QuestionnaireMatchResult(questionnaire_id=questionnaire_id, confidence=0.9)
+
+def test_exact_and_near_duplicate_queries_reuse_the_match(cache):
+    cache.put("Hair loss on the crown of my head", CATALOG, _result("hair"))
+    assert cache.get("hair loss on the crown of my head!", CATALOG).questionnaire_id == "hair"
+    assert cache.get("Hair loss on the crown of my heads", CATALOG).questionnaire_id == "hair"
+    assert (cache.hits, cache.near_hits) == (1, 1)
+
+@pytest.mark.parametrize("stored, query", [
+    ("pregnant, no hair loss", "not pregnant, hair loss"),
+    ("not pregnant, hair loss", "pregnant, no hair loss"),
+    ("I don't have a rash on my arm", "I do have a rash on my arm"),
+    ("I have a rash on my arm", "I don't have a rash on my arm"),
+])
+def test_negated_queries_only_match_exactly(cache, stored, query):
+    cache.put(stored, CATALOG, _result("stored"))
+    assert cache.get(query, CATALOG) is None
+    assert cache.get(stored, CATALOG).questionnaire_id == "stored"
+
+def test_reordered_words_do_not_reuse_the_match(cache):
+    cache.put("sore throat and back pain in the evening", CATALOG, _result("throat"))
+    assert cache.get("back throat and sore pain in the evening", CATALOG) is None
@@ -0,0 +1,85 @@
+import asyncio
+
+from message_writer import ChatMessageWriter
+
+def test_messages_that_cannot_be_written_are_reported_and_dropped():
+    dropped = []
+
+    async def write(batch):
+        raise RuntimeError("database unavailable")
+
+    async def scenario():
+        writer = ChatMessageWriter(write, batch_size=10, flush_interval=60, max_pending=100, max_attempts=2, on_drop=dropped.append)
+        message = await writer.add("session-1", "user", "hello")
+        assert writer.pending("session-1") == [message]
+        assert not await writer.flush()
+        assert await writer.flush()
+        await writer.close()
+        return writer, message
+
+    writer, message = asyncio.run(scenario())
+    assert dropped == [("session-1", message)]
+    assert writer.pending("session-1") == []
+    assert writer.stats()["dropped"] == 1
+    assert writer.stats()["written"] == 0
+
+def test_batches_keep_order_and_strictly_increasing_timestamps():
+    batches = []
+
+    async def write(batch):
+        batches.append(batch)
+
+    async def scenario():
+        writer = ChatMessageWriter(write, batch_size=10, flush_interval=60, max_pending=100)
+        for i in range(3):
+            await writer.add("session-1", "user", str(i))
+        await writer.close()
+
+    asyncio.run(scenario())
+    assert len(batches) == 1
+    messages = [message for _, message in batches[0]]
+    assert [m["content"] for m in messages] == ["0", "1", "2"]
+    assert all(a["timestamp"] < b["timestamp"] for a, b in zip(messages, messages[1:]))
+
+def test_close_retries_a_failed_final_flush():
+    batches = []
+    failures = [RuntimeError("pool restarting")]
+
+    async def write(batch):
+        if failures:
+            raise failures.pop()
+        batches.append(batch)
+
+    async def scenario():
+        writer = ChatMessageWriter(write, batch_size=10, flush_interval=60, max_pending=100, close_retry_delay=0)
+        await writer.add("session-1", "user", "hello")
+        await writer.close()
+        return writer
+
+    writer = asyncio.run(scenario())
+    assert len(batches) == 1
+    assert writer.stats()["written"] == 1
+    assert writer.stats()["dropped"] == 0
+
+def test_close_logs_the_sessions_it_could_not_write(caplog):
+    dropped = []
+
+    async def write(batch):
+        raise RuntimeError("database unavailable")
+
+    async def scenario():
+        writer = ChatMessageWriter(write, batch_size=10, flush_interval=60, max_pending=100, max_attempts=2,
+                                   on_drop=dropped.append, close_retry_delay=0)
+        await writer.add("session-2", "user", "hello")
+        await writer.add("session-1", "assistant", "hi")
+        await writer.close()
+        return writer
+
+    writer = asyncio.run(scenario())
+    assert [session_id for session_id, _ in dropped] == ["session-2", "session-1"]
+    assert writer.stats()["dropped"] == 2
+    assert writer.stats()["queued"] == 0
+    summary = [record for record in caplog.records if record.getMessage() == "Chat messages dropped at shutdown"]
+    assert len(summary) == 1
+    assert summary[0].messages == 2
+    assert summary[0].session_ids == ["session-1", "session-2"]
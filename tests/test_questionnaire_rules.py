@@ -0,0 +1,63 @@
+import asyncio
+import uuid
+
+import questionnaire_rules
+
+SCHEMA = {
+    "id": "qn",
+    "questions": [
+        {"id": "q1", "title": "Any allergies?", "type": "boolean", "order": 1},
+        {"id": "q2", "title": "Which ones?", "type": "text", "order": 2,
+         "rules": [{"rule_type": "and", "requirements": [{"required_question_id": "q1", "required_answer": "yes"}]}]},
+    ],
+}
+
+def _fake_db(monkeypatch, answers):
+    reads = []
+
+    async def get_simplified_questionnaire_schema(questionnaire_id):
+        return SCHEMA
+
+    async def get_questionnaire_answers(session_id):
+        reads.append(session_id)
+        return [{"question_id": question_id, "answer": answer} for question_id, answer in answers.items()]
+
+    monkeypatch.setattr(questionnaire_rules, "get_simplified_questionnaire_schema", get_simplified_questionnaire_schema)
+    monkeypatch.setattr(questionnaire_rules, "get_questionnaire_answers", get_questionnaire_answers)
+    monkeypatch.setattr(questionnaire_rules, "_progress", type(questionnaire_rules._progress)())
+    return reads
+
+def test_cached_progress_is_served_without_reading_answers(monkeypatch):
+    answers = {"q1": "yes"}
+    reads = _fake_db(monkeypatch, answers)
+    session_id = uuid.uuid4()
+
+    first = asyncio.run(questionnaire_rules.get_questionnaire_progress(session_id, "qn"))
+    progress = asyncio.run(questionnaire_rules.record_answers(session_id, "qn", {"q2": "pollen"}))
+    again = asyncio.run(questionnaire_rules.get_questionnaire_progress(session_id, "qn"))
+
+    assert len(reads) == 1
+    assert first is progress is again
+    assert again.answers["q2"] == "pollen"
+
+def test_cached_progress_is_revalidated_after_the_ttl(monkeypatch):
+    answers = {"q1": "yes"}
+    reads = _fake_db(monkeypatch, answers)
+    monkeypatch.setattr(questionnaire_rules, "_PROGRESS_TTL", 0)
+    session_id = uuid.uuid4()
+
+    asyncio.run(questionnaire_rules.get_questionnaire_progress(session_id, "qn"))
+    answers["q1"] = "no"
+    progress = asyncio.run(questionnaire_rules.get_questionnaire_progress(session_id, "qn"))
+
+    assert len(reads) == 2
+    assert progress.next_question() is None
+
+def test_compiled_schemas_are_bounded(monkeypatch):
+    monkeypatch.setattr(questionnaire_rules, "_compiled", type(questionnaire_rules._compiled)())
+    monkeypatch.setattr(questionnaire_rules, "_COMPILED_MAX_ENTRIES", 2)
+
+    for i in range(5):
+        questionnaire_rules.compile_questionnaire({"id": f"qn{i}", "questions": []})
+
+    assert list(questionnaire_rules._compiled) == ["qn3", "qn4"]
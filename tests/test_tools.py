@@ -0,0 +1,111 @@
+import asyncio
+import json
+import uuid
+
+import tools
+from models import ChatSession
+
+def _call(name, **arguments):
+    return {"function": {"name": name, "arguments": json.dumps(arguments)}}
+
+def test_questionnaire_is_assigned_before_answers_in_the_same_round(monkeypatch):
+    events = []
+
+    async def update_session_questionnaire(session_id, questionnaire_id):
+        await asyncio.sleep(0.01)
+        events.append(("assigned", questionnaire_id))
+
+    async def get_simplified_questionnaire_schema(questionnaire_id):
+        events.append(("schema", questionnaire_id))
+        return {"questions": [{"id": "q1", "title": "How many days have you had symptoms?", "type": "integer"}]}
+
+    async def save_questionnaire_answers_bulk(session_id, answers):
+        events.append(("saved", [a["answer"] for a in answers]))
+
+    class Progress:
+        def summary(self):
+            return {}
+
+    async def record_answers(session_id, questionnaire_id, answers):
+        events.append(("progress", questionnaire_id))
+        return Progress()
+
+    monkeypatch.setattr(tools, "update_session_questionnaire", update_session_questionnaire)
+    monkeypatch.setattr(tools, "get_simplified_questionnaire_schema", get_simplified_questionnaire_schema)
+    monkeypatch.setattr(tools, "save_questionnaire_answers_bulk", save_questionnaire_answers_bulk)
+    monkeypatch.setattr(tools, "record_answers", record_answers)
+
+    session = ChatSession(session_id=uuid.uuid4(), created_at="", last_updated="", questionnaire_id="old")
+    results = asyncio.run(tools.execute_tool_calls(session, [
+        _call("save_questionnaire_answer", question_text="Days?", answer="two weeks", question_id="q1", answer_type="text"),
+        _call("update_session_questionnaire", questionnaire_id="new"),
+    ]))
+
+    assert events == [("assigned", "new"), ("schema", "new"), ("saved", ["14"]), ("progress", "new")]
+    assert results[0]["saved_answer"] == "14"
+    assert results[1]["questionnaire_id"] == "new"
+
+def test_standard_answers_are_normalized_before_a_questionnaire_is_assigned(monkeypatch):
+    saved = []
+
+    async def save_questionnaire_answers_bulk(session_id, answers):
+        saved.extend((a["question_id"], a["answer"]) for a in answers)
+
+    async def get_simplified_questionnaire_schema(questionnaire_id):
+        raise AssertionError("no questionnaire is assigned")
+
+    monkeypatch.setattr(tools, "save_questionnaire_answers_bulk", save_questionnaire_answers_bulk)
+    monkeypatch.setattr(tools, "get_simplified_questionnaire_schema", get_simplified_questionnaire_schema)
+
+    session = ChatSession(session_id=uuid.uuid4(), created_at="", last_updated="")
+    results = asyncio.run(tools.execute_tool_calls(session, [
+        _call("save_questionnaire_answer", question_text="Sex?", answer="Female", question_id="standard_sex", answer_type="boolean"),
+        _call("save_questionnaire_answer", question_text="Pregnant?", answer="no", question_id="standard_pregnancy", answer_type="boolean"),
+    ]))
+
+    assert [result.get("status") for result in results] == ["success", "success"]
+    # Same stored values as once a questionnaire is assigned: the option ID for sex, "false" for pregnancy
+    assert saved == [("standard_sex", "0"), ("standard_pregnancy", "false")]
+
+def _tool_observations(function_name):
+    from prometheus_client import REGISTRY
+    return REGISTRY.get_sample_value("scoby_tool_execution_seconds_count", {"function_name": function_name}) or 0
+
+def test_round_without_answers_records_no_answer_save(monkeypatch):
+    saves = []
+
+    async def save_questionnaire_answers_bulk(session_id, answers):
+        saves.append(answers)
+
+    async def get_simplified_questionnaires():
+        return {"questionnaires": []}
+
+    monkeypatch.setattr(tools, "save_questionnaire_answers_bulk", save_questionnaire_answers_bulk)
+    monkeypatch.setattr(tools, "get_simplified_questionnaires", get_simplified_questionnaires)
+
+    session = ChatSession(session_id=uuid.uuid4(), created_at="", last_updated="")
+    before = _tool_observations("save_questionnaire_answer")
+    results = asyncio.run(tools.execute_tool_calls(session, [_call("get_simplified_questionnaires")]))
+
+    assert results == [{"questionnaires": []}]
+    assert saves == []
+    assert _tool_observations("save_questionnaire_answer") == before
+    assert _tool_observations("get_simplified_questionnaires") >= 1
+
+def test_round_with_only_rejected_answers_writes_nothing(monkeypatch):
+    saves = []
+
+    async def save_questionnaire_answers_bulk(session_id, answers):
+        saves.append(answers)
+
+    monkeypatch.setattr(tools, "save_questionnaire_answers_bulk", save_questionnaire_answers_bulk)
+
+    session = ChatSession(session_id=uuid.uuid4(), created_at="", last_updated="")
+    before = _tool_observations("save_questionnaire_answer")
+    results = asyncio.run(tools.execute_tool_calls(session, [
+        _call("save_questionnaire_answer", question_text="Days?", answer="2-3 days", question_id="q1", answer_type="integer"),
+    ]))
+
+    assert results[0]["error"].startswith("Answer not saved")
+    assert saves == []
+    assert _tool_observations("save_questionnaire_answer") == before
@@ -0,0 +1,196 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Tuple
+
+from models import ChatSession
+from database import update_session_questionnaire, mark_questionnaire_complete, save_questionnaire_answers_bulk
+from MDI import STANDARD_QUESTIONS, get_simplified_questionnaires, get_simplified_questionnaire_schema
+from questionnaire_rules import compile_questionnaire, get_questionnaire_progress, record_answers
+from answer_normalizer import normalize_answers
+from prompts import TOOLS
+from metrics import tool_execution_child
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+TOOL_NAMES = {tool["function"]["name"] for tool in TOOLS}
+
+# Tools whose effects every other call in the same round must observe: answers are normalized
+# and progress is tracked against the questionnaire assigned by update_session_questionnaire
+LEADING_TOOLS = {"update_session_questionnaire"}
+# Tools that must observe the effects of every other call in the same round
+SEQUENTIAL_TOOLS = {"mark_questionnaire_complete"}
+
+async def execute_tool(session: ChatSession, function_name: str, function_args: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one tool call and return its result; failures are reported to the model rather than raised"""
+    label = function_name if function_name in TOOL_NAMES else "unknown"
+    with tracer.start_as_current_span(f"tool.{label}"):
+        start = time.perf_counter()
+        try:
+            return await _dispatch_tool(session, function_name, function_args)
+        finally:
+            tool_execution_child(label).observe(time.perf_counter() - start)
+
+async def _dispatch_tool(session: ChatSession, function_name: str, function_args: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        if function_name == "update_session_questionnaire":
+            await update_session_questionnaire(session.session_id, function_args["questionnaire_id"])
+            if hasattr(session, "questionnaire_id"):
+                session.questionnaire_id = function_args["questionnaire_id"]
+            return {
+                "status": "success",
+                "message": "Questionnaire assigned successfully",
+                "questionnaire_id": function_args["questionnaire_id"],
+                "session_id": str(session.session_id)
+            }
+
+        elif function_name == "get_simplified_questionnaires":
+            return await get_simplified_questionnaires()
+
+        elif function_name == "get_simplified_questionnaire":
+            # Skip logic is evaluated server-side; the model only sees the next applicable question
+            progress = await get_questionnaire_progress(session.session_id, function_args["questionnaire_id"])
+            return progress.summary()
+
+        elif function_name == "save_questionnaire_answer":
+            # Same path as a batch of one, so the cached questionnaire progress sees the answer
+            return (await save_answers_batch(session, [function_args]))[0]
+
+        elif function_name == "mark_questionnaire_complete":
+            await mark_questionnaire_complete(session.session_id)
+            return {
+                "status": "success",
+                "message": "Questionnaire completed and submitted for doctor review",
+                "session_id": str(session.session_id),
+                "completed_at": datetime.utcnow().isoformat()
+            }
+
+        else:
+            return {"error": f"Unknown tool: {function_name}"}
+
+    except Exception as e:
+        return {"error": f"{function_name} failed: {str(e)}"}
+
+# The standard intake questions are the same in every questionnaire, so their answers are
+# normalized the same way whether or not the model has assigned one yet
+_STANDARD_QUESTIONS_BY_ID = {question["id"]: question for question in STANDARD_QUESTIONS}
+
+async def _questions_by_id(session: ChatSession) -> Dict[str, Dict[str, Any]]:
+    """Question definitions for type and option lookups: the standard ones, or the assigned questionnaire's while MDI is up"""
+    if not getattr(session, "questionnaire_id", None):
+        return _STANDARD_QUESTIONS_BY_ID
+    try:
+        return compile_questionnaire(await get_simplified_questionnaire_schema(session.questionnaire_id)).by_id
+    except Exception:
+        logger.warning("Questionnaire schema unavailable for answer normalization", exc_info=True)
+        return _STANDARD_QUESTIONS_BY_ID
+
+async def prepare_answers(session: ChatSession, answer_calls: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Validate and normalize save_questionnaire_answer calls. Returns the per-call results and the
+    answers to store. Answers the normalizer is unsure about are not stored; their result tells
+    the model what format was expected so it can clarify with the patient.
+    """
+    questions = await _questions_by_id(session)
+    results: List[Dict[str, Any]] = []
+    valid = []
+    for function_args in answer_calls:
+        try:
+            valid.append((len(results), {
+                "question_text": function_args["question_text"],
+                "answer": function_args.get("answer"),
+                "question_id": function_args["question_id"],
+                "answer_type": function_args["answer_type"]
+            }))
+            results.append({})
+        except Exception as e:
+            results.append({"error": f"save_questionnaire_answer failed: {str(e)}"})
+    normalized = normalize_answers([(a["answer"], a["answer_type"], questions.get(a["question_id"])) for _, a in valid])
+    answers = []
+    for (i, answer), outcome in zip(valid, normalized):
+        if outcome.ok:
+            answers.append({**answer, "answer": outcome.value})
+            results[i] = {
+                "status": "success",
+                "message": "Answer saved successfully",
+                "question_id": answer["question_id"],
+                "saved_answer": outcome.value
+            }
+        else:
+            results[i] = {
+                "error": f"Answer not saved: {outcome.reason}",
+                "question_id": answer["question_id"],
+                "expected": outcome.expected
+            }
+    return results, answers
+
+async def save_answers_batch(session: ChatSession, answer_calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Normalize every save_questionnaire_answer call of a round and persist them with one bulk upsert"""
+    results, answers = await prepare_answers(session, answer_calls)
+    if not answers:
+        # Every call was rejected: nothing to write, time or trace
+        return results
+    with tracer.start_as_current_span("tool.save_questionnaire_answer", attributes={"tool.batch_size": len(answers)}):
+        start = time.perf_counter()
+        try:
+            await save_questionnaire_answers_bulk(session.session_id, answers)
+        except Exception as e:
+            error = {"error": f"save_questionnaire_answer failed: {str(e)}"}
+            results = [result if "error" in result else error for result in results]
+        finally:
+            tool_execution_child("save_questionnaire_answer").observe(time.perf_counter() - start)
+    saved = [i for i, result in enumerate(results) if "error" not in result]
+    if saved and getattr(session, "questionnaire_id", None):
+        # Tell the model what to ask next so it never has to re-read the schema or its rules
+        try:
+            progress = await record_answers(
+                session.session_id, session.questionnaire_id, {a["question_id"]: a["answer"] for a in answers}
+            )
+            results[saved[-1]]["progress"] = progress.summary()
+        except Exception:
+            logger.warning("Could not update questionnaire progress", exc_info=True)
+    return results
+
+async def execute_tool_calls(session: ChatSession, tool_calls: List[Dict[str, Any]]) -> List[Any]:
+    """
+    Execute one round of tool calls and return their results in the same order.
+    LEADING_TOOLS run first, one at a time. Then independent calls run concurrently and all
+    save_questionnaire_answer calls share one bulk write. SEQUENTIAL_TOOLS run last, one at a time.
+    """
+    results: List[Any] = [None] * len(tool_calls)
+    leading, concurrent, answers, sequential = [], [], [], []
+    for i, tool_call in enumerate(tool_calls):
+        function_name = tool_call['function']['name']
+        try:
+            function_args = json.loads(tool_call['function']['arguments'] or "{}")
+        except json.JSONDecodeError as e:
+            results[i] = {"error": f"{function_name} failed: invalid arguments ({str(e)})"}
+            continue
+        if function_name == "save_questionnaire_answer":
+            answers.append((i, function_args))
+        elif function_name in LEADING_TOOLS:
+            leading.append((i, function_name, function_args))
+        elif function_name in SEQUENTIAL_TOOLS:
+            sequential.append((i, function_name, function_args))
+        else:
+            concurrent.append((i, function_name, function_args))
+
+    for i, name, args in leading:
+        results[i] = await execute_tool(session, name, args)
+    answer_batch = [save_answers_batch(session, [args for _, args in answers])] if answers else []
+    outputs = await asyncio.gather(
+        *answer_batch,
+        *(execute_tool(session, name, args) for _, name, args in concurrent)
+    )
+    if answers:
+        for (i, _), output in zip(answers, outputs[0]):
+            results[i] = output
+        outputs = outputs[1:]
+    for (i, _, _), output in zip(concurrent, outputs):
+        results[i] = output
+    for i, name, args in sequential:
+        results[i] = await execute_tool(session, name, args)
+    return results
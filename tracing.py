@@ -0,0 +1,64 @@
+import functools
+import os
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+import httpx
+from opentelemetry import propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+# Spans go through the OpenTelemetry API, so they are no-ops until setup_tracing() installs a provider
+tracer = trace.get_tracer("scoby_backend")
+
+# Populated when TRACING_EXPORTER=memory; inspect with memory_exporter.get_finished_spans()
+memory_exporter: Optional[InMemorySpanExporter] = None
+
+_provider: Optional[TracerProvider] = None
+
+def setup_tracing() -> None:
+    """
+    Install a tracer provider chosen by TRACING_EXPORTER:
+    "none" (default) records nothing, "console" prints finished spans as JSON to stdout,
+    and "memory" keeps them in `memory_exporter` for offline inspection and benchmarks.
+    """
+    global _provider, memory_exporter
+    exporter = os.getenv("TRACING_EXPORTER", "none").lower()
+    if _provider is not None or exporter == "none":
+        return
+    provider = TracerProvider(resource=Resource.create({"service.name": "scoby_backend"}))
+    if exporter == "console":
+        provider.add_span_processor(BatchSpanProcessor(ConsoleSpanExporter()))
+    elif exporter == "memory":
+        memory_exporter = InMemorySpanExporter()
+        provider.add_span_processor(SimpleSpanProcessor(memory_exporter))
+    else:
+        raise ValueError(f"Unknown TRACING_EXPORTER: {exporter}")
+    trace.set_tracer_provider(provider)
+    _provider = provider
+
+def shutdown_tracing() -> None:
+    """Flush pending spans"""
+    if _provider is not None:
+        _provider.shutdown()
+
+async def inject_trace_context(request: httpx.Request) -> None:
+    """httpx request hook: add the W3C traceparent header of the current span to outbound calls"""
+    propagate.inject(request.headers)
+
+def traced(span_name: str, attributes: Optional[Dict[str, Any]] = None) -> Callable:
+    """Run an async function inside a child span of the current trace"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with tracer.start_as_current_span(span_name, attributes=attributes):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+async def traced_stream(span_name: str, stream: AsyncIterator[Any], attributes: Optional[Dict[str, Any]] = None) -> AsyncIterator[Any]:
+    """Keep a span current for the whole life of an async generator, e.g. one /chat turn"""
+    with tracer.start_as_current_span(span_name, attributes=attributes):
+        async for item in stream:
+            yield item